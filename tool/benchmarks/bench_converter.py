@@ -0,0 +1,107 @@
+"""
+转换后端性能对比 - PyDocX转换 + 标记 vs 原生 iterparse 流式转换
+
+用法:
+    python benchmarks/bench_converter.py [文档目录] [--repeat N] [--rows N]
+
+默认对 document/test_documents 下的所有文档，分别用两种后端（不使用转换缓存）执行
+get_soup_from_document，输出最短耗时、峰值内存，以及两种后端的单元格ID、几何索引和单元格文本是否一致。
+--rows 大于0时额外生成一个包含 N 行 × 8 列表格的大文档参与对比。
+"""
+import os
+import sys
+import glob
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from docx import Document
+from converter.converter import get_soup_from_document
+
+BACKENDS = ("pydocx", "native")
+
+
+def _build_large_document(rows, work_dir):
+    """生成一个大表格文档（每行8列，带一个横向合并单元格）"""
+    doc = Document()
+    doc.add_heading('大表格', level=1)
+    table = doc.add_table(rows=rows, cols=8)
+    for r, row in enumerate(table.rows):
+        for c, cell in enumerate(row.cells):
+            cell.text = f"项目{r}-{c}" if c % 2 == 0 else f"{r * c}.5"
+    table.cell(0, 0).merge(table.cell(0, 1))
+    doc_path = os.path.join(work_dir, f'large_{rows}.docx')
+    doc.save(doc_path)
+    return doc_path
+
+
+def _convert(doc_path, backend, unzip_dir):
+    return get_soup_from_document(doc_path, unzip_dir, cache=None, backend=backend)
+
+
+def _measure(doc_path, backend, unzip_dir, repeat):
+    """分别测量最短耗时（不开启tracemalloc，避免其开销影响计时）和峰值内存"""
+    elapsed = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = _convert(doc_path, backend, unzip_dir)
+        elapsed.append(time.perf_counter() - start)
+    tracemalloc.start()
+    _convert(doc_path, backend, unzip_dir)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, min(elapsed), peak
+
+
+def _same_cells(results):
+    """两种后端的单元格ID集合、表格几何索引以及每个单元格的文本是否一致"""
+    (_, index_a, geometry_a), (_, index_b, geometry_b) = results
+    if set(index_a) != set(index_b) or geometry_a != geometry_b:
+        return False
+    return all(
+        index_a[cell_id].get_text(strip=True) == index_b[cell_id].get_text(strip=True)
+        for cell_id in index_a
+    )
+
+
+def main():
+    default_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'document', 'test_documents')
+    parser = argparse.ArgumentParser(description="对比PyDocX与原生转换后端的耗时和峰值内存")
+    parser.add_argument("doc_dir", nargs="?", default=default_dir, help="文档目录")
+    parser.add_argument("--repeat", type=int, default=3, help="每个文档的计时次数，取最短耗时")
+    parser.add_argument("--rows", type=int, default=2000, help="额外生成的大表格行数，0表示不生成")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='bench_converter_')
+    try:
+        doc_paths = sorted(glob.glob(os.path.join(args.doc_dir, '*.docx')))
+        if args.rows > 0:
+            doc_paths.append(_build_large_document(args.rows, work_dir))
+
+        print(f"{'文档':<24}{'后端':<8}{'耗时(ms)':>10}{'峰值内存(MB)':>14}")
+        totals = {backend: [0.0, 0] for backend in BACKENDS}
+        for doc_path in doc_paths:
+            results = []
+            for backend in BACKENDS:
+                result, elapsed, peak = _measure(doc_path, backend, os.path.join(work_dir, backend), args.repeat)
+                results.append(result)
+                totals[backend][0] += elapsed
+                totals[backend][1] = max(totals[backend][1], peak)
+                print(f"{os.path.basename(doc_path):<24}{backend:<8}{elapsed * 1000:>10.1f}{peak / 1024 / 1024:>14.1f}")
+            print(f"{'':<24}单元格一致: {_same_cells(results)}")
+
+        pydocx_time, native_time = totals["pydocx"][0], totals["native"][0]
+        print(f"合计耗时: pydocx {pydocx_time * 1000:.1f} ms, native {native_time * 1000:.1f} ms, "
+              f"加速 {pydocx_time / native_time:.1f} 倍")
+        print(f"最大峰值内存: pydocx {totals['pydocx'][1] / 1024 / 1024:.1f} MB, "
+              f"native {totals['native'][1] / 1024 / 1024:.1f} MB")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+图片映射性能对比 - 旧的 media 全量读取 + 逐字节比较 vs 基于 r:embed 关系的映射
+
+用法:
+    python benchmarks/bench_image_map.py [图片数量]
+
+脚本会生成一个包含指定数量（默认300）不同图片的临时Word文档，
+分别用两种方式建立 HTML img 索引到 media 文件名的映射，输出耗时和峰值内存。
+"""
+import os
+import sys
+import io
+import time
+import base64
+import random
+import shutil
+import zipfile
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from bs4 import BeautifulSoup
+from docx import Document
+from docx.shared import Inches
+from PIL import Image
+from extractors.image_extractor import _create_image_map
+
+
+def _legacy_image_map(soup, unzip_dir):
+    """旧实现：读取全部media文件到内存，每张img解码后与所有media逐一比较"""
+    image_map = {}
+    media_dir = os.path.join(unzip_dir, 'word', 'media')
+    word_media_data = {}
+    for filename in os.listdir(media_dir):
+        with open(os.path.join(media_dir, filename), 'rb') as f:
+            word_media_data[filename] = f.read()
+    for i, img_tag in enumerate(soup.find_all('img')):
+        header, b64data = img_tag['src'].split(',', 1)
+        html_img_bytes = base64.b64decode(b64data)
+        image_map[f"{i}"] = next((name for name, data in word_media_data.items() if data == html_img_bytes), None)
+    return image_map
+
+
+def _build_document(image_count, work_dir):
+    """生成包含 image_count 张不同图片的docx，并构造对应的data: img HTML"""
+    random.seed(0)
+    doc = Document()
+    img_tags = []
+    for i in range(image_count):
+        # 随机噪声图片压缩率低，文件大小接近真实照片
+        img = Image.frombytes('RGB', (200, 150), random.randbytes(200 * 150 * 3))
+        buffer = io.BytesIO()
+        img.save(buffer, format='PNG')
+        data = buffer.getvalue()
+        doc.add_picture(io.BytesIO(data), width=Inches(1))
+        img_tags.append(f'<img src="data:image/png;base64,{base64.b64encode(data).decode()}"/>')
+
+    doc_path = os.path.join(work_dir, 'bench.docx')
+    doc.save(doc_path)
+    unzip_dir = os.path.join(work_dir, 'unzip')
+    with zipfile.ZipFile(doc_path) as zip_ref:
+        zip_ref.extractall(unzip_dir)
+    return BeautifulSoup(f"<html><body>{''.join(img_tags)}</body></html>", 'html.parser'), unzip_dir
+
+
+def _measure(func, *args):
+    """分别测量耗时（不开启tracemalloc，避免其开销影响计时）和峰值内存"""
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    image_count = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    work_dir = tempfile.mkdtemp(prefix='bench_image_map_')
+    try:
+        soup, unzip_dir = _build_document(image_count, work_dir)
+        legacy_map, legacy_time, legacy_peak = _measure(_legacy_image_map, soup, unzip_dir)
+        new_map, new_time, new_peak = _measure(_create_image_map, soup, unzip_dir)
+
+        print(f"图片数量: {image_count}")
+        print(f"旧实现(逐字节比较): {legacy_time * 1000:8.1f} ms  峰值内存 {legacy_peak / 1024 / 1024:6.1f} MB")
+        print(f"新实现(关系映射):   {new_time * 1000:8.1f} ms  峰值内存 {new_peak / 1024 / 1024:6.1f} MB")
+        print(f"映射结果一致: {legacy_map == new_map}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
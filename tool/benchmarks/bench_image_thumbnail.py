@@ -0,0 +1,95 @@
+"""
+图片缩略图对比 - 发送原图PNG vs 缩小并重新编码的缩略图
+
+用法:
+    python benchmarks/bench_image_thumbnail.py [文档目录] [--max-edge 768] [--quality 80]
+
+脚本读取目录（默认 document/test_documents）下各Word文档 word/media 中的图片（无法用Pillow打开的格式跳过），
+另存为PNG（与 image_extractor 相同）后，分别用 JPEG 和 WEBP 生成缩略图，
+逐张输出原图和缩略图的字节数，最后输出总字节数、节省比例，以及逐张处理与线程池并发处理的耗时。
+"""
+import os
+import io
+import sys
+import glob
+import time
+import shutil
+import asyncio
+import zipfile
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from PIL import Image
+from replacers.image_thumbnail import make_thumbnail, format_size
+
+TEST_DOCUMENTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'document', 'test_documents')
+FORMATS = ("JPEG", "WEBP")
+
+
+def _extract_images(doc_dir, work_dir):
+    images = []
+    for doc_path in sorted(glob.glob(os.path.join(doc_dir, '*.docx'))):
+        doc_name = os.path.splitext(os.path.basename(doc_path))[0]
+        with zipfile.ZipFile(doc_path) as package:
+            for member in sorted(name for name in package.namelist() if name.startswith('word/media/')):
+                try:
+                    img = Image.open(io.BytesIO(package.read(member)))
+                    img_path = os.path.join(work_dir, f"{len(images)}.png")
+                    img.save(img_path, format='PNG')
+                except Exception:
+                    continue
+                images.append((f"{doc_name}/{os.path.basename(member)}", img_path, img.size))
+    return images
+
+
+async def _run_in_threads(img_paths, max_edge, image_format, quality):
+    return await asyncio.gather(*(asyncio.to_thread(make_thumbnail, img_path, max_edge, image_format, quality) for img_path in img_paths))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比原图与缩略图的请求体积")
+    parser.add_argument("doc_dir", nargs="?", default=TEST_DOCUMENTS_DIR, help="Word文档目录")
+    parser.add_argument("--max-edge", type=int, default=768, help="缩略图最长边像素数")
+    parser.add_argument("--quality", type=int, default=80, help="编码质量")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='bench_image_thumbnail_')
+    try:
+        images = _extract_images(args.doc_dir, work_dir)
+        if not images:
+            print("没有可对比的图片")
+            return
+        img_paths = [img_path for _, img_path, _ in images]
+
+        totals = {image_format: 0 for image_format in FORMATS}
+        original_total = 0
+        for name, img_path, (width, height) in images:
+            results = {image_format: make_thumbnail(img_path, args.max_edge, image_format, args.quality) for image_format in FORMATS}
+            original = next(iter(results.values()))[2]
+            original_total += original
+            sizes = []
+            for image_format, (_, mime_type, _, payload) in results.items():
+                totals[image_format] += payload
+                sizes.append(f"{image_format} {format_size(payload)}{'（原图）' if mime_type == 'image/png' else ''}")
+            print(f"{name} {width}x{height}: PNG {format_size(original)} -> " + "，".join(sizes))
+
+        print(f"图片 {len(images)} 张，最长边 {args.max_edge}，质量 {args.quality}：原图合计 {format_size(original_total)}")
+        for image_format, total in totals.items():
+            print(f"  {image_format}: 合计 {format_size(total)}，节省 {1 - total / original_total:.0%}")
+
+        start = time.perf_counter()
+        for img_path in img_paths:
+            make_thumbnail(img_path, args.max_edge, FORMATS[0], args.quality)
+        serial = time.perf_counter() - start
+        start = time.perf_counter()
+        asyncio.run(_run_in_threads(img_paths, args.max_edge, FORMATS[0], args.quality))
+        threaded = time.perf_counter() - start
+        print(f"{FORMATS[0]} 缩略图耗时：逐张 {serial * 1000:.1f} ms，线程池并发 {threaded * 1000:.1f} ms")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
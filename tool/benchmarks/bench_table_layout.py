@@ -0,0 +1,149 @@
+"""
+表格布局聚类与布局记忆对比 - 每个表格调用一次LLM vs 布局相同的表格共用一次LLM结果 vs 跨文档复用已记录的布局
+
+用法:
+    python benchmarks/bench_table_layout.py [重复表格数] [--latency 秒]
+
+脚本生成一份检测报告：一个封面信息表格，加上 N 个布局相同的"测点"表格（标签相同、数值和文字值不同）。
+LLM调用被替换为模拟模型：以"左侧单元格文本"为键、右侧单元格为值返回紧凑格式结果，每次调用等待 --latency 秒。
+分别关闭和开启布局聚类执行 replace_tables，输出LLM调用次数、耗时，以及两种方式替换后的单元格内容是否一致；
+最后对另外两份同模板、数值不同的报告依次执行：第二份报告的LLM结果与第一份一致，布局记忆（临时存储文件）
+累计两次一致观察，第三份报告命中布局记忆，无需调用LLM。
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from bs4 import BeautifulSoup
+from docx import Document
+from callback.callback import callback_handler
+from context.document_context import DocumentContext
+from context.workspace import Workspace
+from converter.converter import get_soup_from_document
+from extractors.table_extractor import get_tables_from_soup
+from global_define import constants
+from global_define.constants import ATTR_CELL_HANDLE, ATTR_ORIGINAL_CONTENT
+from models.model_manager import llm_manager
+from replacers.table_replacer import replace_tables
+from replacers.table_layout_store import table_layout_store
+
+DEVICE_ROWS = [
+    ("设备名称：", "{name}", "测点编号", "P{index:03d}"),
+    ("最高温度", "{high:.1f}℃", "最低温度", "{low:.1f}℃"),
+    ("缺陷等级：", "{level}", "检测日期", "2024-05-{day:02d}"),
+]
+LEVELS = ("一般缺陷", "严重缺陷", "正常")
+
+
+def _build_document(count, work_dir, seed=0):
+    doc = Document()
+    doc.add_heading('红外检测报告', level=1)
+    cover = doc.add_table(rows=3, cols=2)
+    for row, (label, value) in zip(cover.rows, [("报告编号", "IR-2024-001"), ("委托单位", "某供电公司"), ("检测人员", "张三")]):
+        row.cells[0].text, row.cells[1].text = label, value
+    for index in range(count):
+        doc.add_paragraph(f"测点 {index + 1}")
+        table = doc.add_table(rows=len(DEVICE_ROWS), cols=4)
+        values = {"name": f"{(index + seed) % 7 + 1}号主变", "index": index + 1, "high": 40 + (index + seed) % 30,
+                  "low": 20 + index % 10, "level": LEVELS[(index + seed) % 3], "day": (index + seed) % 28 + 1}
+        for row, texts in zip(table.rows, DEVICE_ROWS):
+            for cell, text in zip(row.cells, texts):
+                cell.text = text.format(**values)
+    doc_path = os.path.join(work_dir, f'layout_{count}_{seed}.docx')
+    doc.save(doc_path)
+    return doc_path
+
+
+class _SimulatedModel:
+    """模拟模型：按紧凑格式返回 "左侧单元格文本 -> 右侧单元格句柄"，记录调用次数"""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        prompt = kwargs['messages'][0]['content']
+        table = BeautifulSoup(prompt[prompt.rindex('<table'):], 'html.parser')
+        pairs = []
+        for row in table.find_all('tr'):
+            cells = row.find_all(['td', 'th'], recursive=False)
+            for label, value in zip(cells[::2], cells[1::2]):
+                key = label.get_text(strip=True).rstrip('：:')
+                if key:
+                    pairs.append({"k": key, "c": int(value[ATTR_CELL_HANDLE])})
+        content = json.dumps({"pairs": pairs}, ensure_ascii=False)
+
+        class _Delta:
+            pass
+
+        class _Choice:
+            delta = _Delta()
+
+        class _Chunk:
+            choices = [_Choice()]
+
+        _Choice.delta.content = content
+
+        async def _stream():
+            yield _Chunk()
+        return _stream()
+
+
+async def _run(doc_path, work_dir, clustering, latency, use_store=False):
+    constants.TABLE_LAYOUT_CLUSTERING_ENABLED = clustering
+    constants.TABLE_RULES_ENABLED = False  # 只对比布局聚类和布局记忆，规则识别会在本地处理这些简单表格
+    table_layout_store.enabled = use_store
+    ctx = DocumentContext(workspace=Workspace(work_dir, doc_path))
+    ctx.soup, ctx.cell_index, ctx.table_geometry = get_soup_from_document(doc_path, os.path.join(work_dir, 'unzip'), cache=None)
+    ctx.tables = await get_tables_from_soup(ctx.soup, os.path.join(work_dir, 'extract'))
+    model = _SimulatedModel(latency)
+    llm_manager.async_client.chat.completions.create = model.create
+    start = time.perf_counter()
+    await replace_tables(ctx, '', response_mode="compact", serializer="html")
+    elapsed = time.perf_counter() - start
+    cells = {cell_id: cell.get_text() for cell_id, cell in ctx.cell_index.items() if cell.has_attr(ATTR_ORIGINAL_CONTENT)}
+    return model.calls, elapsed, cells, ctx.table_stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比布局聚类前后表格替换的LLM调用次数")
+    parser.add_argument("count", nargs="?", type=int, default=60, help="布局相同的测点表格数量")
+    parser.add_argument("--latency", type=float, default=0.5, help="模拟的单次LLM调用耗时（秒）")
+    args = parser.parse_args()
+
+    callback_handler.set_log_level("warn")
+    llm_manager.cache.enabled = False
+    llm_manager.set_max_concurrency(constants.LLM_MAX_CONCURRENCY)
+    work_dir = tempfile.mkdtemp(prefix='bench_table_layout_')
+    table_layout_store.store_path = os.path.join(work_dir, 'table_layout_store.json')
+    try:
+        doc_path = _build_document(args.count, work_dir)
+        baseline = asyncio.run(_run(doc_path, work_dir, False, args.latency))
+        clustered = asyncio.run(_run(doc_path, work_dir, True, args.latency, use_store=True))
+        confirmed = asyncio.run(_run(_build_document(args.count, work_dir, seed=5), work_dir, True, args.latency, use_store=True))
+        remembered = asyncio.run(_run(_build_document(args.count, work_dir, seed=9), work_dir, True, args.latency, use_store=True))
+
+        print(f"表格: 1 个封面表格 + {args.count} 个布局相同的测点表格，模拟LLM耗时 {args.latency}s/次")
+        print(f"逐表调用: LLM调用 {baseline[0]:>4} 次，耗时 {baseline[1]:6.2f} s，替换 {len(baseline[2])} 个单元格")
+        print(f"布局聚类: LLM调用 {clustered[0]:>4} 次，耗时 {clustered[1]:6.2f} s，替换 {len(clustered[2])} 个单元格，"
+              f"统计节省 {clustered[3]['llm_calls_saved']} 次")
+        print(f"替换结果一致: {baseline[2] == clustered[2]}")
+        print(f"同模板的第二份报告（仅一次观察，不使用记忆）: LLM调用 {confirmed[0]:>4} 次，"
+              f"命中记忆的表格 {confirmed[3]['layout_store_hits']} 个")
+        print(f"同模板的第三份报告（布局记忆）: LLM调用 {remembered[0]:>4} 次，耗时 {remembered[1]:6.2f} s，"
+              f"替换 {len(remembered[2])} 个单元格，命中记忆的表格 {remembered[3]['layout_store_hits']} 个")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
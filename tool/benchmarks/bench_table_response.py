@@ -0,0 +1,95 @@
+"""
+表格响应格式与序列化格式对比 - full（key/value/value-cell-id）vs compact（JSON schema，只输出键和短数字单元格句柄），html vs grid
+
+用法:
+    python benchmarks/bench_table_response.py [文档目录]
+
+不调用模型。对 document/test_documents 下每个文档提取的每个表格，以"左侧单元格文本为键、右侧单元格为值"
+构造同一组参考键值对，分别按两种响应格式序列化，输出模型输出的字符数和token估计，
+以及提示词中表格内容（原始HTML、带 data-h 句柄的HTML、grid网格格式）的token估计；并检查紧凑结果还原后的单元格ID与参考一致。
+"""
+import os
+import sys
+import glob
+import json
+import asyncio
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from bs4 import BeautifulSoup
+from callback.callback import callback_handler
+from converter.converter import get_soup_from_document
+from extractors.table_extractor import get_tables_from_soup
+from global_define.constants import ATTR_CELL_ID
+from replacers.compact_response import assign_cell_handles, expand_item
+from replacers.table_chunker import estimate_tokens
+from replacers.table_serializer import get_serializer
+
+
+def _reference_pairs(table_html):
+    """参考答案：每行中左侧单元格有文本时，以其文本为键、右侧单元格为值"""
+    pairs = []
+    for row in BeautifulSoup(table_html, 'html.parser').find_all('tr'):
+        cells = row.find_all(['td', 'th'], recursive=False)
+        for label, value in zip(cells, cells[1:]):
+            key = label.get_text(strip=True)
+            if key and value.get(ATTR_CELL_ID):
+                pairs.append((key, value.get_text(strip=True), value[ATTR_CELL_ID]))
+    return pairs
+
+
+def _full_output(pairs):
+    return json.dumps([{"key": key, "value": value, "value-cell-id": cell_id} for key, value, cell_id in pairs],
+                      ensure_ascii=False)
+
+
+def _compact_output(pairs, cell_ids):
+    handles = {cell_id: handle for handle, cell_id in enumerate(cell_ids, start=1)}
+    return json.dumps({"pairs": [{"k": key, "c": handles[cell_id]} for key, _, cell_id in pairs]},
+                      ensure_ascii=False)
+
+
+def main():
+    default_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'document', 'test_documents')
+    doc_dir = sys.argv[1] if len(sys.argv) > 1 else default_dir
+    callback_handler.set_log_level("warn")
+    work_dir = tempfile.mkdtemp(prefix='bench_table_response_')
+    totals = {"full_out": 0, "compact_out": 0, "full_in": 0, "compact_in": 0, "grid_in": 0}
+    all_match = True
+    try:
+        print(f"{'文档':<20}{'表格':>6}{'键值对':>8}{'full输出(tok)':>16}{'compact输出(tok)':>18}{'full表格(tok)':>16}{'compact表格(tok)':>18}{'grid表格(tok)':>16}")
+        for doc_path in sorted(glob.glob(os.path.join(doc_dir, '*.docx'))):
+            soup, _, _ = get_soup_from_document(doc_path, os.path.join(work_dir, 'unzip'), cache=None)
+            tables = asyncio.run(get_tables_from_soup(soup, os.path.join(work_dir, 'extract')))
+            row = {"pairs": 0, "full_out": 0, "compact_out": 0, "full_in": 0, "compact_in": 0, "grid_in": 0}
+            for table_html in tables:
+                pairs = _reference_pairs(table_html)
+                compact_html, cell_ids = assign_cell_handles(table_html)
+                compact_output = _compact_output(pairs, cell_ids)
+                restored = [expand_item(item, cell_ids) for item in json.loads(compact_output)["pairs"]]
+                all_match &= [item["value-cell-id"] for item in restored] == [cell_id for _, _, cell_id in pairs]
+                row["pairs"] += len(pairs)
+                row["full_out"] += estimate_tokens(_full_output(pairs))
+                row["compact_out"] += estimate_tokens(compact_output)
+                row["full_in"] += estimate_tokens(table_html)
+                row["compact_in"] += estimate_tokens(compact_html)
+                row["grid_in"] += estimate_tokens(get_serializer("grid").serialize(table_html, True)[0])
+            for key in totals:
+                totals[key] += row[key]
+            print(f"{os.path.basename(doc_path):<20}{len(tables):>6}{row['pairs']:>8}{row['full_out']:>16}"
+                  f"{row['compact_out']:>18}{row['full_in']:>16}{row['compact_in']:>18}{row['grid_in']:>16}")
+
+        print(f"输出token合计: full {totals['full_out']}, compact {totals['compact_out']}，"
+              f"减少 {1 - totals['compact_out'] / max(1, totals['full_out']):.0%}")
+        print(f"表格内容token合计: HTML {totals['full_in']}, HTML+句柄 {totals['compact_in']}（减少 "
+              f"{1 - totals['compact_in'] / max(1, totals['full_in']):.0%}）, grid {totals['grid_in']}（减少 "
+              f"{1 - totals['grid_in'] / max(1, totals['full_in']):.0%}）")
+        print(f"句柄还原的单元格ID一致: {all_match}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
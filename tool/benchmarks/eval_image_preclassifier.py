@@ -0,0 +1,119 @@
+"""
+图片预分类评估 - 以LLM的识别结果为标准，统计本地预分类的覆盖率和准确率
+
+用法:
+    python benchmarks/eval_image_preclassifier.py [文档目录] [--labels 标签文件]
+
+脚本读取目录（默认 document/test_documents）下各Word文档 word/media 中的图片（无法用Pillow打开的格式跳过），
+对每张图片分别执行本地预分类和LLM单张识别，逐张输出两者的类型和预分类依据，
+最后输出本地识别的图片占比（覆盖率）、本地识别结果与LLM一致的比例（准确率）和预分类平均耗时。
+指定 --labels 时，标签文件存在则直接读取其中的LLM识别结果，不存在则调用LLM并把结果写入该文件，便于调整阈值后反复评估。
+"""
+import os
+import io
+import sys
+import glob
+import json
+import base64
+import time
+import shutil
+import asyncio
+import zipfile
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from PIL import Image
+from callback.callback import callback_handler
+from global_define import constants
+from models.model_manager import llm_manager
+from replacers.image_replacer import PLACEHOLDER_MAPPING, _classify_single, _read_prompt
+from replacers.image_preclassifier import image_preclassifier
+
+TEST_DOCUMENTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'document', 'test_documents')
+
+
+def _extract_images(doc_dir, work_dir):
+    """将各文档media中的图片另存为PNG（与 image_extractor 相同），返回 [(名称, 路径), ...]"""
+    images = []
+    for doc_path in sorted(glob.glob(os.path.join(doc_dir, '*.docx'))):
+        doc_name = os.path.splitext(os.path.basename(doc_path))[0]
+        with zipfile.ZipFile(doc_path) as package:
+            for member in sorted(name for name in package.namelist() if name.startswith('word/media/')):
+                name = f"{doc_name}/{os.path.basename(member)}"
+                try:
+                    img = Image.open(io.BytesIO(package.read(member)))
+                    img_path = os.path.join(work_dir, f"{len(images)}.png")
+                    img.save(img_path, format='PNG')
+                except Exception as e:
+                    print(f"跳过 {name}: {e}")
+                    continue
+                images.append((name, img_path))
+    return images
+
+
+async def _llm_labels(images):
+    prompt = _read_prompt("image_prompt.txt")
+    semaphore = asyncio.Semaphore(constants.LLM_MAX_CONCURRENCY)
+
+    async def _label(name, img_path):
+        with open(img_path, 'rb') as f:
+            img_base64 = base64.b64encode(f.read()).decode('utf-8')
+        async with semaphore:
+            _, option = await _classify_single(img_base64, prompt)
+        return name, option
+
+    return dict(await asyncio.gather(*(_label(name, img_path) for name, img_path in images)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="以LLM识别结果为标准评估图片预分类")
+    parser.add_argument("doc_dir", nargs="?", default=TEST_DOCUMENTS_DIR, help="Word文档目录")
+    parser.add_argument("--labels", help="LLM识别结果文件（JSON），存在时读取，不存在时调用LLM后写入")
+    args = parser.parse_args()
+
+    callback_handler.set_log_level("warn")
+    work_dir = tempfile.mkdtemp(prefix='eval_image_preclassifier_')
+    try:
+        images = _extract_images(args.doc_dir, work_dir)
+        if not images:
+            print("没有可评估的图片")
+            return
+
+        if args.labels and os.path.exists(args.labels):
+            with open(args.labels, 'r', encoding='utf-8') as f:
+                labels = json.load(f)
+        else:
+            llm_manager.set_max_concurrency(constants.LLM_MAX_CONCURRENCY)
+            labels = asyncio.run(_llm_labels(images))
+            if args.labels:
+                with open(args.labels, 'w', encoding='utf-8') as f:
+                    json.dump(labels, f, ensure_ascii=False, indent=4)
+
+        covered = correct = 0
+        elapsed = 0.0
+        for name, img_path in images:
+            start = time.perf_counter()
+            result = image_preclassifier.classify(img_path)
+            elapsed += time.perf_counter() - start
+            llm_type = labels.get(name)
+            llm_text = PLACEHOLDER_MAPPING.get(llm_type, "未识别") if llm_type else "未识别"
+            if result:
+                option, reason = result
+                covered += 1
+                correct += option == llm_type
+                mark = "一致" if option == llm_type else "不一致"
+                print(f"{name}: 预分类 {PLACEHOLDER_MAPPING[option]}，LLM {llm_text}，{mark}（{reason}）")
+            else:
+                print(f"{name}: 预分类无把握，LLM {llm_text}")
+
+        print(f"图片 {len(images)} 张：本地识别 {covered} 张（覆盖率 {covered / len(images):.0%}），"
+              f"与LLM一致 {correct} 张（准确率 {correct / covered if covered else 0:.0%}），"
+              f"预分类平均耗时 {elapsed / len(images) * 1000:.1f} ms/张")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
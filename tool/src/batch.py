@@ -0,0 +1,300 @@
+"""
+批量模板生成 - 将一个目录（或通配符匹配）下的所有Word文档转换为模板
+CPU密集的转换和保存步骤在进程池中执行，所有文档的LLM请求共享同一个并发上限；
+每个文档的耗时、表格/图片数量和失败原因写入输出目录的汇总文件，中断后再次运行会跳过已完成的文档
+
+用法:
+    python batch.py <输入目录或通配符> <输出目录> [--workers N] [--jobs N] [--llm-concurrency N] [--no-resume] [--log-level warn]
+"""
+
+import os
+import glob
+import json
+import time
+import asyncio
+import argparse
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+from bs4 import BeautifulSoup
+from models.model_manager import llm_manager
+from converter.converter import get_soup_from_document
+from converter.conversion_cache import conversion_cache
+from replacers.table_layout_store import table_layout_store
+from replacers.image_preclassifier import image_preclassifier
+from extractors.extractor import extract_document
+from replacers.replacer import replace_document
+from savers.saver import save_document
+from callback.callback import callback_handler
+from context.document_context import DocumentContext
+from context.workspace import Workspace
+from global_define import constants
+from global_define.constants import ATTR_ORIGINAL_CONTENT
+
+
+def find_documents(input_spec: str) -> list[str]:
+    """输入为目录时递归查找其中的 .docx，否则按通配符匹配；忽略Word的临时文件（~$开头）"""
+    if os.path.isdir(input_spec):
+        pattern = os.path.join(input_spec, "**", "*.docx")
+    else:
+        pattern = input_spec
+    paths = [
+        path for path in glob.glob(pattern, recursive=True)
+        if path.lower().endswith('.docx') and not os.path.basename(path).startswith('~$')
+    ]
+    return sorted(os.path.abspath(path) for path in paths)
+
+
+def assign_output_names(doc_paths: list[str]) -> dict:
+    """为每个文档分配输出名称（文件名去掉扩展名，重名时追加序号），按路径排序保证续跑时名称不变"""
+    names, taken = {}, set()
+    for doc_path in doc_paths:
+        base = os.path.splitext(os.path.basename(doc_path))[0]
+        name, suffix = base, 2
+        while name in taken:
+            name = f"{base}_{suffix}"
+            suffix += 1
+        taken.add(name)
+        names[doc_path] = name
+    return names
+
+
+def _fingerprint(doc_path: str) -> list:
+    """源文档的大小和修改时间，文档变化后续跑时重新处理"""
+    stat = os.stat(doc_path)
+    return [stat.st_size, int(stat.st_mtime)]
+
+
+class BatchSummary:
+    """批量处理汇总类，记录每个文档的处理结果，每完成一个文档写盘一次，用于续跑"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.documents = {}  # 输出名称 -> 处理结果
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.documents = json.load(f).get("documents", {})
+            except (OSError, ValueError) as e:
+                print(f"读取批量汇总失败，将重新处理所有文档: {e}")
+
+    def is_done(self, name: str, doc_path: str) -> bool:
+        """文档已成功处理、源文档未变化且模板文件仍存在"""
+        entry = self.documents.get(name)
+        return bool(
+            entry
+            and entry.get("status") == "ok"
+            and entry.get("source") == doc_path
+            and entry.get("source_fingerprint") == _fingerprint(doc_path)
+            and os.path.exists(entry.get("output", ""))
+        )
+
+    def record(self, name: str, entry: dict) -> None:
+        self.documents[name] = entry
+        self.save()
+
+    @property
+    def totals(self) -> dict:
+        statuses = [entry.get("status") for entry in self.documents.values()]
+        return {"documents": len(statuses), "ok": statuses.count("ok"), "failed": statuses.count("failed")}
+
+    def save(self) -> None:
+        """先写临时文件再替换，避免中断时汇总文件损坏"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"totals": self.totals, "documents": self.documents}, f, ensure_ascii=False, indent=4)
+        os.replace(tmp_path, self.path)
+
+
+class _StageTimer:
+    """记录各步骤耗时，并记住当前步骤以便失败时报告"""
+
+    def __init__(self, timings: dict):
+        self.timings = timings
+        self.current = None
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        self.current = name
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = round(time.perf_counter() - start, 3)
+
+
+# --- 进程池中执行的函数（需为模块级函数以便序列化） ---
+
+def _init_worker(log_level: str) -> None:
+    callback_handler.set_log_level(log_level)
+
+
+def _convert_worker(doc_path: str, unzip_dir: str) -> tuple[str, dict, bool]:
+    """转换Word文档并标记单元格，返回 (HTML字符串, 表格几何索引, 是否命中转换缓存)（解析树不跨进程传递）"""
+    hits_before = conversion_cache.hits
+    soup, _, table_geometry = get_soup_from_document(doc_path, unzip_dir)
+    return str(soup), table_geometry, conversion_cache.hits > hits_before
+
+
+def _save_worker(workspace: Workspace, output: str) -> bool:
+    """从工作区读取已保存的HTML和映射文件，生成模板文档"""
+    ctx = DocumentContext(workspace=workspace)
+    ctx.load_html()
+    ctx.load_maps()
+    return asyncio.run(save_document(ctx, output)) is not None
+
+
+async def process_document(doc_path: str, name: str, output_dir: str, executor: ProcessPoolExecutor) -> dict:
+    """
+    对单个文档执行 转换 → 提取 → 替换 → 保存，返回该文档的处理结果
+    中间文件保存在 输出目录/_work/<名称>/，模板保存为 输出目录/<名称>.docx
+    """
+    workspace = Workspace(
+        os.path.join(output_dir, constants.BATCH_WORK_DIR_NAME, name), doc_path, job_id=name,
+        template_path=os.path.join(output_dir, f"{name}.docx")
+    )
+    os.makedirs(workspace.root_dir, exist_ok=True)
+    workspace.save_manifest()
+    callback_handler.set_job_id(name)
+
+    ctx = DocumentContext(workspace=workspace)
+    entry = {
+        "source": doc_path,
+        "source_fingerprint": _fingerprint(doc_path),
+        "output": workspace.template_path,
+        "status": "failed",
+        "timings": {},
+    }
+    timer = _StageTimer(entry["timings"])
+    loop = asyncio.get_running_loop()
+    start_time = time.perf_counter()
+
+    try:
+        with timer.stage("convert"):
+            html, ctx.table_geometry, entry["conversion_cache_hit"] = await loop.run_in_executor(
+                executor, _convert_worker, doc_path, workspace.unzip_dir
+            )
+            ctx.soup = BeautifulSoup(html, 'html.parser')
+            ctx.build_cell_index()
+
+        with timer.stage("extract"):
+            await extract_document(ctx)
+            workspace.cleanup_temp()
+
+        with timer.stage("replace"):
+            await replace_document(ctx)
+            ctx.save()
+
+        with timer.stage("save"):
+            if not await loop.run_in_executor(executor, _save_worker, workspace, workspace.template_path):
+                raise RuntimeError("模板文档生成失败")
+
+        entry["status"] = "ok"
+    except Exception as e:
+        entry["error"] = f"{timer.current}: {type(e).__name__}: {e}"
+
+    entry["timings"]["total"] = round(time.perf_counter() - start_time, 3)
+    entry["counts"] = {
+        "tables": len(ctx.tables),
+        "images": len(ctx.image_map),
+        "placeholder_images": len(ctx.placeholder_map),
+        "modified_cells": sum(1 for cell in ctx.cell_index.values() if cell.has_attr(ATTR_ORIGINAL_CONTENT)),
+        "table_llm_calls": ctx.table_stats.get("llm_calls", 0),
+        "table_llm_calls_saved": ctx.table_stats.get("llm_calls_saved", 0),
+        "table_layout_store_hits": ctx.table_stats.get("layout_store_hits", 0),
+        "table_rule_hits": ctx.table_stats.get("rule_hits", 0),
+        "image_payload_bytes": ctx.image_stats.get("payload_bytes", 0),
+        "image_payload_bytes_saved": ctx.image_stats.get("payload_bytes_saved", 0),
+    }
+    return entry
+
+
+async def run_batch(input_spec: str,
+                    output_dir: str,
+                    workers: int = None,
+                    jobs: int = None,
+                    llm_concurrency: int = constants.LLM_MAX_CONCURRENCY,
+                    resume: bool = True,
+                    log_level: str = "warn") -> dict:
+    """
+    批量生成模板，返回汇总统计
+
+    Args:
+        input_spec: 输入目录或通配符（如 "reports/**/*.docx"）
+        output_dir: 输出目录，保存模板、汇总文件和中间文件
+        workers: 进程池大小，默认为CPU核数
+        jobs: 同时处理的文档数量，默认与 workers 相同
+        llm_concurrency: 所有文档共享的LLM并发请求上限
+        resume: 是否跳过汇总文件中已成功处理且未变化的文档
+        log_level: 处理过程的日志级别
+    """
+    callback_handler.set_log_level(log_level)
+    llm_manager.set_max_concurrency(llm_concurrency)
+
+    output_dir = os.path.abspath(output_dir)
+    doc_paths = find_documents(input_spec)
+    names = assign_output_names(doc_paths)
+    summary = BatchSummary(os.path.join(output_dir, constants.BATCH_SUMMARY_FILE_NAME))
+    pending = [doc_path for doc_path in doc_paths if not (resume and summary.is_done(names[doc_path], doc_path))]
+
+    workers = workers or os.cpu_count() or 1
+    jobs = jobs or workers
+    print(f"共 {len(doc_paths)} 个文档，已完成 {len(doc_paths) - len(pending)} 个，待处理 {len(pending)} 个"
+          f"（进程数: {workers}，同时处理文档数: {jobs}，LLM并发上限: {llm_concurrency}）")
+
+    start_time = time.perf_counter()
+    semaphore = asyncio.Semaphore(max(1, jobs))
+    finished = 0
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(log_level,)) as executor:
+        async def _run(doc_path: str):
+            nonlocal finished
+            async with semaphore:
+                entry = await process_document(doc_path, names[doc_path], output_dir, executor)
+            summary.record(names[doc_path], entry)
+            finished += 1
+            status = "成功" if entry["status"] == "ok" else f"失败（{entry.get('error')}）"
+            print(f"[{finished}/{len(pending)}] {names[doc_path]}: {status}，耗时 {entry['timings']['total']:.2f} 秒")
+
+        await asyncio.gather(*(_run(doc_path) for doc_path in pending))
+
+    totals = summary.totals
+    print(f"批量处理完成，本次耗时 {time.perf_counter() - start_time:.2f} 秒："
+          f"成功 {totals['ok']} 个，失败 {totals['failed']} 个，汇总文件: {summary.path}")
+    if llm_manager.cache and llm_manager.cache.enabled:
+        stats = llm_manager.cache.stats
+        print(f"LLM响应缓存: 命中 {stats['hits']} 次，未命中 {stats['misses']} 次，命中率 {stats['hit_rate']:.0%}")
+    if table_layout_store.enabled:
+        stats = table_layout_store.stats
+        print(f"表格布局记忆: 命中 {stats['hits']} 次，未命中 {stats['misses']} 次，命中率 {stats['hit_rate']:.0%}")
+    if image_preclassifier.enabled:
+        stats = image_preclassifier.stats
+        print(f"图片预分类: 本地识别 {stats['hits']} 张，交给LLM {stats['misses']} 张，本地识别率 {stats['hit_rate']:.0%}")
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量将Word文档转换为模板")
+    parser.add_argument("input", help="输入目录或通配符，如 reports/ 或 \"reports/**/*.docx\"")
+    parser.add_argument("output", help="输出目录")
+    parser.add_argument("--workers", type=int, default=None, help="进程池大小，默认为CPU核数")
+    parser.add_argument("--jobs", type=int, default=None, help="同时处理的文档数量，默认与 --workers 相同")
+    parser.add_argument("--llm-concurrency", type=int, default=constants.LLM_MAX_CONCURRENCY, help="所有文档共享的LLM并发请求上限")
+    parser.add_argument("--no-resume", action="store_true", help="忽略已有的汇总文件，重新处理所有文档")
+    parser.add_argument("--log-level", default="warn", choices=["debug", "info", "warn"], help="处理过程的日志级别")
+    args = parser.parse_args()
+
+    totals = asyncio.run(run_batch(
+        args.input, args.output,
+        workers=args.workers,
+        jobs=args.jobs,
+        llm_concurrency=args.llm_concurrency,
+        resume=not args.no_resume,
+        log_level=args.log_level,
+    ))
+    raise SystemExit(1 if totals["failed"] else 0)
+
+
+# 直接运行时的入口点
+if __name__ == "__main__":
+    main()
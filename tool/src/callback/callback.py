@@ -1,40 +1,190 @@
 ﻿"""回调函数模块，提供标准输出回调"""
+import asyncio
+import contextvars
+from global_define.constants import (
+    CALLBACK_LOG_LEVEL, CALLBACK_FLUSH_INTERVAL_SECONDS,
+    CALLBACK_FLUSH_MAX_MESSAGES, CALLBACK_FLUSH_MAX_BYTES
+)
+
+# 日志级别，数值越大越重要
+LOG_LEVELS = {"debug": 10, "info": 20, "warn": 30}
+
+# 消息类型和任务ID按异步任务隔离，并发执行的多个任务各自设置，互不影响
+_message_type = contextvars.ContextVar("message_type", default=1)  # 默认消息类型
+_job_id = contextvars.ContextVar("job_id", default=None)
+
 
 class CallbackHandler:
-    """回调处理类，提供标准输出和连接状态管理"""
-    
-    def __init__(self):
-        """初始化回调处理器"""
+    """
+    回调处理类，提供标准输出和连接状态管理
+    消息按级别过滤后先进入缓冲区，按时间或大小预算合并成一帧发送，避免逐行发送造成前端卡顿
+    """
+
+    def __init__(self,
+                 level: str = CALLBACK_LOG_LEVEL,
+                 flush_interval: float = CALLBACK_FLUSH_INTERVAL_SECONDS,
+                 max_messages: int = CALLBACK_FLUSH_MAX_MESSAGES,
+                 max_bytes: int = CALLBACK_FLUSH_MAX_BYTES):
+        """
+        初始化回调处理器
+
+        Args:
+            level: 日志级别（debug/info/warn），低于该级别的消息直接丢弃
+            flush_interval: 缓冲消息最长等待时间（秒），为0时每条消息立即发送
+            max_messages: 缓冲消息条数上限，达到后立即发送
+            max_bytes: 缓冲消息字节数上限，达到后立即发送
+        """
         self._ws_client = None
-        self._message_type = 1  # 默认消息类型
-        
+        self.level = level
+        self.flush_interval = flush_interval
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        self._buffer = []          # [(消息类型, 任务ID, 级别, 消息)]
+        self._buffer_bytes = 0
+        self._progress = {}        # (消息类型, 任务ID, 阶段) -> 最新的进度事件，同一阶段只发送最新的一条
+        self._flush_task = None
+        self._flush_lock = asyncio.Lock()
+
     def set_websocket_client(self, ws_client):
         """设置WebSocket客户端实例"""
         self._ws_client = ws_client
-        
+
     def set_websocket_message_type(self, message_type):
-        """设置WebSocket消息类型"""
-        self._message_type = message_type
-        
-    async def output_callback(self, content: str):
+        """设置当前异步任务的WebSocket消息类型"""
+        _message_type.set(message_type)
+
+    def set_job_id(self, job_id):
+        """设置当前异步任务的任务ID，发送的帧会带上 jobId 以便区分并发任务的消息"""
+        _job_id.set(job_id)
+
+    @property
+    def _connected(self) -> bool:
+        """是否已连接WebSocket；未连接时消息直接打印到标准输出，不做缓冲"""
+        return bool(self._ws_client and self._ws_client.websocket)
+
+    def set_log_level(self, level: str):
+        """设置日志级别（debug/info/warn）"""
+        if level not in LOG_LEVELS:
+            raise ValueError(f"未知的日志级别: {level}")
+        self.level = level
+
+    def is_enabled(self, level: str) -> bool:
+        """判断该级别的消息是否会被发送，调用方可据此跳过昂贵的消息构造（如逐单元格的网格详情）"""
+        return LOG_LEVELS[level] >= LOG_LEVELS[self.level]
+
+    async def output_callback(self, content: str, level: str = "info"):
         """
         标准输出回调方法
         :param content: 要输出的内容字符串
+        :param level: 日志级别（debug/info/warn）
         """
-        if self._ws_client and self._ws_client.websocket:
-            await self._ws_client.send({"type": self._message_type, "progressMessage": content})
-        else:
+        if not self.is_enabled(level):
+            return
+        if not self._connected:
             print(content)
+            return
+        self._buffer.append((_message_type.get(), _job_id.get(), level, content))
+        self._buffer_bytes += len(content.encode('utf-8'))
+        await self._schedule_flush()
+
+    async def debug(self, content: str):
+        """输出debug级别消息"""
+        await self.output_callback(content, "debug")
+
+    async def info(self, content: str):
+        """输出info级别消息"""
+        await self.output_callback(content, "info")
+
+    async def warn(self, content: str):
+        """输出warn级别消息"""
+        await self.output_callback(content, "warn")
+
+    async def progress(self, stage: str, done: int, total: int):
+        """
+        结构化进度事件
+        :param stage: 阶段名称
+        :param done: 已完成数量
+        :param total: 总数量
+        同一阶段在一帧内只保留最新的进度，阶段完成时立即发送；与info级别消息一同过滤
+        """
+        if not self.is_enabled("info"):
+            return
+        if not self._connected:
+            if done >= total:
+                print(f"{stage}: {done}/{total}")
+            return
+        self._progress[(_message_type.get(), _job_id.get(), stage)] = {"stage": stage, "done": done, "total": total}
+        if done >= total:
+            await self.flush()
+        else:
+            await self._schedule_flush()
 
     async def end_callback(self, content: str):
         """
-        结束回调方法，发送带 isFinished 标记的消息
+        结束回调方法，先发送缓冲中的消息，再发送带 isFinished 标记的消息
         :param content: 要输出的内容字符串
         """
-        if self._ws_client and self._ws_client.websocket:
-            await self._ws_client.send({"type": self._message_type, "progressMessage": content, "isFinished": 1})
+        await self.flush()
+        if self._connected:
+            frame = {"type": _message_type.get(), "progressMessage": content, "isFinished": 1}
+            if _job_id.get() is not None:
+                frame["jobId"] = _job_id.get()
+            await self._ws_client.send(frame)
         else:
             print(content)
 
+    async def flush(self):
+        """立即发送缓冲区中的所有消息和进度事件"""
+        if self._flush_task:
+            self._flush_task.cancel()
+            self._flush_task = None
+
+        async with self._flush_lock:
+            if not self._buffer and not self._progress:
+                return
+            logs, progress = self._buffer, self._progress
+            self._buffer, self._buffer_bytes, self._progress = [], 0, {}
+
+            # 按 (消息类型, 任务ID) 分组，每组合并为一帧
+            groups = {}
+            for message_type, job_id, level, message in logs:
+                groups.setdefault((message_type, job_id), ([], []))[0].append((level, message))
+            for (message_type, job_id, _), event in progress.items():
+                groups.setdefault((message_type, job_id), ([], []))[1].append(event)
+
+            for (message_type, job_id), (group_logs, group_progress) in groups.items():
+                # progressMessage 保留为纯文本，兼容只显示文本的前端；logs/progress 为结构化内容
+                lines = [message for _, message in group_logs]
+                lines.extend(f"{event['stage']}: {event['done']}/{event['total']}" for event in group_progress)
+                frame = {"type": message_type, "progressMessage": "\n".join(lines)}
+                if job_id is not None:
+                    frame["jobId"] = job_id
+                if group_logs:
+                    frame["logs"] = [{"level": level, "message": message} for level, message in group_logs]
+                if group_progress:
+                    frame["progress"] = group_progress
+
+                if self._connected:
+                    await self._ws_client.send(frame)
+                else:
+                    for line in lines:
+                        print(line)
+
+    async def _schedule_flush(self):
+        """缓冲区超出大小预算时立即发送，否则在 flush_interval 后发送"""
+        if (self.flush_interval <= 0
+                or len(self._buffer) >= self.max_messages
+                or self._buffer_bytes >= self.max_bytes):
+            await self.flush()
+            return
+        if self._flush_task is None:
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_later())
+
+    async def _flush_later(self):
+        """等待 flush_interval 后发送；开始发送前解除登记，避免发送过程中被取消"""
+        await asyncio.sleep(self.flush_interval)
+        self._flush_task = None
+        await self.flush()
+
 # 创建全局单例实例
-callback_handler = CallbackHandler()
\ No newline at end of file
+callback_handler = CallbackHandler()
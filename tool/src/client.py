@@ -5,8 +5,9 @@ import requests
 import os
 from global_define.constants import (
     WS_MESSAGE_TYPE, WS_SERVER_URL, CLIENT_NAME, HTTP_SERVER_URL,
-    TEMPLATE_UPLOAD_FILENAME, TEMPLATE_MIME_TYPE
+    TEMPLATE_UPLOAD_FILENAME, TEMPLATE_MIME_TYPE, MAX_CONCURRENT_JOBS
 )
+from task.job_pool import JobPool
 
 class WebSocketClient:
     def __init__(self, url, client_name, on_message=None):
@@ -41,6 +42,9 @@ class WebSocketClient:
             if self.on_message:
                 await self.on_message(message)
 
+# 文档处理/保存任务在任务池中执行，多个文档可同时处理，接收循环不被阻塞
+job_pool = JobPool(MAX_CONCURRENT_JOBS)
+
 # 用法示例
 async def on_message(msg):
     from callback.callback import callback_handler
@@ -57,35 +61,39 @@ async def on_message(msg):
         data = json.loads(msg)
         if isinstance(data, dict) and data.get("type") == WS_MESSAGE_TYPE['DOC_PROCESS_START'] and data.get("docPath"):
             doc_path = data["docPath"]
-            await startProcessTask(doc_path)
+            job_pool.submit(startProcessTask(doc_path, publish=True))
         elif isinstance(data, dict) and data.get("type") == WS_MESSAGE_TYPE['DOC_SAVE_START'] and data.get("htmlPath"):
             html_path = data["htmlPath"]
-            await startSaveTask(html_path)
+            job_pool.submit(startSaveTask(html_path))
         
     except json.JSONDecodeError:
         await callback_handler.output_callback("消息不是有效的JSON格式")
     except Exception as e:
-        callback_handler.output_callback(f"处理消息时出错: {str(e)}")
+        await callback_handler.output_callback(f"处理消息时出错: {str(e)}")
 
 # 单例 WebSocketClient 实例，可被其它模块直接引用
 ws_client = WebSocketClient(WS_SERVER_URL, CLIENT_NAME, on_message)
 
 
-async def upload_template(template_path: str, server_url: str = HTTP_SERVER_URL):
+async def upload_template(template, server_url: str = HTTP_SERVER_URL):
     """
     上传模板文件到服务器
-    :param template_path: 模板文件路径
+    :param template: 模板文件路径，或包含模板内容的二进制缓冲区（如 io.BytesIO）
     :param server_url: 服务器地址
     :return: 上传结果
     """
     try:
-        if not os.path.exists(template_path):
-            raise FileNotFoundError(f"模板文件不存在: {template_path}")
-        
         url = f"{server_url}/template"
-        
-        with open(template_path, 'rb') as file:
-            files = {'file': (TEMPLATE_UPLOAD_FILENAME, file, TEMPLATE_MIME_TYPE)}
+
+        if isinstance(template, str):
+            if not os.path.exists(template):
+                raise FileNotFoundError(f"模板文件不存在: {template}")
+            with open(template, 'rb') as file:
+                files = {'file': (TEMPLATE_UPLOAD_FILENAME, file, TEMPLATE_MIME_TYPE)}
+                response = requests.post(url, files=files)
+        else:
+            template.seek(0)
+            files = {'file': (TEMPLATE_UPLOAD_FILENAME, template, TEMPLATE_MIME_TYPE)}
             response = requests.post(url, files=files)
         
         if response.status_code == 200:
@@ -0,0 +1,161 @@
+"""
+文档上下文模块 - 在各处理阶段之间共享已解析的HTML文档
+一次任务只解析一次HTML，各阶段直接修改内存中的文档树，最后统一写回任务工作区
+"""
+import os
+import json
+from bs4 import BeautifulSoup
+from global_define.constants import ATTR_CELL_ID, ATTR_JOB_ID
+from context.workspace import Workspace
+
+
+class DocumentContext:
+    """文档上下文类，持有解析后的HTML树、表格列表、图片映射、占位符映射和表格几何索引"""
+
+    def __init__(self, doc_path: str = None, html_path: str = None, workspace: Workspace = None):
+        """
+        初始化文档上下文
+
+        Args:
+            doc_path: 源Word文档路径，默认为 constants.DEFAULT_DOC_PATH（仅在未指定 workspace 时使用）
+            html_path: HTML文件路径，默认为 constants.DEFAULT_HTML_PATH（仅在未指定 workspace 时使用）
+            workspace: 任务工作区，默认为使用全局路径的共享工作区
+        """
+        self.workspace = workspace or Workspace.default(doc_path, html_path)
+        self.soup: BeautifulSoup = None
+        self.tables: list[str] = []       # 提取出的简化表格HTML字符串列表
+        self.image_map: dict = {}         # HTML img索引 -> Word内部media文件名
+        self.placeholder_map: dict = {}   # HTML img索引 -> 占位符图片文件名
+        self.cell_index: dict = {}        # data-cell-id -> 单元格Tag
+        self.table_geometry: dict = {}    # data-cell-id -> Word表格中的位置（见 converter.table_geometry）
+        self.table_stats: dict = {}       # 表格替换阶段的统计（LLM调用次数、复用布局节省的调用次数），不写入磁盘
+        self.image_stats: dict = {}       # 图片识别阶段的统计（发送给LLM的图片字节数、缩略图节省的字节数），不写入磁盘
+
+    @classmethod
+    def from_html_file(cls, html_path: str = None, doc_path: str = None) -> "DocumentContext":
+        """
+        从已有的HTML文件和映射文件创建上下文（用于保存任务）
+        HTML中记录了任务ID时使用该任务的工作区（源文档、映射文件），否则使用共享工作区
+        """
+        ctx = cls(doc_path, html_path)
+        ctx.load_html()
+        body = ctx.soup.find('body')
+        job_id = body.get(ATTR_JOB_ID) if body else None
+        workspace = Workspace.load(job_id) if job_id else None
+        if workspace:
+            workspace.html_path = ctx.html_path
+            workspace.doc_path = doc_path or workspace.doc_path
+            ctx.workspace = workspace
+        ctx.load_maps()
+        return ctx
+
+    @property
+    def doc_path(self) -> str:
+        return self.workspace.doc_path
+
+    @property
+    def html_path(self) -> str:
+        return self.workspace.html_path
+
+    @property
+    def html_dir(self) -> str:
+        """HTML文件所在目录，用于计算img src的相对路径"""
+        return os.path.dirname(self.html_path)
+
+    def load_html(self) -> None:
+        """从 html_path 读取并解析HTML"""
+        try:
+            with open(self.html_path, 'r', encoding='utf-8') as f:
+                html_content = f.read()
+        except UnicodeDecodeError:
+            with open(self.html_path, 'r', encoding='gbk') as f:
+                html_content = f.read()
+        self.soup = BeautifulSoup(html_content, 'html.parser')
+        self.build_cell_index()
+
+    def build_cell_index(self) -> None:
+        """遍历一次HTML树，建立 data-cell-id 到单元格Tag的索引"""
+        self.cell_index = {cell[ATTR_CELL_ID]: cell for cell in self.soup.find_all(attrs={ATTR_CELL_ID: True})} if self.soup else {}
+
+    def find_cell(self, cell_id: str):
+        """
+        按 data-cell-id 查找单元格，O(1)
+        修改单元格内容不影响索引；若单元格Tag已被替换或移出文档树，则重建一次索引
+        """
+        cell = self.cell_index.get(cell_id)
+        if cell is None or (cell.get(ATTR_CELL_ID) == cell_id and self._is_attached(cell)):
+            return cell
+        self.build_cell_index()
+        return self.cell_index.get(cell_id)
+
+    def _is_attached(self, tag) -> bool:
+        """判断Tag是否仍在当前HTML树中"""
+        for parent in tag.parents:
+            if parent is self.soup:
+                return True
+        return False
+
+    def load_maps(self) -> None:
+        """读取图片映射、占位符映射和表格几何索引文件（文件不存在时保持为空）"""
+        self.image_map = _load_json(self.workspace.image_map_path)
+        self.placeholder_map = _load_json(self.workspace.placeholder_map_path)
+        self.table_geometry = _load_json(self.workspace.table_geometry_path)
+
+    def save_html(self) -> None:
+        """将内存中的HTML树写回 html_path，并在body上记录任务ID"""
+        if self.soup is None:
+            return
+        body = self.soup.find('body')
+        if body and self.workspace.job_id:
+            body[ATTR_JOB_ID] = self.workspace.job_id
+        os.makedirs(self.html_dir, exist_ok=True)
+        with open(self.html_path, 'w', encoding='utf-8') as f:
+            f.write(str(self.soup))
+
+    def export_html(self, path: str) -> None:
+        """将HTML另存到 path，img的相对src改写为相对新位置，内存中的HTML树保持不变"""
+        if self.soup is None:
+            return
+        target_dir = os.path.dirname(path)
+        rebased = []
+        for img in self.soup.find_all('img'):
+            src = img.get('src')
+            if src and not _is_absolute_src(src):
+                rebased.append((img, src))
+                img['src'] = os.path.relpath(os.path.join(self.html_dir, src), target_dir).replace("\\", "/")
+        try:
+            os.makedirs(target_dir, exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(str(self.soup))
+        finally:
+            for img, src in rebased:
+                img['src'] = src
+
+    def save_maps(self) -> None:
+        """保存图片映射、占位符映射和表格几何索引文件"""
+        _save_json(self.workspace.image_map_path, self.image_map)
+        _save_json(self.workspace.placeholder_map_path, self.placeholder_map)
+        _save_json(self.workspace.table_geometry_path, self.table_geometry)
+
+    def save(self) -> None:
+        """将HTML和映射文件一次性写回磁盘"""
+        self.save_html()
+        self.save_maps()
+
+
+def _is_absolute_src(src: str) -> bool:
+    """data:、http(s): 等带协议的地址和以/开头的地址不做改写"""
+    return src.startswith('/') or ':' in src.split('/', 1)[0]
+
+
+def _load_json(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _save_json(path: str, data: dict) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=4)
@@ -0,0 +1,97 @@
+"""
+任务工作区模块 - 一次任务的输入文档、临时目录和输出文件路径
+每个任务在 constants.JOBS_DIR 下使用独立目录，多个文档可以同时处理而不互相覆盖
+"""
+import os
+import json
+import uuid
+import shutil
+from global_define import constants
+
+
+class Workspace:
+    """任务工作区类，集中管理一个任务读写的所有路径"""
+
+    def __init__(self,
+                 root_dir: str,
+                 doc_path: str,
+                 job_id: str = None,
+                 html_path: str = None,
+                 unzip_dir: str = None,
+                 extract_dir: str = None,
+                 template_path: str = None):
+        """
+        初始化任务工作区
+
+        Args:
+            root_dir: 工作区根目录
+            doc_path: 输入的Word文档路径
+            job_id: 任务ID，共享工作区（Workspace.default）为None
+            html_path: 输出HTML路径，默认为 root_dir/document.html
+            unzip_dir: Word文档解压的临时目录，默认为 root_dir/unzip
+            extract_dir: 提取的表格、图片和映射文件目录，默认为 root_dir/document_extract
+            template_path: 生成的模板文档路径，默认为 root_dir/template.docx
+        """
+        self.root_dir = root_dir
+        self.doc_path = doc_path
+        self.job_id = job_id
+        self.html_path = html_path or os.path.join(root_dir, constants.HTML_FILE_NAME)
+        self.unzip_dir = unzip_dir or os.path.join(root_dir, constants.UNZIP_DIR_NAME)
+        self.extract_dir = extract_dir or os.path.join(root_dir, constants.EXTRACT_DIR_NAME)
+        self.template_path = template_path or os.path.join(root_dir, constants.TEMPLATE_FILE_NAME)
+
+    @classmethod
+    def default(cls, doc_path: str = None, html_path: str = None) -> "Workspace":
+        """共享工作区，使用 constants 中的全局路径（单文档处理和旧版HTML使用）"""
+        return cls(
+            root_dir=constants.DOCUMENT_DIR,
+            doc_path=doc_path or constants.DEFAULT_DOC_PATH,
+            html_path=html_path or constants.DEFAULT_HTML_PATH,
+            unzip_dir=constants.UNZIP_DIR,
+            extract_dir=constants.EXTRACT_DIR,
+            template_path=constants.DEFAULT_TEMPLATE_DOC_PATH,
+        )
+
+    @classmethod
+    def create(cls, doc_path: str, jobs_dir: str = constants.JOBS_DIR, html_path: str = None) -> "Workspace":
+        """为新任务创建独立的工作区目录并写入清单文件"""
+        job_id = uuid.uuid4().hex[:12]
+        workspace = cls(os.path.join(jobs_dir, job_id), os.path.abspath(doc_path), job_id=job_id, html_path=html_path)
+        os.makedirs(workspace.root_dir, exist_ok=True)
+        workspace.save_manifest()
+        return workspace
+
+    @classmethod
+    def load(cls, job_id: str, jobs_dir: str = constants.JOBS_DIR):
+        """根据任务ID读取已有的工作区，不存在时返回None"""
+        manifest_path = os.path.join(jobs_dir, job_id, constants.WORKSPACE_MANIFEST_FILE_NAME)
+        if not os.path.exists(manifest_path):
+            return None
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        return cls(os.path.join(jobs_dir, job_id), manifest["doc_path"], job_id=job_id, html_path=manifest.get("html_path"))
+
+    @property
+    def image_map_path(self) -> str:
+        return os.path.join(self.extract_dir, constants.IMAGE_MAP_FILE_NAME)
+
+    @property
+    def placeholder_map_path(self) -> str:
+        return os.path.join(self.extract_dir, constants.IMAGE_PLACEHOLDER_MAP_FILE_NAME)
+
+    @property
+    def table_geometry_path(self) -> str:
+        return os.path.join(self.extract_dir, constants.TABLE_GEOMETRY_FILE_NAME)
+
+    def save_manifest(self) -> None:
+        """记录输入文档和输出HTML路径，保存任务据此找回工作区"""
+        if self.job_id is None:
+            return
+        manifest = {"job_id": self.job_id, "doc_path": self.doc_path, "html_path": self.html_path}
+        with open(os.path.join(self.root_dir, constants.WORKSPACE_MANIFEST_FILE_NAME), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=4)
+
+    def cleanup_temp(self) -> None:
+        """删除任务的临时解压目录（共享工作区保留原有行为，不删除）"""
+        if self.job_id is not None and os.path.exists(self.unzip_dir):
+            shutil.rmtree(self.unzip_dir, ignore_errors=True)
@@ -0,0 +1,181 @@
+"""
+文档转换缓存 - 以Word文档内容的SHA-256和转换器版本为键，保存标记后的HTML、表格几何索引和后续步骤需要的包部件
+未变化的文档再次处理时直接读取缓存，跳过PyDocX转换和解压
+"""
+import os
+import json
+import time
+import shutil
+import hashlib
+from global_define import constants
+
+# 缓存条目中的文件
+HTML_ENTRY_FILE_NAME = "document.html"
+GEOMETRY_ENTRY_FILE_NAME = "table_geometry.json"
+PARTS_ENTRY_DIR_NAME = "parts"
+META_ENTRY_FILE_NAME = "meta.json"  # 写入完成的标记，修改时间用于LRU淘汰
+
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def hash_file(path: str) -> str:
+    """分块计算文件内容的SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ConversionCache:
+    """
+    转换缓存类 - 每个条目是一个目录：标记后的HTML、包部件和元数据
+    按总大小上限以最近访问时间淘汰旧条目
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 500 * 1024 * 1024, enabled: bool = True):
+        """
+        初始化转换缓存
+
+        Args:
+            cache_dir: 缓存目录
+            max_bytes: 缓存总大小上限，超出后按最近访问时间淘汰最旧的条目
+            enabled: 是否启用缓存
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(doc_path: str, converter_version: str) -> str:
+        """文档内容哈希与转换器版本共同决定缓存键，转换逻辑变化时旧条目自动失效"""
+        payload = f"{converter_version}:{hash_file(doc_path)}"
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def get(self, key: str, parts_dir: str):
+        """
+        读取缓存的HTML和表格几何索引，返回 (HTML, 几何索引)，并将缓存的包部件放到 parts_dir（优先使用硬链接，无需复制数据）
+        未命中或缓存关闭时返回None
+        """
+        if not self.enabled:
+            return None
+
+        entry_dir = self._entry_dir(key)
+        meta_path = os.path.join(entry_dir, META_ENTRY_FILE_NAME)
+        try:
+            if not os.path.exists(meta_path):
+                self.misses += 1
+                return None
+            with open(os.path.join(entry_dir, HTML_ENTRY_FILE_NAME), 'r', encoding='utf-8') as f:
+                html_content = f.read()
+            with open(os.path.join(entry_dir, GEOMETRY_ENTRY_FILE_NAME), 'r', encoding='utf-8') as f:
+                table_geometry = json.load(f)
+            if os.path.exists(parts_dir):
+                shutil.rmtree(parts_dir)
+            shutil.copytree(os.path.join(entry_dir, PARTS_ENTRY_DIR_NAME), parts_dir, copy_function=_link_or_copy)
+            os.utime(meta_path)  # 记录最近访问时间，用于LRU淘汰
+            self.hits += 1
+            return html_content, table_geometry
+        except (OSError, ValueError) as e:
+            print(f"读取转换缓存失败: {e}")
+            self.misses += 1
+            return None
+
+    def put(self, key: str, html_content: str, parts_dir: str, table_geometry: dict = None) -> None:
+        """写入一个条目（HTML、表格几何索引和 parts_dir 下的包部件），并在超出大小上限时淘汰旧条目"""
+        if not self.enabled:
+            return
+
+        entry_dir = self._entry_dir(key)
+        tmp_dir = f"{entry_dir}.tmp{os.getpid()}"
+        try:
+            if os.path.exists(tmp_dir):
+                shutil.rmtree(tmp_dir)
+            os.makedirs(tmp_dir)
+            with open(os.path.join(tmp_dir, HTML_ENTRY_FILE_NAME), 'w', encoding='utf-8') as f:
+                f.write(html_content)
+            with open(os.path.join(tmp_dir, GEOMETRY_ENTRY_FILE_NAME), 'w', encoding='utf-8') as f:
+                json.dump(table_geometry or {}, f)
+            shutil.copytree(parts_dir, os.path.join(tmp_dir, PARTS_ENTRY_DIR_NAME))
+            with open(os.path.join(tmp_dir, META_ENTRY_FILE_NAME), 'w', encoding='utf-8') as f:
+                json.dump({"created": time.time()}, f)
+
+            # 整个目录写完后再换名，读取方不会看到写了一半的条目
+            if os.path.exists(entry_dir):
+                shutil.rmtree(entry_dir)
+            os.replace(tmp_dir, entry_dir)
+            self._evict()
+        except OSError as e:
+            print(f"写入转换缓存失败: {e}")
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def clear(self) -> None:
+        """清空缓存目录"""
+        for entry_dir, _, _ in self._scan():
+            shutil.rmtree(entry_dir, ignore_errors=True)
+
+    @property
+    def stats(self) -> dict:
+        """返回命中统计"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def _scan(self):
+        """返回 [(条目目录, 最近访问时间, 大小), ...]，忽略未写完的条目"""
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for name in os.listdir(self.cache_dir):
+            entry_dir = os.path.join(self.cache_dir, name)
+            try:
+                mtime = os.stat(os.path.join(entry_dir, META_ENTRY_FILE_NAME)).st_mtime
+            except OSError:
+                continue
+            entries.append((entry_dir, mtime, _dir_size(entry_dir)))
+        return entries
+
+    def _evict(self) -> None:
+        """按最近访问时间从旧到新删除条目，直到总大小不超过上限"""
+        entries = sorted(self._scan(), key=lambda entry: entry[1])
+        total = sum(size for _, _, size in entries)
+        for entry_dir, _, size in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
+
+
+def _link_or_copy(src: str, dst: str) -> None:
+    """缓存中的部件只读使用，硬链接即可；跨文件系统等无法链接时复制"""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                continue
+    return total
+
+
+# 全局单例实例
+conversion_cache = ConversionCache(
+    constants.CONVERSION_CACHE_DIR,
+    max_bytes=constants.CONVERSION_CACHE_MAX_BYTES,
+    enabled=constants.CONVERSION_CACHE_ENABLED
+)
@@ -5,47 +5,101 @@ from pydocx import PyDocX
 from callback.callback import callback_handler
 import os
 from bs4 import BeautifulSoup
-import xml.etree.ElementTree as ET
 import zipfile
 import tempfile
 import json # 导入json模块
-from global_define.constants import ATTR_DIAGONAL_SPLIT_TYPE, ATTR_HAS_NESTED_TABLE, ATTR_CELL_ID, ATTR_HAS_IMG, DEFAULT_DOC_PATH, DEFAULT_HTML_PATH, WORD_INTERNAL_DIR, DOCUMENT_XML_FILE_NAME, MEDIA_INTERNAL_DIR, IMAGE_MAP_PATH, UNZIP_DIR
+from global_define.constants import ATTR_DIAGONAL_SPLIT_TYPE, ATTR_HAS_NESTED_TABLE, ATTR_CELL_ID, ATTR_HAS_IMG, WORD_INTERNAL_DIR, DOCUMENT_XML_FILE_NAME, MEDIA_INTERNAL_DIR
 from global_define import constants
+from context.document_context import DocumentContext
+from converter.conversion_cache import conversion_cache
+from converter.native_converter import convert_to_marked_html
+from converter.table_geometry import build_table_geometry
+import pydocx
 from PIL import Image
 import base64
 import io
 import shutil
+import asyncio
 
 
-async def convert_document():
-    """使用PyDocX库将Word文件完整转换为HTML并添加标记"""
+# 转换器版本：修改转换或单元格标记逻辑时递增，使转换缓存中的旧条目失效
+CONVERTER_VERSION = f"2-pydocx{pydocx.__version__}"
+NATIVE_CONVERTER_VERSION = "2-native"
+
+# 后续步骤需要的包部件（正文、正文关系和media），只解压这些部件
+PACKAGE_PARTS_TO_EXTRACT = (
+    f"{WORD_INTERNAL_DIR}/{DOCUMENT_XML_FILE_NAME}",
+    f"{WORD_INTERNAL_DIR}/_rels/{DOCUMENT_XML_FILE_NAME}.rels",
+    f"{WORD_INTERNAL_DIR}/{MEDIA_INTERNAL_DIR}/",
+)
+
+
+async def convert_document(ctx: DocumentContext):
+    """将Word文件完整转换为HTML并添加标记（后端见 constants.CONVERTER_BACKEND），结果保存在上下文中"""
     try:
-        html_content = get_html_from_document()
-        with open(DEFAULT_HTML_PATH, 'w', encoding='utf-8') as f:
-            f.write(html_content)
-        await callback_handler.output_callback(f"成功导出HTML: {DEFAULT_HTML_PATH}")
+        # 转换是CPU密集的同步操作，放到线程中执行，避免阻塞其它并发任务的事件循环
+        ctx.soup, ctx.cell_index, ctx.table_geometry = await asyncio.to_thread(get_soup_from_document, ctx.doc_path, ctx.workspace.unzip_dir)
+        await callback_handler.output_callback(f"成功转换HTML: {ctx.doc_path}")
+        if conversion_cache.enabled:
+            stats = conversion_cache.stats
+            await callback_handler.output_callback(f"文档转换缓存（本进程累计）: 命中 {stats['hits']} 次，未命中 {stats['misses']} 次，命中率 {stats['hit_rate']:.0%}")
         
     except Exception as e:
         await callback_handler.output_callback(f"导出失败: {e}")
 
 
-def get_html_from_document():
-    """使用PyDocX库将Word文件完整转换为HTML并添加标记"""
-    html_content = PyDocX.to_html(DEFAULT_DOC_PATH)
-    
-    # 解压Word文档到UNZIP_DIR
-    if os.path.exists(constants.UNZIP_DIR):
-        shutil.rmtree(constants.UNZIP_DIR)
-    os.makedirs(constants.UNZIP_DIR)
-    with zipfile.ZipFile(DEFAULT_DOC_PATH, 'r') as zip_ref:
-        zip_ref.extractall(constants.UNZIP_DIR)
-        
-    soup = _mark_cells(html_content)
-    return str(soup)
+def get_soup_from_document(doc_path: str, unzip_dir: str = constants.UNZIP_DIR, cache=conversion_cache, backend: str = None):
+    """
+    将Word文件完整转换为HTML并添加标记，后续步骤需要的包部件解压到 unzip_dir
+    返回 (解析后的BeautifulSoup对象, data-cell-id -> 单元格Tag 索引, data-cell-id -> Word表格位置 的几何索引)
+    文档内容和转换器版本未变化时直接使用转换缓存中的HTML、几何索引和包部件
 
+    Args:
+        backend: "pydocx" 或 "native"，默认为 constants.CONVERTER_BACKEND
+    """
+    backend = backend or constants.CONVERTER_BACKEND
+    if backend not in constants.CONVERTER_BACKENDS:
+        raise ValueError(f"未知的转换后端: {backend}")
 
-def _mark_cells(html_content):
-    """在HTML转换过程中标记表格单元格"""
+    cache_key = None
+    if cache and cache.enabled:
+        cache_key = cache.make_key(doc_path, NATIVE_CONVERTER_VERSION if backend == "native" else CONVERTER_VERSION)
+        cached = cache.get(cache_key, unzip_dir)
+        if cached is not None:
+            cached_html, table_geometry = cached
+            return (*_soup_with_cell_index(cached_html), table_geometry)
+
+    _extract_package_parts(doc_path, unzip_dir)
+    if backend == "native":
+        # 原生后端生成的HTML已带全部标记，只需解析并建立单元格索引
+        html_content, table_geometry = convert_to_marked_html(doc_path)
+        soup, cell_index = _soup_with_cell_index(html_content)
+    else:
+        cell_index = {}
+        table_geometry = build_table_geometry(doc_path)
+        soup = _mark_cells(PyDocX.to_html(doc_path), table_geometry, cell_index)
+    if cache_key:
+        cache.put(cache_key, str(soup), unzip_dir, table_geometry)
+    return soup, cell_index, table_geometry
+
+
+def _soup_with_cell_index(html_content: str):
+    soup = BeautifulSoup(html_content, 'html.parser')
+    return soup, {cell[ATTR_CELL_ID]: cell for cell in soup.find_all(attrs={ATTR_CELL_ID: True})}
+
+
+def _extract_package_parts(doc_path: str, unzip_dir: str) -> None:
+    """清空 unzip_dir 并只解压 PACKAGE_PARTS_TO_EXTRACT 中的部件"""
+    if os.path.exists(unzip_dir):
+        shutil.rmtree(unzip_dir)
+    os.makedirs(unzip_dir)
+    with zipfile.ZipFile(doc_path, 'r') as zip_ref:
+        members = [name for name in zip_ref.namelist() if name.startswith(PACKAGE_PARTS_TO_EXTRACT)]
+        zip_ref.extractall(unzip_dir, members)
+
+
+def _mark_cells(html_content, table_geometry, cell_index=None):
+    """在HTML转换过程中标记表格单元格，传入 cell_index 时同时记录 data-cell-id -> 单元格Tag"""
     soup = BeautifulSoup(html_content, 'html.parser')
     
     # 设置body为可编辑
@@ -53,25 +107,20 @@ def _mark_cells(html_content):
     if body_tag:
         body_tag['contenteditable'] = 'true'
 
-    xml_path = os.path.join(constants.UNZIP_DIR, WORD_INTERNAL_DIR, DOCUMENT_XML_FILE_NAME)
-    xml_root = ET.parse(xml_path).getroot()
-    xml_tables = xml_root.findall('.//w:tbl', {'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'})
-    
-
     # 标记所有表格单元格 - 处理所有表格，但避免嵌套干扰
     for table_idx, html_table in enumerate(soup.find_all('table')):  # 找到所有表格，包括嵌套的
-        xml_table = xml_tables[table_idx] if table_idx < len(xml_tables) else None
-        
         # 只处理直接属于当前表格的tr，不包括嵌套表格中的tr
         for row_idx, html_row in enumerate(html_table.find_all('tr', recursive=False)):
             # 只处理直接属于当前行的td/th，不包括嵌套表格中的td/th
             for cell_idx, cell in enumerate(html_row.find_all(['td', 'th'], recursive=False)):
                 # 使用实际的表格索引和行列位置
                 cell[ATTR_CELL_ID] = f"table_{table_idx}_cell_{row_idx}_{cell_idx}"
+                if cell_index is not None:
+                    cell_index[cell[ATTR_CELL_ID]] = cell
                 
-                # 检查斜线（只对第一个单元格检查）
-                if row_idx == 0 and cell_idx == 0 and xml_table:
-                    split_type = _check_diagonal_split(xml_table, row_idx, cell_idx)
+                # 检查斜线（只对第一个单元格检查），斜线类型在几何索引中按实际的 w:tc 记录
+                if row_idx == 0 and cell_idx == 0:
+                    split_type = table_geometry.get(cell[ATTR_CELL_ID], {}).get("diagonal")
                     if split_type:
                         cell[ATTR_DIAGONAL_SPLIT_TYPE] = split_type
                 
@@ -93,26 +142,3 @@ def _mark_cells(html_content):
             img_tag['src'] = "data:image/gif;base64,R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7" # 1x1 transparent GIF
 
     return soup # 不再返回image_map
-
-def _check_diagonal_split(xml_table, row_idx, cell_idx):
-    """检查Word XML中的斜线分割"""
-    ns = {'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'}
-    try:
-        xml_rows = xml_table.findall('w:tr', ns)
-        if row_idx >= len(xml_rows):
-            return None
-            
-        xml_cells = xml_rows[row_idx].findall('w:tc', ns)
-        if cell_idx >= len(xml_cells):
-            return None
-            
-        tc_pr = xml_cells[cell_idx].find('w:tcPr', ns)
-        if tc_pr is not None:
-            if tc_pr.find('w:tcBorders/w:tl2br', ns) is not None:
-                return 'tl2br'
-            elif tc_pr.find('w:tcBorders/w:tr2bl', ns) is not None:
-                return 'tr2bl'
-    except:
-        pass
-    return None
-
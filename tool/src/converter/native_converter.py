@@ -0,0 +1,472 @@
+"""
+原生转换器 - 用 iterparse 流式读取 word/document.xml，直接生成带标记的HTML
+单元格ID、斜线分割、内嵌表格和图片标记在同一遍扫描中按实际的 w:tbl/w:tr/w:tc 写入，
+无需先构建完整的文档对象模型再用BeautifulSoup二次解析；同一遍扫描还建立表格几何索引（见 table_geometry）。
+输出结构与PyDocX保持一致（正文段落为 <p>/<hN>，单元格内段落以 <br /> 连接，合并单元格为 colspan/rowspan），
+列表按普通段落输出。
+"""
+import base64
+import html
+import posixpath
+import zipfile
+from lxml import etree
+from converter.table_geometry import GridCell, GridTable, read_cell_properties, resolve_rows, add_table
+from global_define.constants import (
+    ATTR_CELL_ID, ATTR_DIAGONAL_SPLIT_TYPE, ATTR_HAS_NESTED_TABLE, ATTR_HAS_IMG,
+    WORD_INTERNAL_DIR, DOCUMENT_XML_FILE_NAME
+)
+
+W_NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+R_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+A_NS = 'http://schemas.openxmlformats.org/drawingml/2006/main'
+WP_NS = 'http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing'
+V_NS = 'urn:schemas-microsoft-com:vml'
+MC_NS = 'http://schemas.openxmlformats.org/markup-compatibility/2006'
+PACKAGE_RELS_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+
+
+def _w(name: str) -> str:
+    return f'{{{W_NS}}}{name}'
+
+
+W_BODY, W_P, W_R, W_T, W_TBL, W_TR, W_TC = _w('body'), _w('p'), _w('r'), _w('t'), _w('tbl'), _w('tr'), _w('tc')
+W_TC_PR, W_PPR, W_RPR = _w('tcPr'), _w('pPr'), _w('rPr')
+W_SECT_PR = _w('sectPr')
+A_BLIP = f'{{{A_NS}}}blip'
+WP_EXTENT = f'{{{WP_NS}}}extent'
+A_XFRM_EXT = f'{{{A_NS}}}xfrm/{{{A_NS}}}ext'
+V_IMAGEDATA = f'{{{V_NS}}}imagedata'
+V_SHAPE = f'{{{V_NS}}}shape'
+MC_ALTERNATE_CONTENT = f'{{{MC_NS}}}AlternateContent'
+MC_CHOICE = f'{{{MC_NS}}}Choice'
+MC_FALLBACK = f'{{{MC_NS}}}Fallback'
+R_EMBED, R_LINK, R_ID = f'{{{R_NS}}}embed', f'{{{R_NS}}}link', f'{{{R_NS}}}id'
+
+# 段落中直接包含run的容器元素，展开处理其中的run
+_RUN_CONTAINERS = {_w('ins'), _w('smartTag'), _w('fldSimple'), _w('customXml'), _w('sdtContent'), _w('sdt'), _w('dir'), _w('bdo')}
+# 段落中不输出的元素（删除的修订、书签等）
+_SKIPPED_IN_PARAGRAPH = {_w('del'), _w('moveFrom'), _w('pPr'), _w('bookmarkStart'), _w('bookmarkEnd'), _w('proofErr')}
+
+_EMU_PER_PIXEL = 9525
+_EMPTY_IMAGE_SRC = "data:image/gif;base64,R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7"  # 1x1 透明GIF
+
+_STYLE = (
+    ".pydocx-caps {text-transform:uppercase}"
+    ".pydocx-center {text-align:center}"
+    ".pydocx-left {text-align:left}"
+    ".pydocx-right {text-align:right}"
+    ".pydocx-small-caps {font-variant:small-caps}"
+    ".pydocx-strike {text-decoration:line-through}"
+    ".pydocx-tab {display:inline-block;width:4em}"
+    ".pydocx-underline {text-decoration:underline}"
+)
+
+
+class _Fragment:
+    """已生成的一段HTML，以及它是否包含可见文字和图片（用于单元格标记）"""
+    __slots__ = ('html', 'has_text', 'has_img')
+
+    def __init__(self, html_text: str, has_text: bool, has_img: bool):
+        self.html = html_text
+        self.has_text = has_text
+        self.has_img = has_img
+
+
+class NativeConverter:
+    """原生转换器类，一次转换一个docx"""
+
+    def __init__(self, doc_path: str):
+        self.doc_path = doc_path
+        self._zip = None
+        self._relationships = {}   # rId -> (Target部件名或外部地址, 是否外部)
+        self._heading_styles = {}  # styleId -> 标题级别
+        self._media_cache = {}     # 部件名 -> data URI
+        self._body_width = None
+        self.table_geometry = {}   # data-cell-id -> Word表格位置，转换时同时建立
+
+    def convert(self) -> str:
+        """转换整个文档，返回带标记的HTML字符串"""
+        with zipfile.ZipFile(self.doc_path, 'r') as zf:
+            self._zip = zf
+            self._relationships = self._read_relationships()
+            self._heading_styles = self._read_heading_styles()
+            body_parts = self._convert_body()
+        self._zip = None
+
+        style = _STYLE
+        if self._body_width:
+            style += f"body {{margin:0px auto;width:{self._body_width:.2f}em}}"
+        return (
+            f'<html><head><meta charset="utf-8" /><style>{style}</style></head>'
+            f'<body contenteditable="true">{"".join(body_parts)}</body></html>'
+        )
+
+    # --- 包内辅助部件 ---
+
+    def _read_relationships(self) -> dict:
+        rels_name = f"{WORD_INTERNAL_DIR}/_rels/{DOCUMENT_XML_FILE_NAME}.rels"
+        relationships = {}
+        try:
+            root = etree.fromstring(self._zip.read(rels_name))
+        except KeyError:
+            return relationships
+        for rel in root.iter(f'{{{PACKAGE_RELS_NS}}}Relationship'):
+            target = rel.get('Target', '')
+            if rel.get('TargetMode') == 'External':
+                relationships[rel.get('Id')] = (target, True)
+            else:
+                part = target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join(WORD_INTERNAL_DIR, target))
+                relationships[rel.get('Id')] = (part, False)
+        return relationships
+
+    def _read_heading_styles(self) -> dict:
+        """样式名为 heading 1..6 的段落样式输出为 h1..h6"""
+        headings = {}
+        try:
+            root = etree.fromstring(self._zip.read(f"{WORD_INTERNAL_DIR}/styles.xml"))
+        except KeyError:
+            return headings
+        for style in root.iter(_w('style')):
+            name_element = style.find(_w('name'))
+            name = (name_element.get(_w('val'), '') if name_element is not None else '').lower()
+            if name.startswith('heading ') and name[8:].isdigit() and 1 <= int(name[8:]) <= 6:
+                headings[style.get(_w('styleId'))] = int(name[8:])
+        return headings
+
+    def _media_data_uri(self, rel_id: str):
+        rel = self._relationships.get(rel_id)
+        if not rel or rel[1]:
+            return None
+        part = rel[0]
+        if part not in self._media_cache:
+            try:
+                data = self._zip.read(part)
+            except KeyError:
+                self._media_cache[part] = None
+            else:
+                ext = posixpath.splitext(part)[1].lstrip('.').lower()
+                mime = 'image/jpeg' if ext in ('jpg', 'jpeg') else f'image/{ext}'
+                self._media_cache[part] = f"data:{mime};base64,{base64.b64encode(data).decode('ascii')}"
+        return self._media_cache[part]
+
+    # --- 正文流式解析 ---
+
+    def _convert_body(self) -> list[str]:
+        body_parts = []
+        tables = []           # 当前打开的表格栈
+        cells = []            # 当前打开的单元格栈（与表格栈对应）
+        paragraph_depth = 0   # 文本框等会在段落内嵌套段落，只在最外层段落结束时输出
+        table_count = 0
+        table_ordinal = 0     # 文档中所有 w:tbl 的顺序号（包括文本框中的表格），用于保存时定位
+
+        with self._zip.open(f"{WORD_INTERNAL_DIR}/{DOCUMENT_XML_FILE_NAME}") as stream:
+            for event, element in etree.iterparse(stream, events=('start', 'end')):
+                tag = element.tag
+                if event == 'start':
+                    if tag == W_P:
+                        paragraph_depth += 1
+                    elif tag == W_TBL:
+                        if not paragraph_depth:
+                            tables.append(GridTable(table_count, table_ordinal))
+                            table_count += 1
+                        table_ordinal += 1
+                    elif paragraph_depth:
+                        continue
+                    elif tag == W_TR and tables:
+                        tables[-1].rows.append([])
+                    elif tag == W_TC and tables:
+                        cells.append(GridCell())
+                    continue
+
+                # end 事件
+                if tag == W_P:
+                    paragraph_depth -= 1
+                    if paragraph_depth:
+                        continue
+                    fragment = self._render_paragraph(element, in_cell=bool(cells))
+                    if cells:
+                        cells[-1].items.append(('p', fragment))
+                    elif fragment.html:
+                        body_parts.append(fragment.html)
+                    _release(element)
+                elif paragraph_depth:
+                    continue
+                elif tag == W_TC_PR and cells and element.getparent().tag == W_TC:
+                    read_cell_properties(element, cells[-1])
+                elif tag == _w('gridBefore') and tables:
+                    tables[-1].grid_before = _int_attr(element, _w('val'), 0)
+                elif tag == W_TC and cells:
+                    tables[-1].add_cell(cells.pop())
+                elif tag == W_TR and tables:
+                    tables[-1].grid_before = 0
+                elif tag == W_TBL and tables:
+                    fragment = self._render_table(tables.pop())
+                    if cells:
+                        cells[-1].items.append(('table', fragment))
+                    else:
+                        body_parts.append(fragment.html)
+                    _release(element)
+                elif tag == _w('pgSz') and element.getparent().tag == W_SECT_PR:
+                    # PyDocX 同样按页面宽度设置body宽度（twip / 240 = em）
+                    self._body_width = _int_attr(element, _w('w'), 0) / 240 or None
+        return body_parts
+
+    # --- 表格 ---
+
+    def _render_table(self, table: GridTable) -> _Fragment:
+        """计算纵向合并的rowspan，输出带标记的表格HTML，并将单元格位置登记到几何索引"""
+        emitted_rows = resolve_rows(table)
+        add_table(self.table_geometry, table, emitted_rows)
+
+        parts = ['<table border="1">']
+        has_text, has_img = False, False
+        for row_index, cells in enumerate(emitted_rows):
+            parts.append('<tr>')
+            for cell_index, cell in enumerate(cells):
+                attrs = []
+                if cell.grid_span > 1:
+                    attrs.append(f' colspan="{cell.grid_span}"')
+                if cell.rowspan > 1:
+                    attrs.append(f' rowspan="{cell.rowspan}"')
+                attrs.append(f' {ATTR_CELL_ID}="table_{table.index}_cell_{row_index}_{cell_index}"')
+                # 与PyDocX后端一致，只标记表格第一个单元格的斜线
+                if cell.diagonal and row_index == 0 and cell_index == 0:
+                    attrs.append(f' {ATTR_DIAGONAL_SPLIT_TYPE}="{cell.diagonal}"')
+
+                content, cell_has_text, cell_has_img, cell_has_table = _render_cell_content(cell)
+                if cell_has_table:
+                    attrs.append(f' {ATTR_HAS_NESTED_TABLE}="true"')
+                if cell_has_img:
+                    attrs.append(f' {ATTR_HAS_IMG}="true"')
+                # 内容为空的单元格用 "-" 占位，包含图片时不占位
+                if not cell_has_img and not cell_has_text:
+                    content = "-"
+                parts.append(f'<td{"".join(attrs)}>{content}</td>')
+                has_text = has_text or cell_has_text
+                has_img = has_img or cell_has_img
+            parts.append('</tr>')
+        parts.append('</table>')
+        return _Fragment("".join(parts), has_text, has_img)
+
+    # --- 段落和run ---
+
+    def _render_paragraph(self, paragraph, in_cell: bool) -> _Fragment:
+        parts, has_text, has_img = [], False, False
+        for html_text, text, img in self._render_inline(paragraph):
+            parts.append(html_text)
+            has_text = has_text or bool(text.strip())
+            has_img = has_img or img
+        inline = "".join(parts)
+        if not inline:
+            return _Fragment("", False, False)
+
+        properties = paragraph.find(W_PPR)
+        indentation = _indentation_style(properties.find(_w('ind'))) if properties is not None else ""
+        if indentation:
+            inline = f'<span style="{indentation}">{inline}</span>'
+        alignment = _child_val(properties, 'jc') if properties is not None else None
+        if alignment in ('center', 'right', 'left'):
+            inline = f'<span class="pydocx-{alignment}">{inline}</span>'
+        if in_cell:
+            return _Fragment(inline, has_text, has_img)
+
+        style_id = _child_val(properties, 'pStyle') if properties is not None else None
+        level = self._heading_styles.get(style_id)
+        tag = f'h{level}' if level else 'p'
+        return _Fragment(f'<{tag}>{inline}</{tag}>', has_text, has_img)
+
+    def _render_inline(self, container):
+        """依次产出 (HTML, 纯文本, 是否图片)"""
+        for child in container:
+            tag = child.tag
+            if tag == W_R:
+                yield from self._render_run(child)
+            elif tag == _w('hyperlink'):
+                inner = list(self._render_inline(child))
+                rel = self._relationships.get(child.get(R_ID))
+                content = "".join(part for part, _, _ in inner)
+                if rel and rel[1] and content:
+                    content = f'<a href="{html.escape(rel[0])}">{content}</a>'
+                yield content, "".join(text for _, text, _ in inner), any(img for _, _, img in inner)
+            elif tag in _RUN_CONTAINERS:
+                yield from self._render_inline(child)
+            elif tag == MC_ALTERNATE_CONTENT:
+                choice = child.find(MC_CHOICE)
+                if choice is not None:
+                    yield from self._render_inline(choice)
+
+    def _render_run(self, run):
+        pieces, texts, has_img = [], [], False
+        for child in run:
+            for piece, text, img in self._render_run_content(child):
+                pieces.append(piece)
+                texts.append(text)
+                has_img = has_img or img
+        content = "".join(pieces)
+        if not content:
+            return
+        text = "".join(texts)
+        properties = run.find(W_RPR)
+        # 与PyDocX一致：只有空白的run不加格式
+        if properties is not None and (text.strip() or has_img):
+            content = _apply_run_format(content, properties)
+        yield content, text, has_img
+
+    def _render_run_content(self, child):
+        tag = child.tag
+        if tag == W_T:
+            text = child.text or ""
+            yield html.escape(text, quote=False), text, False
+        elif tag == _w('tab'):
+            yield '<span class="pydocx-tab"></span>', "", False
+        elif tag in (_w('br'), _w('cr')):
+            if child.get(_w('type')) not in ('page', 'column'):
+                yield '<br />', "", False
+        elif tag == _w('noBreakHyphen'):
+            yield '-', '-', False
+        elif tag == _w('drawing'):
+            yield from self._render_drawing(child)
+        elif tag in (_w('pict'), _w('object')):
+            yield from self._render_vml(child)
+        elif tag == MC_ALTERNATE_CONTENT:
+            choice = child.find(MC_CHOICE)
+            if choice is not None:
+                for grandchild in choice:
+                    yield from self._render_run_content(grandchild)
+
+    def _render_drawing(self, drawing):
+        for blip in _iter_outside_fallback(drawing, A_BLIP):
+            src = self._media_data_uri(blip.get(R_EMBED) or blip.get(R_LINK)) or _EMPTY_IMAGE_SRC
+            yield f'<img{_picture_size(blip, drawing)} src="{src}" />', "", True
+
+    def _render_vml(self, pict):
+        for imagedata in _iter_outside_fallback(pict, V_IMAGEDATA):
+            src = self._media_data_uri(imagedata.get(R_ID)) or _EMPTY_IMAGE_SRC
+            size = ""
+            shape = imagedata.getparent()
+            if shape is not None and shape.tag == V_SHAPE:
+                style = dict(
+                    item.split(':', 1) for item in shape.get('style', '').split(';') if ':' in item
+                )
+                if 'width' in style and 'height' in style:
+                    size = f' height="{style["height"].strip()}" width="{style["width"].strip()}"'
+            yield f'<img{size} src="{src}" />', "", True
+
+
+def _render_cell_content(cell: GridCell):
+    """单元格内的段落以 <br /> 连接，内嵌表格原样插入"""
+    parts = []
+    has_text = has_img = has_table = False
+    previous_kind = None
+    for kind, fragment in cell.items:
+        if kind == 'p' and not fragment.html:
+            continue
+        if kind == 'p' and previous_kind == 'p':
+            parts.append('<br />')
+        parts.append(fragment.html)
+        has_text = has_text or fragment.has_text
+        has_img = has_img or fragment.has_img
+        has_table = has_table or kind == 'table'
+        previous_kind = kind
+    return "".join(parts), has_text, has_img, has_table
+
+
+# --- 通用辅助函数 ---
+
+def _apply_run_format(content: str, properties) -> str:
+    """与PyDocX相同的嵌套顺序：strong 在内，颜色 span 在外"""
+    if _is_on(properties.find(_w('b'))):
+        content = f'<strong>{content}</strong>'
+    if _is_on(properties.find(_w('i'))):
+        content = f'<em>{content}</em>'
+    underline = properties.find(_w('u'))
+    if underline is not None and underline.get(_w('val'), 'single') != 'none':
+        content = f'<span class="pydocx-underline">{content}</span>'
+    if _is_on(properties.find(_w('strike'))):
+        content = f'<span class="pydocx-strike">{content}</span>'
+    if _is_on(properties.find(_w('caps'))):
+        content = f'<span class="pydocx-caps">{content}</span>'
+    if _is_on(properties.find(_w('smallCaps'))):
+        content = f'<span class="pydocx-small-caps">{content}</span>'
+    # 与PyDocX一致：黑色和白色（不支持背景色）不输出颜色
+    color = properties.find(_w('color'))
+    if color is not None and color.get(_w('val')) not in (None, 'auto', '000000', 'FFFFFF'):
+        content = f'<span style="color:#{color.get(_w("val"))}">{content}</span>'
+    return content
+
+
+def _picture_size(blip, drawing) -> str:
+    """图片尺寸取自图片自身的 spPr/xfrm/ext（与PyDocX相同），没有时使用绘图的 wp:extent"""
+    extent = None
+    picture = blip.getparent().getparent() if blip.getparent() is not None else None
+    if picture is not None:
+        for shape_properties in picture:
+            if shape_properties.tag.endswith('}spPr'):
+                extent = shape_properties.find(A_XFRM_EXT)
+                break
+    if extent is None:
+        extent = next(drawing.iter(WP_EXTENT), None)
+    if extent is None:
+        return ""
+    width = _int_attr(extent, 'cx', 0) / _EMU_PER_PIXEL
+    height = _int_attr(extent, 'cy', 0) / _EMU_PER_PIXEL
+    if not width or not height:
+        return ""
+    return f' height="{height:.0f}px" width="{width:.0f}px"'
+
+
+def _indentation_style(indentation) -> str:
+    """段落直接设置的缩进（twip）转换为 em，与PyDocX的内联样式相同（不解析样式继承）"""
+    if indentation is None:
+        return ""
+    style = []
+    for css, names in (('margin-right', ('right', 'end')), ('margin-left', ('left', 'start')), ('text-indent', ('firstLine',))):
+        for name in names:
+            twips = _int_attr(indentation, _w(name), 0)
+            if twips:
+                style.append(f"{css}:{twips / 240:.2f}em")
+                break
+    return ";".join(style)
+
+
+def _is_on(element) -> bool:
+    return element is not None and element.get(_w('val'), 'true') not in ('0', 'false', 'off')
+
+
+def _child_val(element, name: str):
+    child = element.find(_w(name))
+    return child.get(_w('val')) if child is not None else None
+
+
+def _int_attr(element, name: str, default: int) -> int:
+    try:
+        return int(element.get(name))
+    except (TypeError, ValueError):
+        return default
+
+
+def _iter_outside_fallback(element, tag: str):
+    """按文档顺序查找 tag，跳过 mc:Fallback 中的兼容副本（与图片映射的顺序一致）"""
+    for found in element.iter(tag):
+        parent = found.getparent()
+        while parent is not None and parent is not element:
+            if parent.tag == MC_FALLBACK:
+                break
+            parent = parent.getparent()
+        else:
+            yield found
+
+
+def _release(element) -> None:
+    """释放已处理的元素及其之前的兄弟元素，使内存占用与文档大小无关"""
+    element.clear()
+    parent = element.getparent()
+    if parent is not None:
+        while element.getprevious() is not None:
+            del parent[0]
+
+
+def convert_to_marked_html(doc_path: str) -> tuple[str, dict]:
+    """将docx转换为带单元格标记的HTML，返回 (HTML字符串, 表格几何索引)"""
+    converter = NativeConverter(doc_path)
+    return converter.convert(), converter.table_geometry
@@ -0,0 +1,191 @@
+"""
+表格几何索引 - 记录每个 data-cell-id 对应的Word表格位置，在转换时建立一次，保存时直接定位
+位置格式: {"tbl": 文档中第几个w:tbl（按文档顺序，包含嵌套表格）, "tr": 第几个w:tr, "tc": 行内第几个w:tc,
+          "col": 起始网格列, "colspan": 横向合并列数, "rowspan": 纵向合并行数, "diagonal": 斜线类型（可选）}
+"""
+import zipfile
+from lxml import etree
+from global_define.constants import WORD_INTERNAL_DIR, DOCUMENT_XML_FILE_NAME
+
+W_NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+
+
+def _w(name: str) -> str:
+    return f'{{{W_NS}}}{name}'
+
+
+W_P, W_TBL, W_TR, W_TC, W_TC_PR = _w('p'), _w('tbl'), _w('tr'), _w('tc'), _w('tcPr')
+W_GRID_BEFORE = _w('gridBefore')
+
+
+class GridCell:
+    """一个 w:tc 的几何信息，转换器可在 items 中附加单元格内容"""
+    __slots__ = ('tc_index', 'grid_col', 'grid_span', 'v_merge', 'diagonal', 'rowspan', 'items')
+
+    def __init__(self, tc_index: int = 0):
+        self.tc_index = tc_index
+        self.grid_col = 0
+        self.grid_span = 1
+        self.v_merge = None    # None / 'restart' / 'continue'
+        self.diagonal = None   # 'tl2br' / 'tr2bl'
+        self.rowspan = 1
+        self.items = []
+
+
+class GridTable:
+    """一个 w:tbl 的行和单元格；index 为HTML中的表格索引，ordinal 为文档中所有 w:tbl 的顺序号"""
+    __slots__ = ('index', 'ordinal', 'rows', 'grid_before')
+
+    def __init__(self, index: int, ordinal: int):
+        self.index = index
+        self.ordinal = ordinal
+        self.rows = []         # [[GridCell, ...], ...]
+        self.grid_before = 0
+
+    def add_cell(self, cell: GridCell) -> None:
+        """在当前行末尾追加单元格，按前一个单元格的位置和跨列数计算起始网格列"""
+        row = self.rows[-1]
+        previous = row[-1] if row else None
+        cell.tc_index = len(row)
+        cell.grid_col = previous.grid_col + previous.grid_span if previous else self.grid_before
+        row.append(cell)
+
+
+def read_cell_properties(tc_pr, cell: GridCell) -> None:
+    """读取 w:tcPr 中的横向合并、纵向合并和斜线边框"""
+    grid_span = tc_pr.find(_w('gridSpan'))
+    if grid_span is not None:
+        try:
+            cell.grid_span = max(1, int(grid_span.get(_w('val'))))
+        except (TypeError, ValueError):
+            pass
+    v_merge = tc_pr.find(_w('vMerge'))
+    if v_merge is not None:
+        cell.v_merge = 'restart' if v_merge.get(_w('val')) == 'restart' else 'continue'
+    borders = tc_pr.find(_w('tcBorders'))
+    if borders is not None:
+        if borders.find(_w('tl2br')) is not None:
+            cell.diagonal = 'tl2br'
+        elif borders.find(_w('tr2bl')) is not None:
+            cell.diagonal = 'tr2bl'
+
+
+def resolve_rows(table: GridTable) -> list[list[GridCell]]:
+    """
+    计算纵向合并的rowspan，返回每行输出到HTML的单元格（被合并的 continue 单元格不输出）
+    孤立的 continue 单元格（上方没有同一网格列的起始单元格）按普通单元格输出
+    """
+    open_merges = {}  # 网格列 -> 起始单元格
+    emitted_rows = []
+    for row in table.rows:
+        emitted = []
+        for cell in row:
+            if cell.v_merge == 'continue' and cell.grid_col in open_merges:
+                open_merges[cell.grid_col].rowspan += 1
+                continue
+            if cell.v_merge == 'restart':
+                open_merges[cell.grid_col] = cell
+            else:
+                open_merges.pop(cell.grid_col, None)
+            emitted.append(cell)
+        row_cols = {cell.grid_col for cell in row}
+        for grid_col in list(open_merges):
+            if grid_col not in row_cols:
+                del open_merges[grid_col]
+        emitted_rows.append(emitted)
+    return emitted_rows
+
+
+def add_table(geometry: dict, table: GridTable, emitted_rows: list[list[GridCell]]) -> None:
+    """将一个表格中输出到HTML的单元格登记到几何索引，ID与单元格标记一致"""
+    for row_index, cells in enumerate(emitted_rows):
+        for cell_index, cell in enumerate(cells):
+            location = {
+                "tbl": table.ordinal,
+                "tr": row_index,
+                "tc": cell.tc_index,
+                "col": cell.grid_col,
+                "colspan": cell.grid_span,
+                "rowspan": cell.rowspan,
+            }
+            if cell.diagonal:
+                location["diagonal"] = cell.diagonal
+            geometry[f"table_{table.index}_cell_{row_index}_{cell_index}"] = location
+
+
+def build_table_geometry(doc_path: str) -> dict:
+    """
+    流式读取 word/document.xml 建立几何索引（PyDocX后端使用，原生后端在转换时同时建立）
+    与HTML的表格顺序一致：按文档顺序编号，段落内（文本框）的表格不计入HTML表格
+    """
+    geometry = {}
+    tables = []
+    cells = []
+    paragraph_depth = 0
+    table_count = 0
+    ordinal = 0
+
+    with zipfile.ZipFile(doc_path, 'r') as zf, zf.open(f"{WORD_INTERNAL_DIR}/{DOCUMENT_XML_FILE_NAME}") as stream:
+        for event, element in etree.iterparse(stream, events=('start', 'end')):
+            tag = element.tag
+            if event == 'start':
+                if tag == W_P:
+                    paragraph_depth += 1
+                elif tag == W_TBL:
+                    if not paragraph_depth:
+                        tables.append(GridTable(table_count, ordinal))
+                        table_count += 1
+                    ordinal += 1
+                elif paragraph_depth:
+                    continue
+                elif tag == W_TR and tables:
+                    tables[-1].rows.append([])
+                elif tag == W_TC and tables:
+                    cells.append(GridCell())
+                continue
+
+            if tag == W_P:
+                paragraph_depth -= 1
+                element.clear()
+            elif paragraph_depth:
+                continue
+            elif tag == W_TC_PR and cells and element.getparent().tag == W_TC:
+                read_cell_properties(element, cells[-1])
+            elif tag == W_GRID_BEFORE and tables:
+                try:
+                    tables[-1].grid_before = int(element.get(_w('val')))
+                except (TypeError, ValueError):
+                    pass
+            elif tag == W_TC and cells:
+                tables[-1].add_cell(cells.pop())
+            elif tag == W_TR and tables:
+                tables[-1].grid_before = 0
+            elif tag == W_TBL and tables:
+                table = tables.pop()
+                add_table(geometry, table, resolve_rows(table))
+                element.clear()
+    return geometry
+
+
+def locate_cells(body, geometry: dict, cell_ids) -> dict:
+    """
+    在Word正文XML中按几何索引直接定位单元格，返回 {data-cell-id: w:tc 元素}
+    每个表格的行和单元格列表只在首次用到时读取一次；找不到的单元格不在结果中
+    """
+    xml_tables = None
+    rows_cache = {}
+    located = {}
+    for cell_id in cell_ids:
+        location = geometry.get(cell_id)
+        if location is None:
+            continue
+        if xml_tables is None:
+            xml_tables = list(body.iter(W_TBL))
+        if location["tbl"] >= len(xml_tables):
+            continue
+        rows = rows_cache.get(location["tbl"])
+        if rows is None:
+            rows = rows_cache[location["tbl"]] = [tr.findall(W_TC) for tr in xml_tables[location["tbl"]].findall(W_TR)]
+        if location["tr"] < len(rows) and location["tc"] < len(rows[location["tr"]]):
+            located[cell_id] = rows[location["tr"]][location["tc"]]
+    return located
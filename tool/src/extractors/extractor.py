@@ -9,21 +9,25 @@ import zipfile
 from . import table_extractor
 from . import image_extractor
 from callback.callback import callback_handler
+from context.document_context import DocumentContext
 
 
-async def extract_document(unzip_dir: str) -> list[str]:
+async def extract_document(ctx: DocumentContext, unzip_dir: str = None, extract_images: bool = True) -> list[str]:
     """
-    从HTML文件提取所有表格和图片，返回表格HTML字符串列表，并提取图片到指定目录
+    从上下文中的HTML树提取所有表格和图片，返回表格HTML字符串列表，并提取图片到指定目录
 
     参数:
-        unzip_dir (str): Word文档解压后的临时目录路径
+        ctx (DocumentContext): 文档上下文，提取结果写入 ctx.tables 和 ctx.image_map
+        unzip_dir (str): Word文档解压后的临时目录路径，默认为任务工作区的 unzip_dir
+        extract_images (bool): 是否提取图片（保存任务中图片已替换为占位符，无需再次提取）
 
     返回:
         list[str]: 表格HTML字符串列表
     """
     # 处理表格
-    tables = await table_extractor.extract_tables()
+    tables = await table_extractor.extract_tables(ctx)
     # 提取图片
-    image_paths = await image_extractor.extract_and_save_images(unzip_dir)
-    await callback_handler.output_callback(f"已提取图片数量: {len(image_paths)}")
+    if extract_images:
+        image_paths = await image_extractor.extract_and_save_images(ctx, unzip_dir or ctx.workspace.unzip_dir)
+        await callback_handler.output_callback(f"已提取图片数量: {len(image_paths)}")
     return tables
\ No newline at end of file
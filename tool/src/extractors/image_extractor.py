@@ -1,34 +1,37 @@
 import os
 import base64
 import io
-import json
+import hashlib
+import xml.etree.ElementTree as ET
 from PIL import Image
-from bs4 import BeautifulSoup
-from global_define.constants import EXTRACT_DIR, DEFAULT_HTML_PATH, IMAGE_MAP_PATH, WORD_INTERNAL_DIR, MEDIA_INTERNAL_DIR
+from global_define.constants import WORD_INTERNAL_DIR, MEDIA_INTERNAL_DIR, DOCUMENT_XML_FILE_NAME
 from callback.callback import callback_handler
+from context.document_context import DocumentContext
 
-async def extract_and_save_images(unzip_dir):
+# document.xml 中图片引用相关的标签和属性
+_NS_A = '{http://schemas.openxmlformats.org/drawingml/2006/main}'
+_NS_R = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+A_BLIP_TAG = _NS_A + 'blip'
+V_IMAGEDATA_TAG = '{urn:schemas-microsoft-com:vml}imagedata'
+MC_FALLBACK_TAG = '{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback'
+R_EMBED_ATTR = _NS_R + 'embed'
+R_LINK_ATTR = _NS_R + 'link'
+R_ID_ATTR = _NS_R + 'id'
+
+async def extract_and_save_images(ctx: DocumentContext, unzip_dir):
     """
-    从 constants.DEFAULT_HTML_PATH 提取所有 data: 开头的 img 图片，保存为 png 到 constants.EXTRACT_DIR，
-    并返回图片路径列表。同时创建HTML图片索引到Word内部media目录图片名称的映射。
+    从上下文中的HTML树提取所有 data: 开头的 img 图片，保存为 png 到任务工作区的 extract_dir，
+    并返回图片路径列表。同时创建HTML图片索引到Word内部media目录图片名称的映射，保存到 ctx.image_map。
     """
-    output_dir = EXTRACT_DIR
-    html_path = DEFAULT_HTML_PATH
+    output_dir = ctx.workspace.extract_dir
+    soup = ctx.soup
 
     if not os.path.exists(output_dir):
         os.makedirs(output_dir, exist_ok=True)
 
-    with open(html_path, 'r', encoding='utf-8') as f:
-        html = f.read()
-    soup = BeautifulSoup(html, 'html.parser')
-
     image_map = _create_image_map(soup, unzip_dir) # 创建图片映射
-
-    # 保存图片映射
-    os.makedirs(os.path.dirname(IMAGE_MAP_PATH), exist_ok=True)
-    with open(IMAGE_MAP_PATH, 'w', encoding='utf-8') as f:
-        json.dump(image_map, f, ensure_ascii=False, indent=4)
-    await callback_handler.output_callback(f"成功保存图片映射: {IMAGE_MAP_PATH}")
+    ctx.image_map = image_map
+    await callback_handler.output_callback(f"成功创建图片映射，共 {len(image_map)} 项")
 
     saved_paths = []
     
@@ -51,7 +54,7 @@ async def extract_and_save_images(unzip_dir):
                         saved_paths.append(img_path)
                         
                         # 更新HTML中的src属性为新的PNG文件路径
-                        img_tag['src'] = os.path.relpath(img_path, os.path.dirname(DEFAULT_HTML_PATH)).replace("\\", "/")
+                        img_tag['src'] = os.path.relpath(img_path, ctx.html_dir).replace("\\", "/")
                         
                     except Exception as e:
                         await callback_handler.output_callback(f"处理Word内部图片 {word_image_filename} 时出错: {e}")
@@ -61,32 +64,20 @@ async def extract_and_save_images(unzip_dir):
             else:
                 await callback_handler.output_callback(f"警告: 图片ID {img_id} 在image_map中没有找到对应文件。")
 
-    # 保存修改后的HTML
-    with open(html_path, 'w', encoding='utf-8') as f:
-        f.write(str(soup))
-
     return saved_paths
 
 
 def _create_image_map(soup, unzip_dir):
     """
     创建HTML img src (data:base64) 到 Word内部media目录图片名称的映射。
-    匹配方式是通过比较HTML中src中的data数据和media中图片数据。
+    HTML中第i个img对应document.xml中按文档顺序的第i个图片引用（r:embed / r:id），
+    通过document.xml.rels解析为media文件名，并用数据长度校验；
+    校验失败时回退为内容哈希匹配（media文件只在需要时流式计算一次哈希，不保留图片数据）。
     """
     image_map = {}
     media_dir = os.path.join(unzip_dir, WORD_INTERNAL_DIR, MEDIA_INTERNAL_DIR)
-    
-    # 获取Word内部media目录中的图片文件及其数据
-    word_media_data = {}
-    if os.path.exists(media_dir):
-        for filename in os.listdir(media_dir):
-            filepath = os.path.join(media_dir, filename)
-            if os.path.isfile(filepath):
-                try:
-                    with open(filepath, 'rb') as f:
-                        word_media_data[filename] = f.read()
-                except Exception:
-                    continue
+    image_targets = _read_image_targets(unzip_dir)
+    media_hash_index = None
 
     img_tags = soup.find_all('img')
     
@@ -96,23 +87,93 @@ def _create_image_map(soup, unzip_dir):
         if src and src.startswith('data:'):
             try:
                 header, b64data = src.split(',', 1)
-                if ';base64' in header:
-                    html_img_bytes = base64.b64decode(b64data)
-                    
-                    matched_filename = None
-                    for filename, file_data in word_media_data.items():
-                        if html_img_bytes == file_data:
-                            matched_filename = filename
-                            break
-                    
-                    img_id = f"{i}" # HTML中img的索引
-                    image_map[img_id] = matched_filename # 映射到Word内部图片名称
-                    
-                else:
+                if ';base64' not in header:
                     # 如果不是base64编码的data URI，则不处理
-                    pass
+                    continue
+
+                img_id = f"{i}" # HTML中img的索引
+                matched_filename = image_targets[i] if i < len(image_targets) else None
+
+                # 用base64长度推算的数据大小校验关系映射，无需解码
+                if matched_filename:
+                    media_path = os.path.join(media_dir, matched_filename)
+                    if not os.path.isfile(media_path) or os.path.getsize(media_path) != _base64_decoded_size(b64data):
+                        matched_filename = None
+
+                # 回退：按内容哈希匹配
+                if not matched_filename:
+                    if media_hash_index is None:
+                        media_hash_index = _build_media_hash_index(media_dir)
+                    matched_filename = media_hash_index.get(hashlib.sha256(base64.b64decode(b64data)).hexdigest())
+
+                image_map[img_id] = matched_filename # 映射到Word内部图片名称
             except Exception:
                 # 处理解码或文件读取错误
                 continue
 
-    return image_map
\ No newline at end of file
+    return image_map
+
+
+def _read_image_targets(unzip_dir):
+    """
+    按文档顺序读取document.xml中的图片引用，返回对应的media文件名列表（外部链接图片为None）
+    """
+    word_dir = os.path.join(unzip_dir, WORD_INTERNAL_DIR)
+    rels_path = os.path.join(word_dir, '_rels', DOCUMENT_XML_FILE_NAME + '.rels')
+    xml_path = os.path.join(word_dir, DOCUMENT_XML_FILE_NAME)
+    if not os.path.exists(rels_path) or not os.path.exists(xml_path):
+        return []
+
+    # rId -> media文件名，只保留图片关系
+    rel_targets = {}
+    for rel in ET.parse(rels_path).getroot():
+        if rel.get('Type', '').endswith('/image'):
+            external = rel.get('TargetMode') == 'External'
+            rel_targets[rel.get('Id')] = None if external else os.path.basename(rel.get('Target', ''))
+
+    targets = []
+
+    def _walk(element):
+        # mc:Fallback 中是同一图片的兼容表示，跳过以免重复计数
+        if element.tag == MC_FALLBACK_TAG:
+            return
+        if element.tag == A_BLIP_TAG:
+            rel_id = element.get(R_EMBED_ATTR) or element.get(R_LINK_ATTR)
+        elif element.tag == V_IMAGEDATA_TAG:
+            rel_id = element.get(R_ID_ATTR)
+        else:
+            rel_id = None
+        if rel_id in rel_targets:
+            targets.append(rel_targets[rel_id])
+        for child in element:
+            _walk(child)
+
+    _walk(ET.parse(xml_path).getroot())
+    return targets
+
+
+def _build_media_hash_index(media_dir):
+    """流式计算media目录中每个文件的SHA-256，返回 {哈希: 文件名}"""
+    hash_index = {}
+    if not os.path.exists(media_dir):
+        return hash_index
+    for filename in os.listdir(media_dir):
+        filepath = os.path.join(media_dir, filename)
+        if not os.path.isfile(filepath):
+            continue
+        try:
+            digest = hashlib.sha256()
+            with open(filepath, 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(block)
+            hash_index.setdefault(digest.hexdigest(), filename)
+        except OSError:
+            continue
+    return hash_index
+
+
+def _base64_decoded_size(b64data):
+    """根据base64字符串长度计算解码后的字节数"""
+    b64data = b64data.strip()
+    padding = len(b64data) - len(b64data.rstrip('='))
+    return len(b64data) * 3 // 4 - padding
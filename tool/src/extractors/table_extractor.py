@@ -13,19 +13,13 @@ from global_define.constants import (
 
 
 from global_define import constants
+from context.document_context import DocumentContext
 
-async def extract_tables() -> list[str]:
-    """从HTML文件中提取所有表格，返回表格HTML字符串列表"""
+async def extract_tables(ctx: DocumentContext) -> list[str]:
+    """从上下文中的HTML树提取所有表格，返回表格HTML字符串列表并保存到 ctx.tables"""
     try:
-        html_file_path = constants.DEFAULT_HTML_PATH
-        try:
-            with open(html_file_path, 'r', encoding='utf-8') as file:
-                html_content = file.read()
-        except UnicodeDecodeError:
-            with open(html_file_path, 'r', encoding='gbk') as file:
-                html_content = file.read()
-        
-        table_html_strings = await get_tables_from_html(html_content)
+        table_html_strings = await get_tables_from_soup(ctx.soup, ctx.workspace.extract_dir)
+        ctx.tables = table_html_strings
         
         if not table_html_strings:
             await callback_handler.output_callback("未找到任何表格")
@@ -38,18 +32,18 @@ async def extract_tables() -> list[str]:
         return []
 
 
-async def get_tables_from_html(html_content: str) -> list[str]:
+async def get_tables_from_soup(soup: BeautifulSoup, extract_dir: str = constants.EXTRACT_DIR) -> list[str]:
     """
-    从HTML字符串中提取表格，返回表格HTML字符串列表
+    从已解析的HTML树中提取表格，返回表格HTML字符串列表
     
     参数:
-        html_content: HTML内容字符串
+        soup: 已解析的HTML文档树
+        extract_dir: 保存提取表格文件的目录
         
     返回:
         list[str]: 每个字符串代表一个表格的HTML字符串
     """
     try:
-        soup = BeautifulSoup(html_content, 'html.parser')
         html_tables = soup.find_all('table', recursive=True)
 
         if not html_tables:
@@ -64,9 +58,9 @@ async def get_tables_from_html(html_content: str) -> list[str]:
                 table_html_strings.append(table_html_string)
                 
                 # 保存提取的表格到文件
-                if not os.path.exists(constants.EXTRACT_DIR):
-                    os.makedirs(constants.EXTRACT_DIR)
-                file_path = os.path.join(constants.EXTRACT_DIR, f"{TABLE_FILE_PREFIX}{i+1}{HTML_FILE_EXTENSION}")
+                if not os.path.exists(extract_dir):
+                    os.makedirs(extract_dir)
+                file_path = os.path.join(extract_dir, f"{TABLE_FILE_PREFIX}{i+1}{HTML_FILE_EXTENSION}")
                 with open(file_path, 'w', encoding='utf-8') as f:
                     f.write(table_html_string)
                 await callback_handler.output_callback(f"已保存表格 {i+1} 到 {file_path}")
@@ -20,6 +20,17 @@ IMAGE_MAP_PATH = os.path.join(EXTRACT_DIR, IMAGE_MAP_FILE_NAME)
 IMAGE_PLACEHOLDER_MAP_FILE_NAME = "image_placeholder_map.json"
 IMAGE_PLACEHOLDER_MAP_PATH = os.path.join(EXTRACT_DIR, IMAGE_PLACEHOLDER_MAP_FILE_NAME)
 
+# 表格几何索引文件（data-cell-id -> Word表格中的 w:tbl/w:tr/w:tc 位置，转换时建立，保存时直接定位）
+TABLE_GEOMETRY_FILE_NAME = "table_geometry.json"
+
+# 任务工作区：每个任务在 JOBS_DIR 下拥有独立的目录，互不覆盖
+JOBS_DIR = os.path.join(DOCUMENT_DIR, "jobs")
+WORKSPACE_MANIFEST_FILE_NAME = "workspace.json"
+UNZIP_DIR_NAME = "unzip"
+EXTRACT_DIR_NAME = "document_extract"
+HTML_FILE_NAME = "document.html"
+TEMPLATE_FILE_NAME = "template.docx"
+
 # --- 文件名和路径 ---
 DEFAULT_DOC_PATH = os.path.join(TEST_DOCUMENTS_DIR, "报告1.docx")
 # 存放由 data: 图片转换成的 png 文件的目录
@@ -43,6 +54,94 @@ HTTP_SERVER_URL = "http://localhost:3000"
 TEMPLATE_UPLOAD_FILENAME = "template.docx"
 TEMPLATE_MIME_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
 
+# 任务池：客户端同时执行的任务数量上限
+MAX_CONCURRENT_JOBS = 2
+
+# 批量处理：输出目录中的汇总文件和中间文件目录
+BATCH_SUMMARY_FILE_NAME = "batch_summary.json"
+BATCH_WORK_DIR_NAME = "_work"
+
+# LLM调用相关常量
+LLM_MAX_CONCURRENCY = 8  # 同时进行的LLM请求数量上限
+
+# 长表格分块：表格内容的token估计超过预算时按行切分为多个窗口并发处理，每个窗口重复表头行
+TABLE_CHUNKING_ENABLED = True
+TABLE_CHUNK_MAX_TOKENS = 3000  # 每个窗口（含重复的表头行）的token预算，不含提示词模板
+TABLE_CHUNK_HEADER_ROWS = 1    # 每个窗口重复的表头行数
+
+# 表格键值提取的响应格式：full（模型输出 key/value/value-cell-id）/ compact（JSON schema结构化输出，只输出键和短数字单元格句柄）
+TABLE_RESPONSE_MODE = "compact"
+TABLE_RESPONSE_MODES = ("full", "compact")
+# 提示词中表格内容的序列化格式：html（简化表格HTML）/ grid（紧凑网格：行列坐标、合并信息、短单元格句柄和文本）
+TABLE_SERIALIZER = "html"
+# 表格布局聚类：结构指纹（网格、合并、屏蔽值单元格后的标签文本）相同的表格共用一次LLM结果
+TABLE_LAYOUT_CLUSTERING_ENABLED = True
+IMAGE_BATCH_SIZE = 6      # 图片识别时每个请求打包的图片数量，<=1 表示逐张识别
+# 发送给视觉模型的缩略图（只用于类型识别，提取出的原图不变）
+IMAGE_THUMBNAIL_ENABLED = True
+IMAGE_THUMBNAIL_MAX_EDGE = 768    # 最长边像素数，超过时等比缩小
+IMAGE_THUMBNAIL_FORMAT = "JPEG"   # 编码格式：JPEG / WEBP
+IMAGE_THUMBNAIL_QUALITY = 80      # 编码质量（1-100）
+
+# LLM响应缓存（pipeline使用temperature=0，相同请求的响应可直接复用）
+LLM_CACHE_ENABLED = True
+LLM_CACHE_DIR = os.path.join(DOCUMENT_DIR, "llm_cache")
+LLM_CACHE_MAX_BYTES = 200 * 1024 * 1024        # 缓存总大小上限
+LLM_CACHE_MAX_AGE_SECONDS = 30 * 24 * 3600      # 缓存条目最长保留时间
+
+# 进度消息相关常量
+# 日志级别：debug / info / warn，低于该级别的消息不发送（逐单元格的网格详情为debug级别）
+CALLBACK_LOG_LEVEL = "info"
+# 消息先缓冲再合并成一帧发送：距上次发送超过间隔，或缓冲的条数/字节数达到上限时发送
+CALLBACK_FLUSH_INTERVAL_SECONDS = 0.2
+CALLBACK_FLUSH_MAX_MESSAGES = 50
+CALLBACK_FLUSH_MAX_BYTES = 16 * 1024
+
+# 文档转换后端：pydocx（PyDocX转换后再标记单元格）/ native（iterparse流式读取document.xml，一遍生成带标记的HTML）
+CONVERTER_BACKEND = "pydocx"
+CONVERTER_BACKENDS = ("pydocx", "native")
+
+# 文档转换缓存（按文档内容哈希和转换器版本复用标记后的HTML和包部件）
+CONVERSION_CACHE_ENABLED = True
+CONVERSION_CACHE_DIR = os.path.join(DOCUMENT_DIR, "conversion_cache")
+CONVERSION_CACHE_MAX_BYTES = 500 * 1024 * 1024  # 缓存总大小上限
+
+# 图片分类缓存（已识别图片按内容哈希/感知哈希复用类型）
+IMAGE_CLASS_STORE_ENABLED = True
+IMAGE_CLASS_STORE_PATH = os.path.join(DOCUMENT_DIR, "image_class_store.json")
+IMAGE_PHASH_MAX_DISTANCE = 4   # 感知哈希（64位）近似匹配的最大汉明距离
+
+# 图片预分类（缩小后的颜色统计特征明显的图片在本地识别类型，不调用LLM）
+IMAGE_PRECLASSIFIER_ENABLED = True
+IMAGE_PRECLASSIFIER_SIZE = 160  # 计算统计量前缩小到的最长边像素数
+IMAGE_PRECLASSIFIER_THRESHOLDS = {
+    "thermal_min_palette": 0.6,    # 热成像图：有色标条时伪彩色（铁红色板或高饱和）像素的最低占比
+    "chart_min_white": 0.55,       # 线温图：白色背景的最低占比
+    "chart_max_saturated": 0.05,   # 线温图：彩色曲线（高饱和像素）的最高占比
+    "chart_min_top_colors": 0.8,   # 线温图：前8种主色的最低占比
+    "logo_max_edge": 1000,         # logo：原图最长边的最大像素数
+    "logo_min_white": 0.4,         # logo：白色（或透明）背景的最低占比
+    "logo_min_top_colors": 0.7,    # logo：前8种主色的最低占比
+    "logo_min_saturated": 0.03,    # logo：彩色部分的最低占比（排除灰度截图）
+    "photo_min_colors": 300,       # 可见光图：量化后的最少颜色数
+    "photo_max_top_colors": 0.45,  # 可见光图：前8种主色的最高占比
+    "photo_max_white": 0.2,        # 可见光图：近白像素的最高占比
+    "photo_max_ironbow": 0.5,      # 可见光图：铁红色板像素的最高占比
+    "photo_max_saturated": 0.5,    # 可见光图：高饱和像素的最高占比（排除无色标条的伪彩色图）
+}
+
+# 表格布局记忆（跨文档按布局指纹记录 单元格相对位置 -> 键，已知模板的表格无需调用LLM）
+LAYOUT_STORE_ENABLED = True
+LAYOUT_STORE_PATH = os.path.join(DOCUMENT_DIR, "table_layout_store.json")
+LAYOUT_STORE_MIN_CONFIDENCE = 0.5  # 置信度 = 得票最多的映射票数 / (观察次数 + 1)
+LAYOUT_STORE_MIN_OBSERVATIONS = 2  # 得票最多的映射至少需要的一致观察次数，单次LLM结果不直接使用
+LAYOUT_STORE_REVALIDATE_EVERY = 10 # 每个布局每匹配多少次重新调用一次LLM复核并记录结果，0 表示不复核
+LAYOUT_STORE_MAX_ENTRIES = 10000   # 最多保存的布局数量，超出时淘汰最久未使用的布局
+
+# 表格规则识别（"标签 | 值" 结构明确的简单表格在本地识别键值对，不调用LLM）
+TABLE_RULES_ENABLED = True
+TABLE_RULES_MIN_CONFIDENCE = 0.6  # 有强证据（冒号标签、匹配键描述、空值或数值/日期/编号）的单元格对所占的最低比例
+
 """
 全局常量定义
 """
@@ -58,9 +157,15 @@ ATTR_HAS_IMG = 'data-has-img'
 # 用于标记表格单元格唯一ID的HTML属性
 ATTR_CELL_ID = 'data-cell-id'
 
+# 紧凑响应格式下提示词中代替 data-cell-id 的短数字单元格句柄属性
+ATTR_CELL_HANDLE = 'data-h'
+
 # 用于存储单元格原始内容的HTML属性
 ATTR_ORIGINAL_CONTENT = 'data-original-content'
 
+# 用于在HTML的body上记录所属任务ID的属性，保存任务据此找回任务工作区
+ATTR_JOB_ID = 'data-job-id'
+
 # WebSocket消息类型常量
 WS_MESSAGE_TYPE = {
     'CLIENT_REGISTER': 0,       # 通知client名称
@@ -12,6 +12,7 @@ from replacers.replacer import replace_document
 from savers.saver import save_document
 from callback.callback import callback_handler
 from global_define import constants
+from context.document_context import DocumentContext
 
 import asyncio
 
@@ -24,23 +25,27 @@ async def main():
     # 记录开始时间
     start_time = time.time()
     
+    ctx = DocumentContext()
+
     try:
         # # # 步骤1: Word文档转换为HTML
         # await callback_handler.output_callback("\n===== 步骤1: 文档转换 =====")
-        # await convert_document()
+        # await convert_document(ctx)
 
         # # 步骤2: 提取文档元素
         # await callback_handler.output_callback("\n===== 步骤2: 文档元素提取 =====")
-        # table_html_strings = await extract_document(constants.UNZIP_DIR)
+        # await extract_document(ctx)
         
         # # 步骤3: 替换文档元素
         # await callback_handler.output_callback("\n===== 步骤3: 文档元素替换 =====")
-        # # 使用从extract_document返回的table_html_strings进行替换
-        # await replace_document(table_html_strings)
+        # await replace_document(ctx)
+        # ctx.save()
         
-        # 步骤4: 生成模板文档
+        # 步骤4: 生成模板文档（未执行前面步骤时，从已有的HTML和映射文件读取上下文）
         await callback_handler.output_callback("\n===== 步骤4: 模板文档生成 =====")
-        await save_document()
+        if ctx.soup is None:
+            ctx = DocumentContext.from_html_file()
+        await save_document(ctx)
 
         # 计算总耗时
         total_time = time.time() - start_time
@@ -54,5 +59,4 @@ async def main():
 # 直接运行时的入口点
 if __name__ == "__main__":
     # 启动异步事件循环并运行main()协程，方式与client.py一致
-    import asyncio
     asyncio.run(main())
\ No newline at end of file
@@ -6,8 +6,11 @@
 """
 
 import os
-from typing import List, Dict
-from openai import OpenAI
+import asyncio
+from typing import List, Dict, AsyncIterator
+from openai import OpenAI, AsyncOpenAI
+from models.response_cache import ResponseCache
+from global_define import constants
 
 
 class ModelManager:
@@ -18,7 +21,9 @@ class ModelManager:
     def __init__(self, 
                  api_key: str = "",
                  base_url: str = "https://openrouter.ai/api/v1",
-                 model: str = "google/gemma-3n-e4b-it"):
+                 model: str = "google/gemma-3n-e4b-it",
+                 cache: ResponseCache = None,
+                 max_concurrency: int = None):
         """
         初始化API模型
         
@@ -26,17 +31,50 @@ class ModelManager:
             api_key: API密钥
             base_url: API基础URL
             model: 模型名称
+            cache: 响应缓存，为None时不使用缓存
+            max_concurrency: 进程内所有异步请求共享的并发上限，为None时不限制
         """
         # 初始化客户端            
         self.client = OpenAI(api_key=api_key, base_url=base_url)
+        # 异步客户端，供并发调用使用，不阻塞事件循环
+        self.async_client = AsyncOpenAI(api_key=api_key, base_url=base_url)
         self.model = model
         # self.model = "google/gemma-3-12b-it"
         # self.model = "google/gemma-3-12b-it"
         self.model = "google/gemini-2.5-flash"
         # self.model = "google/gemini-2.0-flash-lite-001"
         # self.model = "google/gemini-2.5-flash-lite-preview-06-17"
+        self.temperature = 0
+        self.cache = cache
+        self.max_concurrency = max_concurrency
+        self._limiter = None  # 首次异步请求时在运行中的事件循环里创建
+
+    def set_max_concurrency(self, max_concurrency: int = None) -> None:
+        """设置进程内所有异步请求共享的并发上限（如批量处理多个文档时），为None时不限制"""
+        self.max_concurrency = max_concurrency
+        self._limiter = None
+
+    def _get_limiter(self):
+        if self.max_concurrency is None:
+            return None
+        if self._limiter is None:
+            self._limiter = asyncio.Semaphore(max(1, self.max_concurrency))
+        return self._limiter
     
-    def create_completion(self, messages: List[Dict]):
+    def _cache_key(self, messages: List[Dict], use_cache: bool, response_format: Dict = None):
+        """返回缓存键，缓存未启用或本次调用跳过缓存时返回None"""
+        if not use_cache or not self.cache or not self.cache.enabled:
+            return None
+        return self.cache.make_key(self.model, self.temperature, messages, response_format)
+
+    def _request_options(self, response_format: Dict = None) -> Dict:
+        """请求参数：指定响应格式（如JSON schema结构化输出）时一并传给模型"""
+        options = {"model": self.model, "temperature": self.temperature, "stream": True}
+        if response_format:
+            options["response_format"] = response_format
+        return options
+
+    def create_completion(self, messages: List[Dict], use_cache: bool = True, response_format: Dict = None):
         """
         流式创建聊天完成，支持多模态（文本+图片）
 
@@ -50,29 +88,103 @@ class ModelManager:
                     ...
                 ]
             兼容纯文本消息 [{"role": "user", "content": "内容"}]
+            use_cache: 是否使用响应缓存，为False时强制访问模型
+            response_format: 响应格式，如 {"type": "json_schema", "json_schema": {...}}，为None时不限制
 
         Yields:
             str: 每次生成的内容片段
         """
+        cache_key = self._cache_key(messages, use_cache, response_format)
+        if cache_key:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                yield cached
+                return
+
         if not self.client:
             print("模型客户端未初始化")
             return
 
         try:
-            stream = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=0,
-                stream=True
-            )
+            stream = self.client.chat.completions.create(messages=messages, **self._request_options(response_format))
+            chunks = []
             for chunk in stream:
                 # OpenAI/Google Gemini 多模态接口返回结构兼容
                 if hasattr(chunk.choices[0].delta, "content") and chunk.choices[0].delta.content:
+                    chunks.append(chunk.choices[0].delta.content)
                     yield chunk.choices[0].delta.content
+            # 只缓存完整结束的响应
+            if cache_key:
+                self.cache.put(cache_key, self.model, "".join(chunks))
         except Exception as e:
             print(f"调用模型失败: {str(e)}")
             return
 
 
+    async def acreate_completion(self, messages: List[Dict], use_cache: bool = True,
+                                 response_format: Dict = None) -> AsyncIterator[str]:
+        """
+        异步流式创建聊天完成，消息格式与 create_completion 相同
+
+        Args:
+            messages: 消息列表，支持文本和多模态格式
+            use_cache: 是否使用响应缓存，为False时强制访问模型
+            response_format: 响应格式，与 create_completion 相同
+
+        Yields:
+            str: 每次生成的内容片段
+
+        Raises:
+            Exception: 客户端未初始化或流式输出中途出错时抛出，调用方据此区分中断的响应和完整的响应
+        """
+        cache_key = self._cache_key(messages, use_cache, response_format)
+        if cache_key:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                yield cached
+                return
+
+        if not self.async_client:
+            raise RuntimeError("模型客户端未初始化")
+
+        # 缓存命中不占用并发名额，只有实际访问模型的请求受共享上限约束
+        limiter = self._get_limiter()
+        if limiter:
+            await limiter.acquire()
+        try:
+            stream = await self.async_client.chat.completions.create(messages=messages, **self._request_options(response_format))
+            chunks = []
+            async for chunk in stream:
+                if chunk.choices and getattr(chunk.choices[0].delta, "content", None):
+                    chunks.append(chunk.choices[0].delta.content)
+                    yield chunk.choices[0].delta.content
+            # 只缓存完整结束的响应
+            if cache_key:
+                self.cache.put(cache_key, self.model, "".join(chunks))
+        finally:
+            if limiter:
+                limiter.release()
+
+    async def acomplete(self, messages: List[Dict], use_cache: bool = True, response_format: Dict = None) -> str:
+        """
+        异步调用模型并返回完整的响应文本
+
+        Args:
+            messages: 消息列表，支持文本和多模态格式
+            use_cache: 是否使用响应缓存
+            response_format: 响应格式，与 create_completion 相同
+
+        Returns:
+            str: 完整的响应内容
+        """
+        chunks = [chunk async for chunk in self.acreate_completion(messages, use_cache, response_format)]
+        return "".join(chunks)
+
+
 # 全局单例实例
-llm_manager = ModelManager()
+llm_manager = ModelManager(cache=ResponseCache(
+    constants.LLM_CACHE_DIR,
+    max_bytes=constants.LLM_CACHE_MAX_BYTES,
+    max_age_seconds=constants.LLM_CACHE_MAX_AGE_SECONDS,
+    enabled=constants.LLM_CACHE_ENABLED
+))
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+LLM响应缓存 - 以模型名、温度和消息内容的哈希为键，将完整响应持久化到磁盘
+"""
+
+import os
+import json
+import time
+import hashlib
+from typing import List, Dict, Optional
+
+
+class ResponseCache:
+    """
+    磁盘响应缓存类 - 每条缓存保存为一个JSON文件，支持按总大小和存活时间淘汰
+    """
+
+    def __init__(self,
+                 cache_dir: str,
+                 max_bytes: int = 200 * 1024 * 1024,
+                 max_age_seconds: float = 30 * 24 * 3600,
+                 enabled: bool = True):
+        """
+        初始化响应缓存
+
+        Args:
+            cache_dir: 缓存目录
+            max_bytes: 缓存总大小上限，超出后按最近访问时间淘汰最旧的条目
+            max_age_seconds: 条目最长存活时间，超时的条目视为未命中并删除
+            enabled: 是否启用缓存，关闭时所有请求都直接访问模型
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._total_bytes = None  # 首次写入时扫描目录得到
+
+    @staticmethod
+    def make_key(model: str, temperature: float, messages: List[Dict], response_format: Optional[Dict] = None) -> str:
+        """根据模型名、温度、消息（包括图片的base64内容）和响应格式生成规范化的SHA-256键"""
+        request = {"model": model, "temperature": temperature, "messages": messages}
+        if response_format:
+            # 不指定响应格式时键与旧版本一致，已有缓存继续有效
+            request["response_format"] = response_format
+        payload = json.dumps(
+            request,
+            sort_keys=True, ensure_ascii=False, separators=(',', ':')
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[str]:
+        """读取缓存的响应，未命中、已过期或缓存关闭时返回None"""
+        if not self.enabled:
+            return None
+
+        path = self._entry_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            if time.time() - entry.get("created", 0) > self.max_age_seconds:
+                self._remove(path)
+                self._total_bytes = None
+                self.misses += 1
+                return None
+            response = entry["response"]
+            os.utime(path)  # 记录最近访问时间，用于LRU淘汰
+            self.hits += 1
+            return response
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            return None
+
+    def put(self, key: str, model: str, response: str) -> None:
+        """写入一条缓存，并在超出大小上限时淘汰旧条目"""
+        if not self.enabled or not response:
+            return
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, _, size in self._scan())
+
+            path = self._entry_path(key)
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"model": model, "created": time.time(), "response": response}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+            self._total_bytes += os.path.getsize(path) - old_size
+
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+        except OSError as e:
+            print(f"写入LLM缓存失败: {e}")
+
+    def clear(self) -> None:
+        """清空缓存目录"""
+        for path, _, _ in self._scan():
+            self._remove(path)
+        self._total_bytes = 0
+
+    @property
+    def stats(self) -> Dict:
+        """返回命中统计"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def _scan(self):
+        """返回 [(路径, 修改时间, 大小), ...]"""
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+                entries.append((path, stat.st_mtime, stat.st_size))
+            except OSError:
+                continue
+        return entries
+
+    def _evict(self) -> None:
+        """删除长期未访问的条目，再按最近访问时间从旧到新删除，直到总大小不超过上限"""
+        now = time.time()
+        entries = sorted(self._scan(), key=lambda entry: entry[1])
+        total = sum(size for _, _, size in entries)
+        for path, mtime, size in entries:
+            if total <= self.max_bytes and now - mtime <= self.max_age_seconds:
+                continue
+            self._remove(path)
+            total -= size
+        self._total_bytes = total
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
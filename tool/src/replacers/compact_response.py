@@ -0,0 +1,62 @@
+"""
+紧凑响应模块 - 表格键值提取的结构化输出格式
+提示词中的 data-cell-id 替换为按窗口编号的短数字句柄，模型按JSON schema只输出 {"k": 键, "c": 句柄}，
+不再回显字段值和完整的单元格ID；解析出的对象再映射回 data-cell-id
+"""
+import re
+from global_define.constants import ATTR_CELL_ID, ATTR_CELL_HANDLE
+
+_CELL_ID_ATTR = re.compile(rf'{ATTR_CELL_ID}="([^"]*)"')
+
+# OpenAI兼容接口的结构化输出参数（strict模式要求顶层为对象）
+RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "table_keys",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "pairs": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "k": {"type": "string"},
+                            "c": {"type": "integer"},
+                        },
+                        "required": ["k", "c"],
+                        "additionalProperties": False,
+                    },
+                },
+            },
+            "required": ["pairs"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+
+def assign_cell_handles(table_html: str) -> tuple[str, list[str]]:
+    """
+    将表格HTML中每个单元格的 data-cell-id 替换为从1开始的数字句柄（data-h）
+    返回 (替换后的HTML, 单元格ID列表)，句柄 N 对应列表中第 N-1 个单元格ID
+    """
+    cell_ids = []
+
+    def _replace(match):
+        cell_ids.append(match.group(1))
+        return f'{ATTR_CELL_HANDLE}="{len(cell_ids)}"'
+
+    return _CELL_ID_ATTR.sub(_replace, table_html), cell_ids
+
+
+def expand_item(item: dict, cell_ids: list[str]):
+    """将紧凑对象 {"k": 键, "c": 句柄} 还原为 {"key": 键, "value-cell-id": 单元格ID}，句柄无效时返回None"""
+    try:
+        handle = int(item.get('c'))
+    except (TypeError, ValueError):
+        return None
+    if not 1 <= handle <= len(cell_ids):
+        return None
+    return {"key": item.get('k'), "value-cell-id": cell_ids[handle - 1]}
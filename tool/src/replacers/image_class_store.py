@@ -0,0 +1,145 @@
+"""
+图片分类缓存模块 - 记录已识别图片的类型，相同或近似的图片无需再次调用LLM
+以图片内容的SHA-256做精确匹配，以差值感知哈希（dHash）的汉明距离做近似匹配
+"""
+import os
+import json
+import hashlib
+from PIL import Image
+from global_define import constants
+
+
+def compute_image_hashes(img_path: str) -> tuple[str, int]:
+    """
+    计算图片的内容哈希和感知哈希
+
+    返回:
+        tuple[str, int]: (文件内容的SHA-256十六进制串, 64位dHash)
+    """
+    with open(img_path, 'rb') as f:
+        content_hash = hashlib.sha256(f.read()).hexdigest()
+
+    # dHash: 缩放为9x8灰度图，逐行比较相邻像素的明暗得到64位指纹
+    with Image.open(img_path) as img:
+        if img.mode in ('RGBA', 'LA', 'P'):
+            img = img.convert('RGBA')
+            background = Image.new('RGBA', img.size, (255, 255, 255, 255))
+            img = Image.alpha_composite(background, img)
+        pixels = list(img.convert('L').resize((9, 8), Image.LANCZOS).getdata())
+
+    perceptual_hash = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            perceptual_hash = (perceptual_hash << 1) | (1 if left > right else 0)
+    return content_hash, perceptual_hash
+
+
+def hamming_distance(hash_a: int, hash_b: int) -> int:
+    """两个感知哈希之间的汉明距离"""
+    return bin(hash_a ^ hash_b).count('1')
+
+
+class ImageClassStore:
+    """图片分类缓存类，持久化保存 内容哈希/感知哈希 -> 图片类型"""
+
+    def __init__(self, store_path: str, max_distance: int = 4, enabled: bool = True):
+        """
+        初始化图片分类缓存
+
+        Args:
+            store_path: 缓存文件路径（JSON）
+            max_distance: 近似匹配允许的最大汉明距离，为0时只做精确匹配
+            enabled: 是否启用缓存
+        """
+        self.store_path = store_path
+        self.max_distance = max_distance
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._entries = None  # 内容哈希 -> (感知哈希, 类型)，首次使用时从磁盘加载
+
+    def _ensure_loaded(self) -> None:
+        if self._entries is not None:
+            return
+        self._entries = {}
+        if os.path.exists(self.store_path):
+            try:
+                with open(self.store_path, 'r', encoding='utf-8') as f:
+                    for entry in json.load(f):
+                        self._entries[entry['sha256']] = (int(entry['phash'], 16), entry['type'])
+            except (OSError, ValueError, KeyError) as e:
+                print(f"读取图片分类缓存失败: {e}")
+
+    def lookup(self, content_hash: str, perceptual_hash: int):
+        """
+        查找图片类型：先按内容哈希精确匹配，再找汉明距离最小且不超过阈值的感知哈希
+        未命中或缓存关闭时返回None
+        """
+        if not self.enabled:
+            return None
+        self._ensure_loaded()
+
+        entry = self._entries.get(content_hash)
+        if entry:
+            image_type = entry[1]
+        else:
+            image_type = find_similar(perceptual_hash, self._entries.values(), self.max_distance)
+
+        if image_type is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return image_type
+
+    def add(self, content_hash: str, perceptual_hash: int, image_type: str) -> None:
+        """记录一张图片的识别结果"""
+        if not self.enabled:
+            return
+        self._ensure_loaded()
+        self._entries[content_hash] = (perceptual_hash, image_type)
+
+    def save(self) -> None:
+        """将缓存写回磁盘（先写临时文件再替换，中断的写入不会损坏已有缓存）"""
+        if not self.enabled or self._entries is None:
+            return
+        entries = [
+            {'sha256': content_hash, 'phash': f"{perceptual_hash:016x}", 'type': image_type}
+            for content_hash, (perceptual_hash, image_type) in self._entries.items()
+        ]
+        os.makedirs(os.path.dirname(self.store_path), exist_ok=True)
+        tmp_path = f"{self.store_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entries, f, ensure_ascii=False, indent=4)
+        os.replace(tmp_path, self.store_path)
+
+    @property
+    def stats(self) -> dict:
+        """返回命中统计"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+def find_similar(perceptual_hash: int, candidates, max_distance: int):
+    """在 [(感知哈希, 值), ...] 中查找距离最小且不超过阈值的条目，返回其值"""
+    best_value, best_distance = None, max_distance + 1
+    for candidate_hash, value in candidates:
+        distance = hamming_distance(perceptual_hash, candidate_hash)
+        if distance < best_distance:
+            best_value, best_distance = value, distance
+            if distance == 0:
+                break
+    return best_value
+
+
+# 全局单例实例
+image_class_store = ImageClassStore(
+    constants.IMAGE_CLASS_STORE_PATH,
+    max_distance=constants.IMAGE_PHASH_MAX_DISTANCE,
+    enabled=constants.IMAGE_CLASS_STORE_ENABLED
+)
@@ -0,0 +1,170 @@
+"""
+图片预分类模块 - 调用LLM之前用颜色统计在本地识别特征明显的图片
+图片缩小后用NumPy计算直方图和颜色统计（白色背景占比、饱和度、主色占比、铁红色板占比、坐标轴线、色标条），
+按阈值规则识别热成像图、线温图、logo和可见光图；不满足任何规则的图片（以及"其它"类型）仍交给LLM
+"""
+import threading
+import numpy as np
+from PIL import Image
+from global_define import constants
+
+
+class ImagePreClassifier:
+    """图片预分类器，thresholds 中的阈值决定各类型规则的判定条件"""
+
+    def __init__(self, thresholds: dict, size: int = 160, enabled: bool = True):
+        """
+        初始化图片预分类器
+
+        Args:
+            thresholds: 各规则的阈值（键见 constants.IMAGE_PRECLASSIFIER_THRESHOLDS）
+            size: 计算统计量前将图片缩小到的最长边像素数
+            enabled: 是否启用预分类
+        """
+        self.thresholds = thresholds
+        self.size = size
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()  # classify 在线程池中并发执行
+
+    def classify(self, img_path: str):
+        """
+        识别图片类型，返回 (选项数字, 判定依据)；没有把握或预分类关闭时返回None
+        """
+        if not self.enabled:
+            return None
+        result = classify_features(compute_image_features(img_path, self.size), self.thresholds)
+        with self._stats_lock:
+            if result:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return result
+
+    @property
+    def stats(self) -> dict:
+        """返回本地识别统计"""
+        with self._stats_lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else 0.0,
+        }
+
+
+def compute_image_features(img_path: str, size: int = 160) -> dict:
+    """
+    计算图片的颜色统计特征（透明背景按白色处理）
+
+    返回:
+        dict: 原图尺寸 width/height，以及缩小后图片上的
+              white（近白像素占比）、saturated（高饱和像素占比）、top_colors（前8种主色的像素占比，每通道量化为16级）、
+              color_count（量化后的颜色数）、ironbow（铁红色板像素占比：紫-红-橙-黄的高饱和像素及近黑像素）、
+              h_lines / v_lines（贯穿60%宽/高的深色横线/竖线数量，只在浅色背景上有意义）、
+              scale_bar（是否有色标条：横向颜色一致、纵向亮度单调变化的窄条）
+    """
+    with Image.open(img_path) as img:
+        width, height = img.size
+        img = img.convert('RGBA')
+        background = Image.new('RGBA', img.size, (255, 255, 255, 255))
+        img = Image.alpha_composite(background, img).convert('RGB')
+        img.thumbnail((size, size), Image.BILINEAR)
+        rgb = np.asarray(img, dtype=np.int16)
+        hsv = np.asarray(img.convert('HSV'), dtype=np.int16)
+
+    hue, saturation, value = hsv[..., 0], hsv[..., 1], hsv[..., 2]
+    pixel_count = hue.size
+
+    quantized = rgb >> 4
+    codes = (quantized[..., 0] << 8) | (quantized[..., 1] << 4) | quantized[..., 2]
+    counts = np.bincount(codes.ravel(), minlength=4096)
+
+    # PIL的HSV色相范围为0-255：170以上为紫/品红，45以下为红/橙/黄
+    ironbow = (((hue >= 170) | (hue <= 45)) & (saturation > 80)) | (value < 40)
+    dark = rgb.mean(axis=-1) < 200
+
+    return {
+        "width": width,
+        "height": height,
+        "white": float(np.mean(rgb.min(axis=-1) > 225)),
+        "saturated": float(np.mean(saturation > 90)),
+        "top_colors": float(np.sort(counts)[-8:].sum() / pixel_count),
+        "color_count": int(np.count_nonzero(counts)),
+        "ironbow": float(ironbow.mean()),
+        "h_lines": int(np.count_nonzero(dark.mean(axis=1) > 0.6)),
+        "v_lines": int(np.count_nonzero(dark.mean(axis=0) > 0.6)),
+        "scale_bar": _has_scale_bar(rgb, saturation),
+    }
+
+
+def classify_features(features: dict, thresholds: dict):
+    """按阈值规则判定图片类型，返回 (选项数字, 判定依据) 或None；选项数字与 image_replacer.PLACEHOLDER_MAPPING 一致"""
+    t = thresholds
+    light_background = features["white"] >= t["chart_min_white"]
+
+    # 热成像图：有色标条，且画面以伪彩色为主
+    if features["scale_bar"] and max(features["ironbow"], features["saturated"]) >= t["thermal_min_palette"]:
+        return "2", f"色标条 + 伪彩色占比 {max(features['ironbow'], features['saturated']):.0%}"
+
+    # 线温图：白色背景上有横纵坐标轴，只有少量彩色曲线
+    if (light_background and features["h_lines"] >= 1 and features["v_lines"] >= 1
+            and features["saturated"] <= t["chart_max_saturated"] and features["top_colors"] >= t["chart_min_top_colors"]):
+        return "3", f"白色背景 {features['white']:.0%} + 坐标轴"
+
+    # logo：尺寸小、浅色背景、颜色少且带有彩色部分，没有横向坐标线
+    if (max(features["width"], features["height"]) <= t["logo_max_edge"] and features["white"] >= t["logo_min_white"]
+            and features["top_colors"] >= t["logo_min_top_colors"] and features["saturated"] >= t["logo_min_saturated"]
+            and features["h_lines"] == 0):
+        return "0", f"小尺寸 {features['width']}x{features['height']} + 主色占比 {features['top_colors']:.0%}"
+
+    # 可见光图：颜色丰富、没有大面积白色背景，也不像伪彩色
+    if (features["color_count"] >= t["photo_min_colors"] and features["top_colors"] <= t["photo_max_top_colors"]
+            and features["white"] <= t["photo_max_white"] and features["ironbow"] <= t["photo_max_ironbow"]
+            and features["saturated"] <= t["photo_max_saturated"]):
+        return "1", f"颜色数 {features['color_count']} + 主色占比 {features['top_colors']:.0%}"
+    return None
+
+
+def _has_scale_bar(rgb: np.ndarray, saturation: np.ndarray, min_height: float = 0.4) -> bool:
+    """
+    检测纵向色标条：某一列中横向与右侧像素颜色一致的最长连续段超过图高的 min_height，
+    且该段内亮度单调变化（幅度不小于120）、多数像素为高饱和色
+    """
+    height = rgb.shape[0]
+    luminance = rgb.mean(axis=-1)
+    uniform = np.abs(np.diff(rgb, axis=1)).sum(axis=-1) < 30
+    for col in range(uniform.shape[1]):
+        start, length = _longest_run(uniform[:, col])
+        if length < min_height * height:
+            continue
+        segment = luminance[start:start + length, col]
+        steps = np.diff(segment)
+        steps = steps[np.abs(steps) > 0.5]
+        if not steps.size or segment.max() - segment.min() < 120:
+            continue
+        monotonic = max(np.mean(steps > 0), np.mean(steps < 0))
+        if monotonic >= 0.85 and np.mean(saturation[start:start + length, col] > 60) >= 0.5:
+            return True
+    return False
+
+
+def _longest_run(mask: np.ndarray) -> tuple[int, int]:
+    """布尔数组中最长的连续True段，返回 (起始下标, 长度)"""
+    padded = np.concatenate(([False], mask, [False]))
+    edges = np.flatnonzero(np.diff(padded.astype(np.int8)))
+    if not edges.size:
+        return 0, 0
+    starts, ends = edges[::2], edges[1::2]
+    longest = int(np.argmax(ends - starts))
+    return int(starts[longest]), int(ends[longest] - starts[longest])
+
+
+# 全局单例实例
+image_preclassifier = ImagePreClassifier(
+    constants.IMAGE_PRECLASSIFIER_THRESHOLDS,
+    size=constants.IMAGE_PRECLASSIFIER_SIZE,
+    enabled=constants.IMAGE_PRECLASSIFIER_ENABLED
+)
@@ -1,132 +1,309 @@
 import os
-import base64
-from bs4 import BeautifulSoup
-import json
+import re
+import asyncio
 from models.model_manager import llm_manager
 from callback.callback import callback_handler
-from global_define.constants import DEFAULT_HTML_PATH, DOCUMENT_DIR, EXTRACT_DIR, PLACEHOLDER_IMAGES_DIR, IMAGE_PLACEHOLDER_MAP_PATH
+from global_define.constants import PLACEHOLDER_IMAGES_DIR, IMAGE_BATCH_SIZE, LLM_MAX_CONCURRENCY
+from context.document_context import DocumentContext
+from replacers.image_class_store import image_class_store, compute_image_hashes, find_similar
+from replacers.image_preclassifier import image_preclassifier
+from replacers.image_thumbnail import make_thumbnail, format_size
+from replacers.json_stream import JsonArrayStreamParser
 # 移除对 extract_and_save_images 的导入，因为图片提取已在extractor中完成
 # from extractors.image_extractor import extract_and_save_images
 
-async def replace_images():
+# 只含选项数字的数组，如 [2, 0, 4] 或 ["2", "0", "4"]
+_OPTION_ARRAY = re.compile(r'\[\s*"?\d"?(?:\s*,\s*"?\d"?)*\s*,?\s*\]')
+
+# 占位符图片映射：识别类型 -> 占位符图片文件名
+PLACEHOLDER_MAPPING = {
+    "0": "logo.png",
+    "1": "可见光图.png",
+    "2": "热成像图.png",
+    "3": "线温图.png",
+    "4": "其它.png"
+}
+
+
+def _read_prompt(file_name: str) -> str:
+    prompt_path = os.path.join(os.path.dirname(__file__), file_name)
+    with open(prompt_path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def _image_content(img_base64: str, mime_type: str = "image/png") -> dict:
+    return {"type": "image_url", "image_url": {"url": f"data:{mime_type};base64,{img_base64}"}}
+
+
+def _prepare_image(img_path: str):
+    """
+    在线程池中执行的像素处理：先本地预分类，没有把握时生成发送给LLM的缩略图
+    返回 (预分类结果, None) 或 (None, make_thumbnail 的结果)
+    """
+    preclassified_result = image_preclassifier.classify(img_path)
+    if preclassified_result:
+        return preclassified_result, None
+    return None, make_thumbnail(img_path)
+
+
+def _parse_single_response(response: str):
+    """从单张图片的识别结果中解析出选项数字，无法识别时返回None"""
+    for option in PLACEHOLDER_MAPPING.keys():
+        if option in response:
+            return option
+    return None
+
+
+def _parse_batch_response(response: str, image_count: int) -> dict:
+    """
+    解析批量识别结果，返回 {批内序号(从0开始): 选项数字}
+    只保留能解析出有效选项的图片，其余图片由调用方回退为单张识别
+    """
+    results = {}
+    # 与表格键值对相同的数组解析：忽略数组前后的说明文字，多个数组时取最后一个含对象的数组
+    parser = JsonArrayStreamParser()
+    parser.feed(response)
+    items = parser.objects
+
+    # 兼容纯数字数组：[2, 0, 4]，取最后一个数量与图片数一致、只含选项数字的方括号
+    if not items:
+        for match in reversed(_OPTION_ARRAY.findall(response)):
+            options = re.findall(r'\d', match)
+            if len(options) == image_count:
+                items = [{"image": i + 1, "type": option} for i, option in enumerate(options)]
+                break
+
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        try:
+            position = int(item.get("image")) - 1
+        except (TypeError, ValueError):
+            continue
+        option = str(item.get("type", "")).strip()
+        if 0 <= position < image_count and option in PLACEHOLDER_MAPPING:
+            results[position] = option
+    return results
+
+
+async def _classify_single(img_base64: str, image_prompt_template: str, mime_type: str = "image/png"):
+    """单张图片识别，返回选项数字或None"""
+    messages = [
+        {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": image_prompt_template},
+                _image_content(img_base64, mime_type)
+            ]
+        }
+    ]
+    response = await llm_manager.acomplete(messages)
+    return response, _parse_single_response(response)
+
+
+async def _classify_batch(batch: list, batch_prompt_template: str) -> dict:
+    """
+    批量识别一组图片，batch 为 [(图片序号, base64, MIME类型), ...]
+    返回 {图片序号: 选项数字}，只包含成功解析的图片
+    """
+    content = [{"type": "text", "text": batch_prompt_template.replace("{image_count}", str(len(batch)))}]
+    for position, (_, img_base64, mime_type) in enumerate(batch):
+        content.append({"type": "text", "text": f"图片{position + 1}:"})
+        content.append(_image_content(img_base64, mime_type))
+    response = await llm_manager.acomplete([{"role": "user", "content": content}])
+    await callback_handler.debug(f"LLM批量识别结果: {response.strip()}")
+
+    parsed = _parse_batch_response(response, len(batch))
+    return {batch[position][0]: option for position, option in parsed.items()}
+
+
+async def replace_images(ctx: DocumentContext, batch_size: int = IMAGE_BATCH_SIZE, max_concurrency: int = LLM_MAX_CONCURRENCY):
     """
-    使用LLM识别HTML中已提取的图片类型，并将img src替换为对应的占位符图片路径
+    使用LLM识别HTML中已提取的图片类型，并将img src替换为对应的占位符图片路径，
+    识别结果保存到 ctx.placeholder_map。
+    batch_size > 1 时每个请求打包多张图片，多个批次并发执行（最多 max_concurrency 个），
+    批量结果中无法解析的图片回退为单张识别。
+    已知图片（图片分类缓存命中）和文档内重复/近似的图片不再调用LLM；
+    颜色统计特征明显的图片由预分类器（见 image_preclassifier）在本地识别，其余图片才交给LLM；
+    发送给LLM的是缩小并重新编码的缩略图（见 image_thumbnail），提取出的原图不变。
+    哈希计算、预分类和缩略图编码在线程池中执行。
     """
     try:
         await callback_handler.output_callback("--- 开始处理图片识别和替换 ---")
-        
-        # 1. 读取HTML内容
-        await callback_handler.output_callback("步骤 1/3: 读取HTML内容...")
-        with open(DEFAULT_HTML_PATH, 'r', encoding='utf-8') as f:
-            html_content = f.read()
-        
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
-        # 2. 逐一识别图片并替换
-        await callback_handler.output_callback("步骤 2/3: 使用LLM识别图片类型...")
-        
-        # 读取prompt模板
-        prompt_path = os.path.join(os.path.dirname(__file__), "image_prompt.txt")
-        with open(prompt_path, 'r', encoding='utf-8') as f:
-            image_prompt_template = f.read()
-        
-        # 占位符图片映射
-        placeholder_mapping = {
-            "0": "logo.png",
-            "1": "可见光图.png",
-            "2": "热成像图.png",
-            "3": "线温图.png",
-            "4": "其它.png"
-        }
-        
-        replaced_count = 0
-        html_to_placeholder_map = {} # 新增：用于存储HTML img索引到占位符文件名的映射
-
-        # 遍历所有img标签，只处理src指向EXTRACT_DIR的图片
-        # 注意：这里需要确保EXTRACT_DIR的相对路径是正确的
-        relative_extract_dir = os.path.relpath(EXTRACT_DIR, os.path.dirname(DEFAULT_HTML_PATH)).replace("\\", "/")
-        img_tags_to_process = [img_tag for img_tag in soup.find_all('img') if img_tag.get('src') and img_tag.get('src').startswith(relative_extract_dir)]
-        
-        if not img_tags_to_process:
+
+        soup = ctx.soup
+
+        # 1. 读取图片
+        await callback_handler.output_callback("步骤 1/3: 读取待识别图片...")
+        image_prompt_template = _read_prompt("image_prompt.txt")
+        batch_prompt_template = _read_prompt("image_batch_prompt.txt")
+
+        # 遍历所有img标签，只处理src指向任务工作区extract_dir的图片
+        # 键使用img在HTML中的索引，与 ctx.image_map 保持一致
+        relative_extract_dir = os.path.relpath(ctx.workspace.extract_dir, ctx.html_dir).replace("\\", "/")
+        img_tags = soup.find_all('img')
+        img_indexes_to_process = [i for i, img_tag in enumerate(img_tags) if img_tag.get('src') and img_tag.get('src').startswith(relative_extract_dir)]
+
+        if not img_indexes_to_process:
             await callback_handler.output_callback("没有发现需要处理的图片。")
             return
-            
-        for i, img_tag in enumerate(img_tags_to_process):
-            img_src = img_tag.get('src')
-            # 构造图片的绝对路径
-            img_path = os.path.join(os.path.dirname(DEFAULT_HTML_PATH), img_src)
-            
-            await callback_handler.output_callback(f"识别第 {i+1}/{len(img_tags_to_process)} 张图片: {img_path}...")
-            
-            # 将图片转为base64用于LLM识别
-            try:
-                with open(img_path, 'rb') as img_file:
-                    img_base64 = base64.b64encode(img_file.read()).decode('utf-8')
-                
-                # 构造消息（包含图像）
-                messages = [
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": image_prompt_template},
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/png;base64,{img_base64}"
-                                }
-                            }
-                        ]
-                    }
-                ]
-                
-                # 调用LLM进行图片识别
-                stream = llm_manager.create_completion(messages)
-                response = "".join([chunk for chunk in stream])
-                
-                await callback_handler.output_callback(f"LLM识别结果: {response.strip()}")
-                
-                # 解析识别结果，提取选项数字
-                identified_type = None
-                for option in placeholder_mapping.keys():
-                    if option in response:
-                        identified_type = option
-                        break
-                
-                if identified_type and identified_type in placeholder_mapping:
-                    # 构造占位符图片路径 - 使用相对路径，相对于HTML文件位置
-                    placeholder_filename = placeholder_mapping[identified_type]
-                    # 生成相对于HTML文件的路径
-                    placeholder_path = os.path.join("placeholder_images", placeholder_filename).replace("\\", "/")
-                    
-                    # 替换img标签的src属性
-                    img_tag['src'] = placeholder_path
-                    replaced_count += 1
-                    
-                    # 保存映射关系
-                    img_id = f"{i}"
-                    html_to_placeholder_map[img_id] = placeholder_filename
-
-                    await callback_handler.output_callback(f"图片 {i+1} 识别为类型 {identified_type}，已替换为占位符: {placeholder_filename}")
-                else:
-                    await callback_handler.output_callback(f"警告：无法识别图片 {i+1} 的类型，跳过替换")
-                    
-            except Exception as e:
-                await callback_handler.output_callback(f"处理图片 {i+1} 时出错: {e}")
-        
-        # 3. 保存修改后的HTML
-        await callback_handler.output_callback("步骤 3/3: 保存修改后的HTML...")
-        with open(DEFAULT_HTML_PATH, 'w', encoding='utf-8') as f:
-            f.write(str(soup))
-        
-        # 保存HTML img索引到placeholder_image文件名的映射
-        os.makedirs(os.path.dirname(IMAGE_PLACEHOLDER_MAP_PATH), exist_ok=True)
-        with open(IMAGE_PLACEHOLDER_MAP_PATH, 'w', encoding='utf-8') as f:
-            json.dump(html_to_placeholder_map, f, ensure_ascii=False, indent=4)
-        await callback_handler.output_callback(f"成功保存图片占位符映射: {IMAGE_PLACEHOLDER_MAP_PATH}")
-
-        await callback_handler.output_callback(f"--- 完成图片识别和替换，共处理 {len(img_tags_to_process)} 张图片，成功替换 {replaced_count} 张 ---\n")
-        
+
+        # 哈希计算、预分类和缩略图编码等像素处理在线程池中并发执行，不阻塞事件循环
+        img_paths = {img_index: os.path.join(ctx.html_dir, img_tags[img_index].get('src')) for img_index in img_indexes_to_process}
+        hash_results = await asyncio.gather(
+            *(asyncio.to_thread(compute_image_hashes, img_paths[img_index]) for img_index in img_indexes_to_process),
+            return_exceptions=True
+        )
+
+        identified_types = {}
+        image_hashes = {}   # 图片序号 -> (内容哈希, 感知哈希)
+        duplicates = {}     # 代表图片序号 -> 与其相同或近似的其它图片序号
+        representatives_by_content = {}
+        representatives_by_perceptual = []
+        for img_index, hash_result in zip(img_indexes_to_process, hash_results):
+            if isinstance(hash_result, Exception):
+                await callback_handler.output_callback(f"读取图片 {img_paths[img_index]} 时出错: {hash_result}")
+                continue
+            content_hash, perceptual_hash = hash_result
+            image_hashes[img_index] = (content_hash, perceptual_hash)
+
+            # 已知图片直接使用缓存的类型
+            cached_type = image_class_store.lookup(content_hash, perceptual_hash)
+            if cached_type:
+                identified_types[img_index] = cached_type
+                continue
+
+            # 文档内重复或近似的图片只识别一次
+            representative = representatives_by_content.get(content_hash)
+            if representative is None:
+                representative = find_similar(perceptual_hash, representatives_by_perceptual, image_class_store.max_distance)
+            if representative is not None:
+                duplicates[representative].append(img_index)
+                continue
+
+            representatives_by_content[content_hash] = img_index
+            representatives_by_perceptual.append((perceptual_hash, img_index))
+            duplicates[img_index] = []
+        cached_count = len(identified_types)
+
+        # 特征明显的图片在本地识别，其余图片生成发送给LLM的缩略图
+        prepare_results = await asyncio.gather(
+            *(asyncio.to_thread(_prepare_image, img_paths[img_index]) for img_index in duplicates),
+            return_exceptions=True
+        )
+        preclassified = set()  # 预分类器在本地识别的图片序号
+        images = []            # [(图片序号, base64, MIME类型), ...]
+        original_bytes = payload_bytes = 0
+        for img_index, prepare_result in zip(list(duplicates), prepare_results):
+            if isinstance(prepare_result, Exception):
+                await callback_handler.output_callback(f"读取图片 {img_paths[img_index]} 时出错: {prepare_result}")
+                continue
+            preclassified_result, thumbnail = prepare_result
+            if preclassified_result:
+                identified_types[img_index], reason = preclassified_result
+                preclassified.add(img_index)
+                await callback_handler.debug(f"图片 {img_index} 预分类为类型 {identified_types[img_index]}（{reason}），无需调用LLM")
+                continue
+            img_base64, mime_type, original_size, payload_size = thumbnail
+            images.append((img_index, img_base64, mime_type))
+            original_bytes += original_size
+            payload_bytes += payload_size
+
+        duplicate_count = sum(len(indexes) for indexes in duplicates.values())
+        await callback_handler.output_callback(
+            f"共 {len(img_indexes_to_process)} 张图片：分类缓存命中 {cached_count} 张，"
+            f"本地预分类 {len(preclassified)} 张，文档内重复 {duplicate_count} 张，需调用LLM识别 {len(images)} 张"
+        )
+        if images:
+            saved = 1 - payload_bytes / original_bytes if original_bytes else 0
+            await callback_handler.output_callback(
+                f"发送给LLM的图片 {format_size(original_bytes)} -> {format_size(payload_bytes)}（节省 {saved:.0%}）"
+            )
+        ctx.image_stats = {"payload_bytes": payload_bytes, "payload_bytes_saved": original_bytes - payload_bytes}
+
+        # 2. 识别图片类型
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        recognized_count = 0
+
+        async def _report_progress(count: int):
+            nonlocal recognized_count
+            recognized_count += count
+            await callback_handler.progress("识别图片", recognized_count, len(images))
+
+        if batch_size > 1:
+            # 只剩一张图片的批次直接走单张识别
+            batches = [images[i:i + batch_size] for i in range(0, len(images), batch_size)]
+            batches = [batch for batch in batches if len(batch) > 1]
+            await callback_handler.output_callback(f"步骤 2/3: 使用LLM批量识别图片类型（{len(images)} 张，{len(batches)} 批，并发数: {max_concurrency}）...")
+
+            async def _run_batch(batch):
+                async with semaphore:
+                    try:
+                        batch_result = await _classify_batch(batch, batch_prompt_template)
+                    except Exception as e:
+                        await callback_handler.warn(f"批量识别图片时出错: {e}")
+                        return {}
+                await _report_progress(len(batch_result))
+                return batch_result
+
+            for batch_result in await asyncio.gather(*(_run_batch(batch) for batch in batches)):
+                identified_types.update(batch_result)
+        else:
+            await callback_handler.output_callback(f"步骤 2/3: 使用LLM逐张识别图片类型（{len(images)} 张，并发数: {max_concurrency}）...")
+
+        # 批量结果缺失的图片回退为单张识别
+        fallback_images = [image for image in images if image[0] not in identified_types]
+        if fallback_images and batch_size > 1:
+            await callback_handler.output_callback(f"{len(fallback_images)} 张图片改为单张识别（批量结果无法解析或批次仅含一张图片）...")
+
+        async def _run_single(img_index, img_base64, mime_type):
+            async with semaphore:
+                try:
+                    response, option = await _classify_single(img_base64, image_prompt_template, mime_type)
+                    await callback_handler.debug(f"图片 {img_index} LLM识别结果: {response.strip()}")
+                except Exception as e:
+                    await callback_handler.warn(f"处理图片 {img_index} 时出错: {e}")
+                    option = None
+            await _report_progress(1)
+            return img_index, option
+
+        for img_index, option in await asyncio.gather(*(_run_single(*image) for image in fallback_images)):
+            if option:
+                identified_types[img_index] = option
+
+        # 记录LLM识别结果到分类缓存（预分类结果每次可重新计算，不记录），并应用到文档内的重复图片
+        for img_index, duplicate_indexes in duplicates.items():
+            identified_type = identified_types.get(img_index)
+            if identified_type:
+                if img_index not in preclassified:
+                    image_class_store.add(*image_hashes[img_index], identified_type)
+                for duplicate_index in duplicate_indexes:
+                    identified_types[duplicate_index] = identified_type
+        image_class_store.save()
+
+        # 3. 按HTML顺序替换img标签并记录映射
+        await callback_handler.output_callback("步骤 3/3: 替换图片并记录占位符映射...")
+        html_to_placeholder_map = {}
+        for img_index in img_indexes_to_process:
+            identified_type = identified_types.get(img_index)
+            if identified_type:
+                # 构造占位符图片路径 - 使用相对路径，相对于HTML文件位置
+                placeholder_filename = PLACEHOLDER_MAPPING[identified_type]
+                placeholder_path = os.path.join(PLACEHOLDER_IMAGES_DIR, placeholder_filename)
+                img_tags[img_index]['src'] = os.path.relpath(placeholder_path, ctx.html_dir).replace("\\", "/")
+                html_to_placeholder_map[f"{img_index}"] = placeholder_filename
+                await callback_handler.debug(f"图片 {img_index} 识别为类型 {identified_type}，已替换为占位符: {placeholder_filename}")
+            else:
+                await callback_handler.warn(f"警告：无法识别图片 {img_index} 的类型，跳过替换")
+
+        # 识别结果由任务结束时统一写盘
+        ctx.placeholder_map = html_to_placeholder_map
+
+        stats = image_class_store.stats
+        await callback_handler.output_callback(f"图片分类缓存（本进程累计）: 命中 {stats['hits']} 次，未命中 {stats['misses']} 次，命中率 {stats['hit_rate']:.0%}")
+        await callback_handler.output_callback(f"--- 完成图片识别和替换，共处理 {len(img_indexes_to_process)} 张图片，成功替换 {len(html_to_placeholder_map)} 张 ---\n")
+
     except Exception as e:
         await callback_handler.output_callback(f"图片识别和替换过程中发生严重错误: {e}")
         import traceback
-        traceback.print_exc()
\ No newline at end of file
+        traceback.print_exc()
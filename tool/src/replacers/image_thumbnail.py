@@ -0,0 +1,63 @@
+"""
+图片缩略图模块 - 发送给视觉模型识别类型前把图片缩小并重新编码，减小请求体积
+缩略图只用于分类请求，不写入磁盘，提取出的原图和最终文档中的图片都不受影响
+"""
+import io
+import base64
+from PIL import Image
+from global_define import constants
+
+# 支持的编码格式 -> MIME类型
+THUMBNAIL_MIME_TYPES = {
+    "JPEG": "image/jpeg",
+    "WEBP": "image/webp",
+}
+
+
+def make_thumbnail(img_path: str, max_edge: int = None, image_format: str = None, quality: int = None) -> tuple[str, str, int, int]:
+    """
+    生成发送给视觉模型的图片内容
+
+    Args:
+        img_path: 提取出的原图路径（PNG）
+        max_edge: 最长边像素数，超过时等比缩小，默认为 constants.IMAGE_THUMBNAIL_MAX_EDGE
+        image_format: 编码格式 "JPEG" / "WEBP"，默认为 constants.IMAGE_THUMBNAIL_FORMAT
+        quality: 编码质量（1-100），默认为 constants.IMAGE_THUMBNAIL_QUALITY
+
+    Returns:
+        tuple[str, str, int, int]: (base64内容, MIME类型, 原图字节数, 发送的字节数)
+        缩略图关闭或重新编码后反而更大（如颜色很少的小logo）时发送原图
+    """
+    with open(img_path, 'rb') as f:
+        original = f.read()
+    if not constants.IMAGE_THUMBNAIL_ENABLED:
+        return base64.b64encode(original).decode('utf-8'), "image/png", len(original), len(original)
+
+    max_edge = max_edge or constants.IMAGE_THUMBNAIL_MAX_EDGE
+    image_format = (image_format or constants.IMAGE_THUMBNAIL_FORMAT).upper()
+    quality = quality or constants.IMAGE_THUMBNAIL_QUALITY
+    if image_format not in THUMBNAIL_MIME_TYPES:
+        raise ValueError(f"未知的缩略图格式: {image_format}")
+
+    with Image.open(io.BytesIO(original)) as img:
+        # 透明背景按白色处理（与Word中的显示效果一致），JPEG不支持透明通道
+        if img.mode in ('RGBA', 'LA', 'P'):
+            img = img.convert('RGBA')
+            background = Image.new('RGBA', img.size, (255, 255, 255, 255))
+            img = Image.alpha_composite(background, img)
+        img = img.convert('RGB')
+        img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+        buffer = io.BytesIO()
+        img.save(buffer, format=image_format, quality=quality)
+    payload = buffer.getvalue()
+
+    if len(payload) >= len(original):
+        return base64.b64encode(original).decode('utf-8'), "image/png", len(original), len(original)
+    return base64.b64encode(payload).decode('utf-8'), THUMBNAIL_MIME_TYPES[image_format], len(original), len(payload)
+
+
+def format_size(size: int) -> str:
+    """字节数转换为便于阅读的KB/MB文本"""
+    if size >= 1024 * 1024:
+        return f"{size / 1024 / 1024:.1f} MB"
+    return f"{size / 1024:.1f} KB"
@@ -0,0 +1,108 @@
+"""
+流式JSON数组解析模块 - 在LLM流式输出的过程中逐个解析数组中的对象
+每个对象的右花括号到达时立即返回该对象，无需等待完整响应，也不对整段输出做正则回溯；
+数组前后的说明文字被忽略，对象内的尾随逗号会被修正；
+输出中有多个顶层数组（如答案前的示例数组）时只保留最后一个含对象的顶层数组中的对象：
+之后的顶层数组解析出对象时，之前已返回的对象作废（resets 加一），调用方需撤销据此做的处理，
+因此对象在流结束前都是暂定的，最终结果以 objects 为准
+"""
+import re
+import json
+
+# 需要关注的字符：字符串引号、转义符和括号，其余字符整段跳过
+_SPECIAL_CHARS = re.compile(r'[\\"{}\[\]]')
+_TRAILING_COMMA = re.compile(r',\s*([}\]])')
+
+
+class JsonArrayStreamParser:
+    """增量解析器类，feed 每个输出片段，返回本片段内完成的顶层对象"""
+
+    def __init__(self):
+        self.objects = []       # 已解析的全部对象
+        self.invalid_count = 0  # 括号完整但无法解析的对象数量
+        self.resets = 0         # 已返回的对象因新的顶层数组而作废的次数
+        self._array_depth = 0   # 对象外的方括号深度，只解析数组中的对象
+        self._array_serial = 0  # 已开始的顶层数组数量，当前顶层数组的序号
+        self._objects_array = 0 # objects 中的对象所属的顶层数组序号
+        self._object_depth = 0
+        self._in_string = False
+        self._pending_escape = False  # 上一个片段以字符串中的反斜杠结尾
+        self._buffer = []       # 当前未完成对象跨片段的文本
+
+    def feed(self, text: str) -> list[dict]:
+        """
+        输入一个输出片段，返回本片段内完成的对象（按出现顺序）
+        新的顶层数组中解析出第一个对象时，之前数组的对象从 objects 中丢弃；之前的片段已返回过对象时 resets 加一
+        """
+        completed = []
+        object_start = 0 if self._object_depth else None
+        skip_until = 0
+        if self._pending_escape:
+            self._pending_escape = False
+            skip_until = 1
+
+        for match in _SPECIAL_CHARS.finditer(text):
+            pos = match.start()
+            if pos < skip_until:
+                continue
+            char = match.group()
+
+            if self._in_string:
+                if char == '\\':
+                    # 跳过被转义的下一个字符，它在下一个片段中时留到下次处理
+                    if pos + 1 < len(text):
+                        skip_until = pos + 2
+                    else:
+                        self._pending_escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif self._object_depth:
+                if char == '"':
+                    self._in_string = True
+                elif char == '{':
+                    self._object_depth += 1
+                elif char == '}':
+                    self._object_depth -= 1
+                    if not self._object_depth:
+                        self._buffer.append(text[object_start:pos + 1])
+                        obj = _loads_object("".join(self._buffer))
+                        self._buffer = []
+                        object_start = None
+                        if obj is None:
+                            self.invalid_count += 1
+                        else:
+                            if self._objects_array != self._array_serial:
+                                # 新的顶层数组：之前数组中的对象（示例或说明文字中的数组）作废
+                                if self.objects:
+                                    self.resets += 1
+                                self._objects_array = self._array_serial
+                                self.objects = []
+                                completed = []
+                            completed.append(obj)
+            elif char == '[':
+                if not self._array_depth:
+                    self._array_serial += 1
+                self._array_depth += 1
+            elif char == ']':
+                self._array_depth = max(0, self._array_depth - 1)
+            elif char == '{' and self._array_depth:
+                self._object_depth = 1
+                object_start = pos
+            # 数组外说明文字中的引号和花括号不影响解析
+
+        if self._object_depth and object_start is not None:
+            self._buffer.append(text[object_start:])
+        self.objects.extend(completed)
+        return completed
+
+
+def _loads_object(text: str):
+    """解析一个对象，失败时去掉尾随逗号再试一次；结果不是对象时返回None"""
+    try:
+        obj = json.loads(text)
+    except json.JSONDecodeError:
+        try:
+            obj = json.loads(_TRAILING_COMMA.sub(r'\1', text))
+        except json.JSONDecodeError:
+            return None
+    return obj if isinstance(obj, dict) else None
@@ -0,0 +1,118 @@
+"""
+表格分块模块 - 将超出token预算的长表格按行切分为多个窗口，每个窗口重复表头行
+窗口不会拆开纵向合并（rowspan）的行，各窗口可并发交给LLM处理，结果按 value-cell-id 合并去重
+"""
+import math
+import re
+from bs4 import BeautifulSoup
+
+# CJK字符大致每字一个token，其余字符大致每4个字符一个token
+_CJK_PATTERN = re.compile(r'[　-鿿가-힯＀-￯]')
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估计文本的token数（不依赖具体模型的分词器，只用于分块预算）"""
+    cjk_count = len(_CJK_PATTERN.findall(text))
+    return cjk_count + math.ceil((len(text) - cjk_count) / 4)
+
+
+def split_table(table_html: str, max_tokens: int, header_rows: int = 1) -> list[str]:
+    """
+    将表格HTML按行切分为若干窗口，每个窗口的token估计不超过 max_tokens（单个不可拆分的行组超出时单独成块）
+    表格本身不超过预算时原样返回 [table_html]
+
+    Args:
+        table_html: 提取后的简化表格HTML
+        max_tokens: 每个窗口（含重复的表头行）的token预算
+        header_rows: 每个窗口重复的表头行数；<thead> 中的行总是作为表头，被表头单元格纵向合并覆盖的行也并入表头
+    """
+    if estimate_tokens(table_html) <= max_tokens:
+        return [table_html]
+
+    soup = BeautifulSoup(table_html, 'html.parser')
+    table = soup.find('table')
+    rows = table.find_all('tr') if table else []
+    if not rows:
+        return [table_html]
+
+    groups = _row_groups(rows)
+    header_count = _header_row_count(table, rows, header_rows)
+    # 表头按行组边界取整，不拆开纵向合并
+    header_groups = []
+    while groups and sum(len(group) for group in header_groups) < header_count:
+        header_groups.append(groups.pop(0))
+    if not groups:
+        return [table_html]
+
+    caption = table.find('caption')
+    prefix = '<table border="1">' + (str(caption) if caption else '')
+    header_html = "".join(str(row) for group in header_groups for row in group)
+    base_tokens = estimate_tokens(prefix + header_html + '</table>')
+
+    chunks, current, current_tokens = [], [], base_tokens
+    for group in groups:
+        group_html = "".join(str(row) for row in group)
+        group_tokens = estimate_tokens(group_html)
+        if current and current_tokens + group_tokens > max_tokens:
+            chunks.append(current)
+            current, current_tokens = [], base_tokens
+        current.append(group_html)
+        current_tokens += group_tokens
+    if current:
+        chunks.append(current)
+
+    return [f"{prefix}{header_html}{''.join(chunk)}</table>" for chunk in chunks]
+
+
+def merge_kv_pairs(chunk_results: list) -> list:
+    """
+    合并同一表格各窗口的键值对列表，按 value-cell-id 去重（保留先出现的，即靠前窗口的结果）
+    解析失败的窗口（None）跳过；所有窗口都失败时返回None
+    """
+    if all(not isinstance(result, list) for result in chunk_results):
+        return None
+    merged, seen = [], set()
+    for result in chunk_results:
+        if not isinstance(result, list):
+            continue
+        for item in result:
+            if not isinstance(item, dict):
+                continue
+            value_cell_id = item.get('value-cell-id')
+            if value_cell_id in seen:
+                continue
+            if value_cell_id:
+                seen.add(value_cell_id)
+            merged.append(item)
+    return merged
+
+
+def _row_groups(rows) -> list[list]:
+    """将行划分为不可拆分的行组：某行单元格的rowspan覆盖到的后续行与该行在同一组"""
+    groups = []
+    index = 0
+    while index < len(rows):
+        end = index
+        group = []
+        while index <= end and index < len(rows):
+            row = rows[index]
+            for cell in row.find_all(['td', 'th'], recursive=False):
+                end = max(end, index + _int(cell.get('rowspan')) - 1)
+            group.append(row)
+            index += 1
+        groups.append(group)
+    return groups
+
+
+def _header_row_count(table, rows, header_rows: int) -> int:
+    thead = table.find('thead')
+    if thead:
+        return max(header_rows, len(thead.find_all('tr')))
+    return min(header_rows, len(rows))
+
+
+def _int(value) -> int:
+    try:
+        return max(1, int(value))
+    except (TypeError, ValueError):
+        return 1
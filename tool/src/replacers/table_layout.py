@@ -0,0 +1,76 @@
+"""
+表格布局模块 - 计算表格的结构指纹，将布局相同的表格聚类
+指纹由逻辑网格（行列坐标、合并信息、嵌套/图片/斜线标记）和规范化后的标签单元格文本组成，
+值单元格（空、"-"、含数字的文本，或紧跟在以冒号结尾的标签之后的单元格）被屏蔽；指纹相同的表格可共用一次LLM结果，
+键与单元格的对应关系按单元格在表格中的相对位置投射到其它表格的 data-cell-id 上
+"""
+import re
+import json
+import hashlib
+from bs4 import BeautifulSoup
+from global_define.constants import ATTR_CELL_ID, ATTR_DIAGONAL_SPLIT_TYPE, ATTR_HAS_NESTED_TABLE, ATTR_HAS_IMG
+from replacers.table_serializer import iter_grid_cells
+
+_WHITESPACE = re.compile(r'\s+')
+_DIGIT = re.compile(r'\d')
+VALUE_MASK = '*'
+# 指纹算法版本，计算方式变化时递增（持久化的布局记忆据此失效）
+FINGERPRINT_VERSION = 1
+
+
+class TableLayout:
+    """表格布局类，持有结构指纹和按文档顺序的单元格ID列表（单元格在列表中的下标即其相对位置）"""
+
+    def __init__(self, table_html: str):
+        self.cell_ids = []
+        self.label_count = 0  # 未被屏蔽的标签单元格数量
+        parts = []
+        table = BeautifulSoup(table_html, 'html.parser').find('table')
+        if table is not None:
+            caption = table.find('caption')
+            parts.append(self._mask(caption.get_text(strip=True)) if caption else '')
+            previous = (None, '')  # 同一行中前一个单元格的 (行号, 规范化文本)
+            for row_idx, col, colspan, rowspan, cell in iter_grid_cells(table):
+                self.cell_ids.append(cell.get(ATTR_CELL_ID, ''))
+                flags = (cell.get(ATTR_HAS_NESTED_TABLE) == 'true', cell.get(ATTR_HAS_IMG) == 'true',
+                         bool(cell.get(ATTR_DIAGONAL_SPLIT_TYPE)))
+                after_label = previous[0] == row_idx and previous[1].endswith(':')
+                text = VALUE_MASK if after_label else self._mask(cell.get_text(strip=True))
+                parts.append([row_idx, col, colspan, rowspan, flags, text])
+                previous = (row_idx, text)
+        payload = json.dumps(parts, ensure_ascii=False, separators=(',', ':'))
+        self.fingerprint = hashlib.sha1(payload.encode('utf-8')).hexdigest()
+        self._positions = {cell_id: position for position, cell_id in enumerate(self.cell_ids)}
+
+    def _mask(self, text: str) -> str:
+        """规范化标签文本（合并空白、小写、统一冒号）；值单元格返回屏蔽符"""
+        text = _WHITESPACE.sub(' ', text).strip().lower().replace('：', ':')
+        if not text or text == '-' or _DIGIT.search(text):
+            return VALUE_MASK
+        self.label_count += 1
+        return text
+
+    def position(self, cell_id: str):
+        """单元格在本表格中的相对位置，不属于本表格时返回None"""
+        return self._positions.get(cell_id) if isinstance(cell_id, str) else None
+
+    def project(self, cell_id: str, other: "TableLayout"):
+        """将本表格的单元格ID投射为布局相同的另一表格中相同位置的单元格ID"""
+        position = self.position(cell_id)
+        if position is None or position >= len(other.cell_ids):
+            return None
+        return other.cell_ids[position]
+
+
+def cluster_tables(layouts: list[TableLayout]) -> list[int]:
+    """
+    返回每个表格所属布局簇的代表表格索引（簇中第一个表格为代表，代表指向自身）
+    没有任何标签单元格的表格（如纯数值表格）不参与聚类
+    """
+    leaders, first_by_fingerprint = [], {}
+    for table_idx, layout in enumerate(layouts):
+        if not layout.cell_ids or not layout.label_count:
+            leaders.append(table_idx)
+            continue
+        leaders.append(first_by_fingerprint.setdefault(layout.fingerprint, table_idx))
+    return leaders
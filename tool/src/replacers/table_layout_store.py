@@ -0,0 +1,205 @@
+"""
+表格布局记忆模块 - 跨文档记录表格布局对应的键，来自已知报告模板的表格无需再次调用LLM
+以表格结构指纹（见 table_layout）为索引，记录LLM给出的 单元格相对位置 -> 键 映射；
+同一布局的每次LLM结果作为一次观察，得票最多的映射至少有 min_observations 次一致的观察且达到置信度阈值后直接用于后续文档；
+匹配的布局每 revalidate_every 次重新调用一次LLM复核，结果照常记录，错误的映射会被后续观察投票淘汰；
+保存时重新读取磁盘上的记录并只合并本进程新增的观察，多个进程（客户端和批处理）共用同一文件时互不覆盖，超出 max_entries 时淘汰最久未使用的布局
+"""
+import os
+import json
+import time
+from global_define import constants
+from replacers.table_layout import FINGERPRINT_VERSION
+
+# 存储文件格式版本；与指纹算法版本任一变化时旧记录不再使用
+STORE_VERSION = 1
+MAX_CANDIDATES = 5  # 每个布局最多保留的候选映射数量
+
+
+def confidence(entry: dict) -> float:
+    """布局记录的置信度：得票最多的映射的票数 / (观察次数 + 1)，单次观察不视为完全可信"""
+    candidates = entry.get('candidates') or []
+    if not candidates:
+        return 0.0
+    return max(candidate['count'] for candidate in candidates) / (entry.get('observations', 0) + 1)
+
+
+def _vote(entry: dict, mapping: dict, updated: float) -> None:
+    """为映射加一票（与已有候选相同时累加），得票最多的映射变化时修订号加一"""
+    candidates = entry['candidates']
+    previous_best = max(candidates, key=lambda candidate: candidate['count'])['mapping'] if candidates else None
+
+    for candidate in candidates:
+        if candidate['mapping'] == mapping:
+            candidate['count'] += 1
+            break
+    else:
+        candidates.append({'mapping': mapping, 'count': 1})
+    candidates.sort(key=lambda candidate: candidate['count'], reverse=True)
+    del candidates[MAX_CANDIDATES:]
+
+    entry['observations'] += 1
+    entry['updated'] = max(entry.get('updated', 0), updated)
+    if candidates[0]['mapping'] != previous_best:
+        entry['revision'] += 1
+
+
+def _new_entry() -> dict:
+    return {'revision': 0, 'observations': 0, 'candidates': []}
+
+
+def _last_active(entry: dict) -> float:
+    """布局最近一次被记录或匹配的时间，用于淘汰"""
+    return max(entry.get('updated', 0), entry.get('last_used', 0))
+
+
+class TableLayoutStore:
+    """表格布局记忆类，持久化保存 布局指纹 -> 候选映射及其票数"""
+
+    def __init__(self, store_path: str, min_confidence: float = 0.5, min_observations: int = 2,
+                 revalidate_every: int = 10, max_entries: int = 10000, enabled: bool = True):
+        """
+        初始化表格布局记忆
+
+        Args:
+            store_path: 存储文件路径（JSON）
+            min_confidence: 使用记录映射所需的最低置信度
+            min_observations: 使用记录映射所需的最少一致观察次数（得票最多的映射的票数）
+            revalidate_every: 每个布局每匹配多少次重新调用一次LLM复核，为0时不复核
+            max_entries: 最多保存的布局数量，超出时淘汰最久未使用的布局
+            enabled: 是否启用布局记忆
+        """
+        self.store_path = store_path
+        self.min_confidence = min_confidence
+        self.min_observations = min_observations
+        self.revalidate_every = revalidate_every
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self._layouts = None  # 指纹 -> 记录，首次使用时从磁盘加载
+        self._pending = {}    # 指纹 -> 上次保存后本进程新增的观察和匹配，保存时合并到磁盘上的最新记录
+
+    def _ensure_loaded(self) -> None:
+        if self._layouts is None:
+            self._layouts = self._read_layouts()
+
+    def _read_layouts(self) -> dict:
+        """读取磁盘上的布局记录；文件不存在、无法读取或版本已变化时返回空字典"""
+        if not os.path.exists(self.store_path):
+            return {}
+        try:
+            with open(self.store_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == STORE_VERSION and data.get('fingerprint_version') == FINGERPRINT_VERSION:
+                return data.get('layouts', {})
+            print("表格布局记忆的版本已变化，忽略旧记录")
+        except (OSError, ValueError, AttributeError) as e:
+            print(f"读取表格布局记忆失败: {e}")
+        return {}
+
+    def _pending_entry(self, fingerprint: str) -> dict:
+        return self._pending.setdefault(fingerprint, {'votes': [], 'matches': 0, 'last_used': 0})
+
+    def lookup(self, fingerprint: str):
+        """
+        按布局指纹查找映射，返回 ({相对位置: 键}, 置信度)
+        未记录、一致观察次数不足、置信度低于阈值或记忆关闭时返回None
+        """
+        if not self.enabled:
+            return None
+        self._ensure_loaded()
+
+        entry = self._layouts.get(fingerprint)
+        if entry and entry['candidates']:
+            best = max(entry['candidates'], key=lambda candidate: candidate['count'])
+            if best['count'] >= self.min_observations and confidence(entry) >= self.min_confidence:
+                now = time.time()
+                self.hits += 1
+                entry['matches'] = entry.get('matches', 0) + 1
+                entry['last_used'] = now
+                pending = self._pending_entry(fingerprint)
+                pending['matches'] += 1
+                pending['last_used'] = now
+                return {int(position): key for position, key in best['mapping'].items()}, confidence(entry)
+        self.misses += 1
+        return None
+
+    def due_for_revalidation(self, fingerprint: str) -> bool:
+        """
+        lookup 返回映射后调用，判断本次是否改为调用LLM复核（每个布局每匹配 revalidate_every 次复核一次）
+        复核时调用方照常调用LLM并用 record 记录结果，不使用记录的映射，lookup 计入的命中改为计入复核次数
+        """
+        if not self.enabled or not self.revalidate_every:
+            return False
+        self._ensure_loaded()
+        entry = self._layouts.get(fingerprint)
+        if entry and entry.get('matches', 0) % self.revalidate_every == 0:
+            self.hits -= 1
+            self.revalidations += 1
+            return True
+        return False
+
+    def record(self, fingerprint: str, mapping: dict) -> None:
+        """记录一次LLM给出的 {相对位置: 键} 映射；与已有候选相同时为其加一票，得票最多的映射变化时修订号加一"""
+        if not self.enabled or not mapping:
+            return
+        self._ensure_loaded()
+
+        mapping = {str(position): key for position, key in sorted(mapping.items())}
+        now = time.time()
+        _vote(self._layouts.setdefault(fingerprint, _new_entry()), mapping, now)
+        self._pending_entry(fingerprint)['votes'].append((mapping, now))
+
+    def save(self) -> None:
+        """
+        将本进程新增的观察和匹配合并到磁盘上的最新记录后写回（先写临时文件再替换），
+        其它进程在此期间保存的观察不会被覆盖；超出 max_entries 时淘汰最久未使用的布局
+        """
+        if not self.enabled or not self._pending:
+            return
+        layouts = self._read_layouts()
+        for fingerprint, pending in self._pending.items():
+            if fingerprint not in layouts and not pending['votes']:
+                continue  # 只有匹配、记录已被其它进程淘汰的布局不再恢复
+            entry = layouts.setdefault(fingerprint, _new_entry())
+            for mapping, updated in pending['votes']:
+                _vote(entry, mapping, updated)
+            if pending['matches']:
+                entry['matches'] = entry.get('matches', 0) + pending['matches']
+                entry['last_used'] = max(entry.get('last_used', 0), pending['last_used'])
+        if len(layouts) > self.max_entries:
+            kept = sorted(layouts, key=lambda fingerprint: _last_active(layouts[fingerprint]), reverse=True)[:self.max_entries]
+            layouts = {fingerprint: layouts[fingerprint] for fingerprint in kept}
+
+        data = {'version': STORE_VERSION, 'fingerprint_version': FINGERPRINT_VERSION, 'layouts': layouts}
+        os.makedirs(os.path.dirname(self.store_path), exist_ok=True)
+        tmp_path = f"{self.store_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=4)
+        os.replace(tmp_path, self.store_path)
+        self._layouts = layouts
+        self._pending = {}
+
+    @property
+    def stats(self) -> dict:
+        """返回命中统计"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidations": self.revalidations,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+# 全局单例实例
+table_layout_store = TableLayoutStore(
+    constants.LAYOUT_STORE_PATH,
+    min_confidence=constants.LAYOUT_STORE_MIN_CONFIDENCE,
+    min_observations=constants.LAYOUT_STORE_MIN_OBSERVATIONS,
+    revalidate_every=constants.LAYOUT_STORE_REVALIDATE_EVERY,
+    max_entries=constants.LAYOUT_STORE_MAX_ENTRIES,
+    enabled=constants.LAYOUT_STORE_ENABLED
+)
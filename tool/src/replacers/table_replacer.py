@@ -1,106 +1,366 @@
 import os
-import re
-import json
-from bs4 import BeautifulSoup
+import asyncio
 from models.model_manager import llm_manager
 from callback.callback import callback_handler
-from global_define.constants import ATTR_ORIGINAL_CONTENT
+from context.document_context import DocumentContext
+from global_define import constants
+from global_define.constants import ATTR_ORIGINAL_CONTENT, LLM_MAX_CONCURRENCY
+from replacers.table_chunker import split_table, merge_kv_pairs, estimate_tokens
+from replacers.json_stream import JsonArrayStreamParser
+from replacers.compact_response import RESPONSE_FORMAT, expand_item
+from replacers.table_serializer import get_serializer
+from replacers.table_layout import TableLayout, cluster_tables
+from replacers.table_layout_store import table_layout_store
+from replacers.table_rules import load_key_descriptions, extract_kv_pairs as extract_rule_kv_pairs
+
+# 各响应格式使用的提示词模板
+_PROMPT_FILES = {
+    "full": "table_prompt_1.txt",
+    "compact": "table_prompt_compact.txt",
+}
 
-async def _call_llm_and_parse_json(prompt: str):
-    """调用LLM并解析返回的JSON数组"""
+async def _call_llm_and_parse_json(prompt: str, response_format: dict = None, on_item=None, on_reset=None):
+    """
+    流式调用LLM并增量解析返回的JSON对象数组（结构化输出时为顶层对象中的数组）
+    每个对象完整到达时立即调用 on_item(对象)；之后出现新的含对象的顶层数组、之前交给 on_item 的对象作废时调用 on_reset()（均为异步函数）
+    返回最后一个含对象的顶层数组中的全部对象；解析不到对象或流中途出错时返回None
+    """
     try:
         messages = [{"role": "user", "content": prompt}]
-        stream = llm_manager.create_completion(messages)
-        response = "".join([chunk for chunk in stream])
-        await callback_handler.output_callback(f"LLM输出: {response}")
-        
-        # 优先提取最后一个标准JSON对象数组（[{...}]）
-        obj_array_matches = re.findall(r'(\[\s*\{.*?\}\s*(?:,\s*\{.*?\}\s*)*\])', response, re.DOTALL)
-        if obj_array_matches:
-            json_str = obj_array_matches[-1]
-            try:
-                return json.loads(json_str)
-            except json.JSONDecodeError:
-                # 尝试修复常见的LLM错误（如尾随逗号）
-                cleaned_json_str = re.sub(r',\s*\]', ']', json_str)
-                cleaned_json_str = re.sub(r',\s*\}', '}', cleaned_json_str)
-                return json.loads(cleaned_json_str)
-        
-        await callback_handler.output_callback(f"警告：无法从LLM响应中解析出有效的JSON对象数组。")
+        parser = JsonArrayStreamParser()
+        chunks = []
+        async for chunk in llm_manager.acreate_completion(messages, response_format=response_format):
+            chunks.append(chunk)
+            resets = parser.resets
+            items = parser.feed(chunk)
+            if parser.resets != resets and on_reset:
+                await on_reset()
+            if on_item:
+                for item in items:
+                    await on_item(item)
+        await callback_handler.debug(f"LLM输出: {''.join(chunks)}")
+
+        if parser.objects:
+            return parser.objects
+
+        await callback_handler.warn(f"警告：无法从LLM响应中解析出有效的JSON对象数组。")
         return None
     except Exception as e:
-        await callback_handler.output_callback(f"调用LLM或解析时出错: {e}")
+        await callback_handler.warn(f"调用LLM或解析时出错: {e}")
         return None
 
-from global_define import constants
 
-async def replace_tables(html_file_path: str, table_html_strings: list[str], table_key_description_path: str) -> None:
+async def replace_tables(ctx: DocumentContext, table_key_description_path: str, max_concurrency: int = LLM_MAX_CONCURRENCY,
+                         response_mode: str = None, serializer: str = None) -> None:
     """
-    对HTML中的表格进行语义匹配分析，并用LLM生成的标签替换内容
+    对上下文HTML树中的表格进行语义匹配分析，并用LLM生成的标签替换内容。
+    各表格的LLM请求并发执行（最多 max_concurrency 个）。
+    超出token预算的长表格按行切分为多个窗口（重复表头行），各窗口与其它表格一起并发处理，结果按 value-cell-id 合并去重。
+    LLM流式输出时每解析出一个键值对就立即更新单元格，但只有按 (表格, 窗口) 顺序轮到的窗口实时写入，
+    提前输出的窗口先缓冲、轮到时再写入，同一单元格以靠前窗口的结果为准（与 merge_kv_pairs 一致），写入结果不受网络先后影响；
+    流中途出错的窗口、以及被之后的数组取代的示例数组（见 json_stream），已写入的单元格会被撤销。
+    结构指纹相同的表格（见 table_layout）只由第一个表格调用LLM，键值对按单元格相对位置投射到其它表格；
+    布局已记录在布局记忆中（见 table_layout_store）且置信度达到阈值的表格直接使用记录的映射，不调用LLM（定期调用LLM复核）；
+    其余 "标签 | 值" 结构明确的简单表格由规则识别（见 table_rules，标签与 table_key_description_path 中的描述匹配时使用对应的键），
+    同样不调用LLM，规则无法确定的表格才交给LLM。
+    response_mode 为 "compact" 时单元格ID在提示词中换成短数字句柄，模型按JSON schema只输出键和句柄，
+    默认为 constants.TABLE_RESPONSE_MODE。
+    serializer 为提示词中表格内容的序列化格式（"html" / "grid" 或已注册的其它格式），默认为 constants.TABLE_SERIALIZER，
+    每个表格输出相对原始HTML节省的输入token估计。
     """
+    response_mode = response_mode or constants.TABLE_RESPONSE_MODE
+    if response_mode not in constants.TABLE_RESPONSE_MODES:
+        raise ValueError(f"未知的表格响应格式: {response_mode}")
+    table_serializer = get_serializer(serializer or constants.TABLE_SERIALIZER)
+    compact = response_mode == "compact"
+    html_file_path = ctx.html_path
     try:
-        html_file_path = constants.DEFAULT_HTML_PATH
         await callback_handler.output_callback(f"--- 开始处理HTML文件中的表格: {os.path.basename(html_file_path)} ---")
         
-        # 1. 读取完整的HTML内容
-        with open(html_file_path, 'r', encoding='utf-8') as f:
-            full_html_content = f.read()
-        
-        soup = BeautifulSoup(full_html_content, 'html.parser')
+        # 1. 使用上下文中已解析的HTML树和已提取的表格
+        table_html_strings = ctx.tables
         
         if not table_html_strings:
             await callback_handler.output_callback("没有需要处理的表格。")
             return
 
-        modified_total_count = 0
-        for table_idx, table_content in enumerate(table_html_strings):
-            await callback_handler.output_callback(f"处理第 {table_idx + 1} 个表格...")
+        # 2. 读取与响应格式对应的 prompt_1 模板
+        prompt_1_path = os.path.join(os.path.dirname(__file__), _PROMPT_FILES[response_mode])
+        with open(prompt_1_path, 'r', encoding='utf-8') as f:
+            prompt_1_template = f.read().replace("{table_format}", table_serializer.notes(compact))
 
-            # 2. 读取 prompt_1 内容并构造 prompt
-            prompt_1_path = os.path.join(os.path.dirname(__file__), "table_prompt_1.txt")
-            with open(prompt_1_path, 'r', encoding='utf-8') as f:
-                prompt_1_template = f.read()
-            
-            prompt_1 = prompt_1_template.replace("{table_content}", table_content)
-            
-            await callback_handler.output_callback("步骤 1/2: 提取键值对...")
-            kv_pairs = await _call_llm_and_parse_json(prompt_1)
+        # 3. 长表格按行切分为窗口，并发提取所有窗口的键值对
+        table_chunks = [
+            split_table(table_content, constants.TABLE_CHUNK_MAX_TOKENS, constants.TABLE_CHUNK_HEADER_ROWS)
+            if constants.TABLE_CHUNKING_ENABLED else [table_content]
+            for table_content in table_html_strings
+        ]
+        for table_idx, chunks in enumerate(table_chunks):
+            if len(chunks) > 1:
+                await callback_handler.output_callback(f"第 {table_idx + 1} 个表格超出token预算，按行切分为 {len(chunks)} 个窗口")
 
-            if not kv_pairs or not isinstance(kv_pairs, list):
-                await callback_handler.output_callback(f"警告：未能获取有效的键值对列表，跳过当前表格。")
+        # 布局相同的表格只由簇中第一个表格（代表）调用LLM
+        layouts = [TableLayout(table_content) for table_content in table_html_strings]
+        leaders = cluster_tables(layouts) if constants.TABLE_LAYOUT_CLUSTERING_ENABLED else list(range(len(layouts)))
+
+        # 代表表格依次尝试：布局记忆中已记录的映射 -> 规则识别 -> 调用LLM
+        # （没有标签单元格的表格只有结构可比，不查找布局记忆）
+        key_descriptions = load_key_descriptions(table_key_description_path) if constants.TABLE_RULES_ENABLED else {}
+        local_kv_pairs = {}  # 无需调用LLM的代表表格 -> 键值对
+        table_paths = {}     # 代表表格 -> 处理方式
+        for table_idx, leader in enumerate(leaders):
+            if leader != table_idx:
+                continue
+            layout = layouts[table_idx]
+            found = table_layout_store.lookup(layout.fingerprint) if layout.label_count else None
+            if found and table_layout_store.due_for_revalidation(layout.fingerprint):
+                # 定期复核：照常调用LLM并记录结果，不走规则识别
+                table_paths[table_idx] = "LLM"
+                await callback_handler.debug(f"第 {table_idx + 1} 个表格匹配已记录的布局，本次调用LLM复核")
                 continue
-            
-            await callback_handler.output_callback(f"成功提取 {len(kv_pairs)} 个键值对。")
-
-            # 3. 修改表格内容
-            await callback_handler.output_callback("步骤 2/2: 更新表格HTML内容...")
-            modified_count = 0
-            for item in kv_pairs:
-                if not isinstance(item, dict):
+            if found:
+                mapping, layout_confidence = found
+                local_kv_pairs[table_idx] = [
+                    {"key": key, "value-cell-id": layout.cell_ids[position]}
+                    for position, key in sorted(mapping.items()) if position < len(layout.cell_ids)
+                ]
+                table_paths[table_idx] = "布局记忆"
+                await callback_handler.debug(f"第 {table_idx + 1} 个表格匹配已记录的布局（置信度 {layout_confidence:.2f}），无需调用LLM")
+                continue
+            if constants.TABLE_RULES_ENABLED:
+                kv_pairs, reason = extract_rule_kv_pairs(table_html_strings[table_idx], key_descriptions, constants.TABLE_RULES_MIN_CONFIDENCE)
+                if kv_pairs:
+                    local_kv_pairs[table_idx] = kv_pairs
+                    table_paths[table_idx] = "规则识别"
+                    await callback_handler.debug(f"第 {table_idx + 1} 个表格由规则识别（{reason}），无需调用LLM")
                     continue
+                await callback_handler.debug(f"第 {table_idx + 1} 个表格交给LLM: {reason}")
+            table_paths[table_idx] = "LLM"
+        llm_tables = [table_idx for table_idx, path in table_paths.items() if path == "LLM"]
+        followers = {}
+        for table_idx, leader in enumerate(leaders):
+            if leader != table_idx:
+                followers.setdefault(leader, []).append(table_idx)
+                await callback_handler.debug(f"第 {table_idx + 1} 个表格与第 {leader + 1} 个表格布局相同，复用其结果")
 
-                key = item.get('key')
-                value_cell_id = item.get('value-cell-id')
-
-                if key and value_cell_id:
-                    # 在整个soup中查找单元格
-                    cell = soup.find(attrs={'data-cell-id': value_cell_id})
-                    if cell:
-                        original_content = cell.string or ""
-                        cell[ATTR_ORIGINAL_CONTENT] = original_content
-                        cell.string = f"{{{key}}}"
-                        modified_count += 1
-            
-            await callback_handler.output_callback(f"已更新当前表格中 {modified_count} 个单元格。")
-            modified_total_count += modified_count
-        
-        # 4. 写回文件
-        with open(html_file_path, 'w', encoding='utf-8') as f:
-            f.write(str(soup))
+        # 按代表表格的处理方式统计节省的LLM调用（布局相同的表格计入其代表表格的处理方式）
+        saved_by_path = {}
+        tables_by_path = {}
+        for table_idx, leader in enumerate(leaders):
+            path = table_paths[leader]
+            if path == "LLM":
+                if leader == table_idx:
+                    continue
+                path = "布局聚类"
+            saved_by_path[path] = saved_by_path.get(path, 0) + len(table_chunks[table_idx])
+            tables_by_path[path] = tables_by_path.get(path, 0) + 1
+        chunk_count = sum(len(table_chunks[table_idx]) for table_idx in llm_tables)
+        ctx.table_stats = {
+            "llm_calls": chunk_count,
+            "llm_calls_saved": sum(saved_by_path.values()),
+            "layout_store_hits": tables_by_path.get("布局记忆", 0),
+            "rule_hits": tables_by_path.get("规则识别", 0),
+        }
+        if constants.TABLE_LAYOUT_CLUSTERING_ENABLED:
+            await callback_handler.output_callback(
+                f"表格布局聚类: {len(layouts)} 个表格共 {len(set(leaders))} 种布局，节省 {saved_by_path.get('布局聚类', 0)} 次LLM调用"
+            )
+        if tables_by_path.get("布局记忆"):
+            await callback_handler.output_callback(
+                f"布局记忆: {tables_by_path['布局记忆']} 个表格匹配已记录的布局，节省 {saved_by_path['布局记忆']} 次LLM调用"
+            )
+        if tables_by_path.get("规则识别"):
+            await callback_handler.output_callback(
+                f"规则识别: {tables_by_path['规则识别']} 个表格在本地识别出键值对，节省 {saved_by_path['规则识别']} 次LLM调用"
+            )
+
+        # 序列化各窗口；compact 格式下单元格以句柄引用，句柄只在本窗口内有效，返回句柄对应的单元格ID列表
+        serialized_chunks = {
+            table_idx: [table_serializer.serialize(chunk, compact) for chunk in table_chunks[table_idx]]
+            for table_idx in llm_tables
+        }
+        html_tokens_total = serialized_tokens_total = 0
+        for table_idx in llm_tables:
+            chunks = table_chunks[table_idx]
+            html_tokens = sum(estimate_tokens(chunk) for chunk in chunks)
+            serialized_tokens = sum(estimate_tokens(content) for content, _ in serialized_chunks[table_idx])
+            html_tokens_total += html_tokens
+            serialized_tokens_total += serialized_tokens
+            await callback_handler.output_callback(
+                f"第 {table_idx + 1} 个表格: 表格内容约 {html_tokens} -> {serialized_tokens} tokens"
+                f"（{table_serializer.name}格式，节省 {_saving(html_tokens, serialized_tokens)}）"
+            )
+
+        await callback_handler.output_callback(f"步骤 1/2: 并发提取键值对并更新单元格（并发数: {max_concurrency}）...")
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        done_count = 0
+        modified_counts = [0] * len(table_chunks)
+        modified_cell_ids = set()
+
+        cell_total = sum(len(layout.cell_ids) for layout in layouts)
+
+        async def _apply_kv_pair(table_idx: int, item: dict, writes: list = None):
+            """按键值对更新单元格，并投射到布局相同的其它表格；writes 不为None时记录写入，以便撤销"""
+            key = item.get('key')
+            value_cell_id = item.get('value-cell-id')
+            if not key or not value_cell_id:
+                return
+            await _update_cell(table_idx, key, value_cell_id, writes)
+            for follower_idx in followers.get(table_idx, []):
+                projected_cell_id = layouts[table_idx].project(value_cell_id, layouts[follower_idx])
+                if projected_cell_id:
+                    await _update_cell(follower_idx, key, projected_cell_id, writes)
+
+        async def _update_cell(table_idx: int, key: str, value_cell_id: str, writes: list = None):
+            if value_cell_id in modified_cell_ids:
+                return
+            # 通过单元格索引查找，无需遍历整个soup
+            cell = ctx.find_cell(value_cell_id)
+            if cell:
+                if writes is not None:
+                    writes.append((table_idx, value_cell_id, cell, list(cell.contents)))
+                original_content = cell.string or ""
+                cell[ATTR_ORIGINAL_CONTENT] = original_content
+                cell.string = f"{{{key}}}"
+                modified_cell_ids.add(value_cell_id)
+                modified_counts[table_idx] += 1
+                await callback_handler.debug(f"第 {table_idx + 1} 个表格: 单元格 {value_cell_id} -> {{{key}}}")
+                await callback_handler.progress("更新表格单元格", len(modified_cell_ids), cell_total)
+
+        def _undo_writes(writes: list):
+            """按相反顺序恢复单元格原来的内容"""
+            for table_idx, value_cell_id, cell, contents in reversed(writes):
+                cell.clear()
+                for node in contents:
+                    cell.append(node)
+                del cell[ATTR_ORIGINAL_CONTENT]
+                modified_cell_ids.discard(value_cell_id)
+                modified_counts[table_idx] -= 1
+            writes.clear()
+
+        # 窗口按 (表格, 窗口) 顺序写入：next_window 为当前实时写入的窗口，
+        # received 为各窗口已解析出的键值对（之后的窗口先缓冲在这里），applied 为已写入的数量，window_writes 记录写入以便撤销
+        window_order = [(table_idx, chunk_idx) for table_idx in llm_tables for chunk_idx in range(len(table_chunks[table_idx]))]
+        received = {window: [] for window in window_order}
+        applied = dict.fromkeys(window_order, 0)
+        window_writes = {window: [] for window in window_order}
+        window_results = {}  # 已结束的窗口 -> 键值对列表（失败时为None）
+        next_window = 0
+        apply_lock = asyncio.Lock()
+
+        async def _apply_ready_windows():
+            """写入当前窗口已到达的键值对；当前窗口已结束时（失败则撤销其写入）轮到下一个窗口"""
+            nonlocal next_window
+            async with apply_lock:
+                while next_window < len(window_order):
+                    window = window_order[next_window]
+                    for kv_pair in received[window][applied[window]:]:
+                        await _apply_kv_pair(window[0], kv_pair, window_writes[window])
+                    applied[window] = len(received[window])
+                    if window not in window_results:
+                        break
+                    if window_results[window] is None:
+                        _undo_writes(window_writes[window])
+                    next_window += 1
+
+        async def _extract_kv_pairs(table_idx: int, chunk_idx: int, table_content: str, cell_ids: list):
+            nonlocal done_count
+            window = (table_idx, chunk_idx)
+
+            async def _on_item(item: dict):
+                # compact 格式下将句柄映射回 data-cell-id
+                kv_pair = expand_item(item, cell_ids) if compact else item
+                if kv_pair:
+                    received[window].append(kv_pair)
+                    await _apply_ready_windows()
+
+            async def _on_reset():
+                # 之前的数组被取代：撤销已写入的单元格，已缓冲的键值对作废
+                async with apply_lock:
+                    _undo_writes(window_writes[window])
+                    received[window] = []
+                    applied[window] = 0
+
+            async with semaphore:
+                await callback_handler.debug(f"处理第 {table_idx + 1} 个表格（窗口 {chunk_idx + 1}/{len(table_chunks[table_idx])}）...")
+                prompt_1 = prompt_1_template.replace("{table_content}", table_content)
+                kv_pairs = await _call_llm_and_parse_json(prompt_1, RESPONSE_FORMAT if compact else None, _on_item, _on_reset)
+                if kv_pairs is not None:
+                    kv_pairs = [kv_pair for kv_pair in (expand_item(item, cell_ids) if compact else item for item in kv_pairs) if kv_pair]
+            window_results[window] = kv_pairs
+            await _apply_ready_windows()
+            done_count += 1
+            await callback_handler.progress("提取表格键值对", done_count, chunk_count)
+            if kv_pairs is None and len(table_chunks[table_idx]) > 1:
+                await callback_handler.warn(f"警告：第 {table_idx + 1} 个表格的窗口 {chunk_idx + 1} 未能获取有效的键值对列表，跳过该窗口。")
+            return kv_pairs
+
+        # 布局记忆或规则识别得到的键值对直接更新（同时投射到布局相同的其它表格）
+        leader_kv_pairs = {}
+        for table_idx, kv_pairs in local_kv_pairs.items():
+            leader_kv_pairs[table_idx] = kv_pairs
+            for kv_pair in kv_pairs:
+                await _apply_kv_pair(table_idx, kv_pair)
+
+        chunk_results = await asyncio.gather(
+            *(_extract_kv_pairs(table_idx, chunk_idx, content, cell_ids)
+              for table_idx in llm_tables
+              for chunk_idx, (content, cell_ids) in enumerate(serialized_chunks[table_idx]))
+        )
+
+        # 按表格合并各窗口的结果，所有窗口都成功的表格记入布局记忆；复用结果的表格按相对位置投射代表表格的键值对
+        offset = 0
+        for table_idx in llm_tables:
+            chunk_total = len(table_chunks[table_idx])
+            results = chunk_results[offset:offset + chunk_total]
+            offset += chunk_total
+            leader_kv_pairs[table_idx] = results[0] if chunk_total == 1 else merge_kv_pairs(results)
+            if layouts[table_idx].label_count and all(result is not None for result in results):
+                table_layout_store.record(layouts[table_idx].fingerprint, _position_mapping(layouts[table_idx], leader_kv_pairs[table_idx]))
+        table_layout_store.save()
+        all_kv_pairs = []
+        for table_idx, leader in enumerate(leaders):
+            kv_pairs = leader_kv_pairs[leader]
+            if leader != table_idx and kv_pairs:
+                kv_pairs = [
+                    {"key": item.get('key'), "value-cell-id": layouts[leader].project(item.get('value-cell-id'), layouts[table_idx])}
+                    for item in kv_pairs
+                ]
+            all_kv_pairs.append(kv_pairs)
+
+        # 4. 按表格顺序汇总（单元格已在流式解析时按窗口顺序更新）
+        await callback_handler.output_callback("步骤 2/2: 汇总表格更新结果...")
+        for table_idx, kv_pairs in enumerate(all_kv_pairs):
+            if not kv_pairs or not isinstance(kv_pairs, list):
+                await callback_handler.warn(f"警告：第 {table_idx + 1} 个表格未能获取有效的键值对列表，跳过。")
+                continue
+            leader = leaders[table_idx]
+            path = f"复用第 {leader + 1} 个表格的结果" if leader != table_idx else table_paths[table_idx]
+            await callback_handler.output_callback(
+                f"第 {table_idx + 1} 个表格: 提取 {len(kv_pairs)} 个键值对，更新 {modified_counts[table_idx]} 个单元格。（{path}）"
+            )
+        modified_total_count = sum(modified_counts)
         
+        await callback_handler.output_callback(
+            f"表格内容合计约 {html_tokens_total} -> {serialized_tokens_total} tokens，节省 {_saving(html_tokens_total, serialized_tokens_total)}"
+        )
         await callback_handler.output_callback(f"--- 完成处理HTML文件: {os.path.basename(html_file_path)}，共更新 {modified_total_count} 个单元格。---\n")
 
     except Exception as e:
         await callback_handler.output_callback(f"处理文件 {html_file_path} 时发生严重错误: {e}")
         import traceback
-        traceback.print_exc()
\ No newline at end of file
+        traceback.print_exc()
+
+
+def _position_mapping(layout: TableLayout, kv_pairs: list) -> dict:
+    """将键值对列表转换为 {单元格相对位置: 键}，同一位置保留先出现的键"""
+    mapping = {}
+    for item in kv_pairs or []:
+        position = layout.position(item.get('value-cell-id'))
+        if position is not None and item.get('key'):
+            mapping.setdefault(position, item['key'])
+    return mapping
+
+
+def _saving(before: int, after: int) -> str:
+    return f"{1 - after / before:.0%}" if before else "0%"
@@ -0,0 +1,130 @@
+"""
+表格规则识别模块 - 调用LLM之前用规则识别简单的 "标签 | 值" 表格
+每行由若干 (标签, 值) 单元格对组成的表格（两列表格或标签、值交替的表格）在本地直接得到键值对；
+证据来自以冒号结尾的标签、与表格键描述文件匹配的标签，以及数值/日期/编号等值的格式。
+结构不符合或证据不足的表格返回原因，交给LLM处理
+"""
+import os
+import re
+from bs4 import BeautifulSoup
+from global_define.constants import ATTR_CELL_ID, ATTR_DIAGONAL_SPLIT_TYPE, ATTR_HAS_NESTED_TABLE, ATTR_HAS_IMG
+from replacers.table_serializer import iter_grid_cells
+
+# 单元格类别
+EMPTY = "empty"          # 空或 "-"，待填写的值
+IGNORED = "ignored"      # 含内嵌表格/图片，或斜线表头
+LABEL = "label"          # 以冒号结尾或与键描述匹配的标签
+VALUE = "value"          # 数值（可带单位）、日期时间、编号、邮箱等
+INLINE = "inline"        # "标签: 值" 写在同一个单元格中
+DIGIT_TEXT = "digit"     # 含数字的其它文本，多为值
+TEXT = "text"            # 其它文本，标签或值都有可能
+
+_WHITESPACE = re.compile(r'\s+')
+_VALUE_PATTERNS = [
+    re.compile(r'^[-+]?\d+(?:[.,]\d+)*\s*(?:%|℃|°C|°F|K|mm|cm|m|km|kg|g|V|kV|A|mA|W|kW|MW|Hz|Pa|kPa|MPa|s|min|h)?$', re.IGNORECASE),
+    re.compile(r'^\d{4}[-/.年]\d{1,2}[-/.月]\d{1,2}日?(?:\s+\d{1,2}:\d{2}(?::\d{2})?)?$'),
+    re.compile(r'^\d{1,2}:\d{2}(?::\d{2})?$'),
+    re.compile(r'^[A-Za-z]*[-_#/]?\d[\w\-/#.]*$'),   # 不含空格的编号，如 P001、IR-2024-001、902-579-2686
+    re.compile(r'^\S+@\S+\.\S+$'),
+]
+_INLINE_PATTERN = re.compile(r'^[^:：]+[:：]\s*\S')
+
+
+def load_key_descriptions(path: str) -> dict:
+    """读取表格键描述文件（每行 "键：描述"），返回 {规范化的描述: 键}；文件不存在时返回空字典"""
+    descriptions = {}
+    if not path or not os.path.exists(path):
+        return descriptions
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            key, sep, description = line.strip().replace('：', ':').partition(':')
+            if sep and key.strip() and description.strip():
+                descriptions[_normalize(description)] = key.strip()
+    return descriptions
+
+
+def extract_kv_pairs(table_html: str, key_descriptions: dict = None, min_confidence: float = 0.6):
+    """
+    用规则识别表格的键值对
+
+    Args:
+        table_html: 提取后的简化表格HTML
+        key_descriptions: load_key_descriptions 的结果，标签与描述匹配时使用描述对应的键
+        min_confidence: 有强证据（标签带冒号或匹配键描述，或值为空/数值/日期/编号）的单元格对所占的最低比例
+
+    Returns:
+        (键值对列表, 说明)：能确定时列表格式与LLM结果相同 [{"key": 键, "value-cell-id": 单元格ID}, ...]，
+        否则列表为None，说明为交给LLM的原因
+    """
+    key_descriptions = key_descriptions or {}
+    table = BeautifulSoup(table_html, 'html.parser').find('table')
+    if table is None:
+        return None, "未找到表格"
+
+    rows = {}
+    for row_idx, _, _, _, cell in iter_grid_cells(table):
+        rows.setdefault(row_idx, []).append(cell)
+
+    kv_pairs, keys, strong_count, first_pair_row = [], set(), 0, True
+    for row_idx, cells in rows.items():
+        kinds = [_classify(cell, key_descriptions) for cell in cells]
+        if len(cells) == 1 or all(kind == EMPTY for kind in kinds):
+            continue  # 标题行、分节行或空行
+        if len(cells) % 2:
+            return None, f"第 {row_idx + 1} 行的单元格数不是 标签|值 成对排列"
+
+        row_strong = 0
+        for (label, label_kind), (value, value_kind) in zip(zip(cells[::2], kinds[::2]), zip(cells[1::2], kinds[1::2])):
+            if label_kind not in (LABEL, TEXT, DIGIT_TEXT) or (label_kind == DIGIT_TEXT and len(cells) > 2):
+                return None, f"第 {row_idx + 1} 行的标签位置不是标签: {label.get_text(strip=True) or '(空)'}"
+            if value_kind not in (VALUE, DIGIT_TEXT, EMPTY, TEXT):
+                return None, f"第 {row_idx + 1} 行的值位置不是值: {value.get_text(strip=True)}"
+            key = _key_for(label, key_descriptions)
+            if key in keys:
+                return None, f"键重复: {key}"
+            keys.add(key)
+            kv_pairs.append({"key": key, "value-cell-id": value.get(ATTR_CELL_ID)})
+            if label_kind == LABEL or value_kind in (VALUE, DIGIT_TEXT, EMPTY):
+                row_strong += 1
+
+        # 没有冒号等证据的首行多为列表头（如 "名称 | 数值"），交给LLM判断
+        if first_pair_row and not row_strong:
+            return None, "首行可能是列表头"
+        first_pair_row = False
+        strong_count += row_strong
+
+    if not kv_pairs:
+        return None, "没有 标签|值 单元格对"
+    confidence = strong_count / len(kv_pairs)
+    if confidence < min_confidence:
+        return None, f"证据不足（{strong_count}/{len(kv_pairs)} 对有强证据）"
+    if not all(item["value-cell-id"] for item in kv_pairs):
+        return None, "值单元格缺少ID"
+    return kv_pairs, f"{len(kv_pairs)} 对，{strong_count} 对有强证据"
+
+
+def _classify(cell, key_descriptions: dict) -> str:
+    if cell.get(ATTR_HAS_NESTED_TABLE) == 'true' or cell.get(ATTR_HAS_IMG) == 'true' or cell.get(ATTR_DIAGONAL_SPLIT_TYPE):
+        return IGNORED
+    text = _WHITESPACE.sub(' ', cell.get_text(strip=True)).strip()
+    if not text or text.strip('-–—') == '':
+        return EMPTY
+    if text.endswith((':', '：')) or _normalize(text) in key_descriptions:
+        return LABEL
+    if any(pattern.match(text) for pattern in _VALUE_PATTERNS):
+        return VALUE
+    if _INLINE_PATTERN.match(text):
+        return INLINE
+    if any(char.isdigit() for char in text):
+        return DIGIT_TEXT
+    return TEXT
+
+
+def _key_for(label, key_descriptions: dict) -> str:
+    """标签与键描述匹配时使用描述对应的键，否则使用去掉结尾冒号的标签文本"""
+    text = _WHITESPACE.sub(' ', label.get_text(strip=True)).strip()
+    return key_descriptions.get(_normalize(text)) or text.rstrip(':：').strip()
+
+
+def _normalize(text: str) -> str:
+    return _WHITESPACE.sub('', text).lower().rstrip(':：')
@@ -0,0 +1,151 @@
+"""
+表格序列化模块 - 将提取后的简化表格HTML转换为提示词中的表格内容
+html：保留原HTML（可选把 data-cell-id 换成短数字句柄）；grid：紧凑网格格式，每行一行文本，
+单元格只保留句柄、列坐标、合并信息和文本。新的格式可继承 TableSerializer 并用 register_serializer 注册。
+"""
+from abc import ABC, abstractmethod
+from bs4 import BeautifulSoup
+from global_define.constants import ATTR_CELL_ID, ATTR_DIAGONAL_SPLIT_TYPE, ATTR_HAS_NESTED_TABLE, ATTR_HAS_IMG
+from replacers.compact_response import assign_cell_handles
+
+_HTML_NOTES = (
+    '注意：\n'
+    '-单元格若有data-has-nested-table="true"标记，则忽略这个单元格。\n'
+    '-单元格若有data-has-img="true"标记，则忽略这个单元格。'
+)
+
+
+class TableSerializer(ABC):
+    """序列化器基类：notes 返回插入提示词 {table_format} 处的格式说明，serialize 返回表格内容"""
+
+    name = ""
+
+    @abstractmethod
+    def notes(self, use_handles: bool) -> str:
+        """返回插入提示词 {table_format} 处的格式说明"""
+
+    @abstractmethod
+    def serialize(self, table_html: str, use_handles: bool) -> tuple[str, list[str] | None]:
+        """
+        返回 (提示词中的表格内容, 单元格ID列表)
+        use_handles 为True时单元格以从1开始的数字句柄引用，句柄 N 对应列表中第 N-1 个单元格ID；否则列表为None
+        """
+
+
+class HtmlTableSerializer(TableSerializer):
+    """原样使用简化表格HTML"""
+
+    name = "html"
+
+    def notes(self, use_handles: bool) -> str:
+        return _HTML_NOTES + ('\n-每个单元格的 data-h 属性是它的编号。' if use_handles else '')
+
+    def serialize(self, table_html: str, use_handles: bool) -> tuple[str, list[str] | None]:
+        if use_handles:
+            return assign_cell_handles(table_html)
+        return table_html, None
+
+
+class GridTableSerializer(TableSerializer):
+    """
+    紧凑网格格式，例如:
+        r0: #1 c0x2 Electrical Infrared
+        r1: #2 c0 Report Title | #3 c1 Nova Centre IR Scan 2023
+    每个单元格写作 "#引用 c列号[x跨列数][v跨行数][ !标记] 文本"，列号按合并后的逻辑网格计算
+    """
+
+    name = "grid"
+
+    def notes(self, use_handles: bool) -> str:
+        reference = "编号" if use_handles else "单元格ID"
+        return (
+            f'表格格式：每行以"r行号:"开头，单元格之间用" | "分隔；每个单元格写作"#{reference} c列号 文本"（行号、列号从0开始），'
+            'c列号后的x2表示横向合并2列，v2表示纵向合并2行，!diag表示斜线分割的表头单元格。\n\n'
+            '注意：\n'
+            '-单元格若有!nested标记（含内嵌表格），则忽略这个单元格。\n'
+            '-单元格若有!img标记（含图片），则忽略这个单元格。'
+        )
+
+    def serialize(self, table_html: str, use_handles: bool) -> tuple[str, list[str] | None]:
+        table = BeautifulSoup(table_html, 'html.parser').find('table')
+        if table is None:
+            return table_html, ([] if use_handles else None)
+
+        lines, cell_ids = [], []
+        caption = table.find('caption')
+        if caption and caption.get_text(strip=True):
+            lines.append(f"caption: {_escape(caption.get_text(strip=True))}")
+
+        rows = {}
+        for row_idx, col, colspan, rowspan, cell in iter_grid_cells(table):
+            cell_id = cell.get(ATTR_CELL_ID, '')
+            if use_handles:
+                cell_ids.append(cell_id)
+                reference = len(cell_ids)
+            else:
+                reference = cell_id
+            token = f"#{reference} c{col}"
+            if colspan > 1:
+                token += f"x{colspan}"
+            if rowspan > 1:
+                token += f"v{rowspan}"
+            if cell.get(ATTR_HAS_NESTED_TABLE) == 'true':
+                token += " !nested"
+            if cell.get(ATTR_HAS_IMG) == 'true':
+                token += " !img"
+            if cell.get(ATTR_DIAGONAL_SPLIT_TYPE):
+                token += " !diag"
+            text = cell.get_text(strip=True)
+            rows.setdefault(row_idx, []).append(f"{token} {_escape(text)}" if text else token)
+        lines.extend(f"r{row_idx}: " + " | ".join(cells) for row_idx, cells in rows.items())
+
+        return "\n".join(lines), (cell_ids if use_handles else None)
+
+
+def iter_grid_cells(table):
+    """
+    按文档顺序遍历表格单元格，生成 (行号, 列号, 跨列数, 跨行数, 单元格Tag)
+    列号按合并后的逻辑网格计算：被上方单元格纵向合并占用的位置会被跳过
+    """
+    occupied = set()  # 被上方单元格纵向合并占用的 (行, 列)
+    for row_idx, row in enumerate(table.find_all('tr')):
+        col = 0
+        for cell in row.find_all(['td', 'th'], recursive=False):
+            while (row_idx, col) in occupied:
+                col += 1
+            colspan, rowspan = _span(cell.get('colspan')), _span(cell.get('rowspan'))
+            for r in range(row_idx, row_idx + rowspan):
+                for c in range(col, col + colspan):
+                    occupied.add((r, c))
+            yield row_idx, col, colspan, rowspan, cell
+            col += colspan
+
+
+SERIALIZERS = {}
+
+
+def register_serializer(serializer: TableSerializer) -> None:
+    """注册（或替换）一个表格序列化器，之后可通过 constants.TABLE_SERIALIZER 或参数按名称选用"""
+    SERIALIZERS[serializer.name] = serializer
+
+
+def get_serializer(name: str) -> TableSerializer:
+    if name not in SERIALIZERS:
+        raise ValueError(f"未知的表格序列化格式: {name}")
+    return SERIALIZERS[name]
+
+
+def _span(value) -> int:
+    try:
+        return max(1, int(value))
+    except (TypeError, ValueError):
+        return 1
+
+
+def _escape(text: str) -> str:
+    """单元格文本中的分隔符和换行转义，避免与网格格式冲突"""
+    return text.replace('|', '\\|').replace('\n', ' ')
+
+
+register_serializer(HtmlTableSerializer())
+register_serializer(GridTableSerializer())
@@ -0,0 +1,232 @@
+"""
+Word包写入模块 - 以zip到zip的流式方式重写docx
+未修改的条目直接复制压缩后的原始数据（不解压、不重新压缩），
+只写入替换的部件，并在内存中修补 .rels 和 [Content_Types].xml
+"""
+import os
+import copy
+import struct
+import zipfile
+import posixpath
+from lxml import etree
+
+CONTENT_TYPES_PART = '[Content_Types].xml'
+CONTENT_TYPES_NS = 'http://schemas.openxmlformats.org/package/2006/content-types'
+RELATIONSHIPS_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+
+# 图片扩展名 -> MIME类型，用于在 [Content_Types].xml 中补充 Default 声明
+IMAGE_CONTENT_TYPES = {
+    'png': 'image/png',
+    'jpg': 'image/jpeg',
+    'jpeg': 'image/jpeg',
+    'gif': 'image/gif',
+    'bmp': 'image/bmp',
+    'tif': 'image/tiff',
+    'tiff': 'image/tiff',
+    'svg': 'image/svg+xml',
+    'emf': 'image/x-emf',
+    'wmf': 'image/x-wmf',
+}
+
+# 已压缩的图片格式直接存储，避免无效的再次压缩
+_STORED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+
+_LOCAL_HEADER_SIZE = 30
+_COPY_BLOCK_SIZE = 1024 * 1024
+
+
+def write_package(src_path: str, dst, part_updates: dict = None, media_updates: dict = None) -> dict:
+    """
+    以源docx为基础写出新的docx
+
+    参数:
+        src_path: 源docx路径
+        dst: 目标docx路径或可写、可定位的二进制文件对象（如 io.BytesIO），不能与 src_path 相同
+        part_updates: {部件名: 新内容bytes}，整体替换的部件（如 'word/document.xml'）
+        media_updates: {原media部件名: (新部件名, 图片bytes)}，新部件名扩展名不同时会同步修补关系和内容类型
+
+    返回:
+        dict: {原部件名: 实际写入的新部件名}，只包含发生了重命名的部件
+    """
+    part_updates = dict(part_updates or {})
+    media_updates = media_updates or {}
+
+    with zipfile.ZipFile(src_path, 'r') as zin:
+        names = set(zin.namelist())
+        renames = _resolve_renames(names, media_updates)
+
+        # 重命名的部件需要修补所有引用它的 .rels 以及 [Content_Types].xml
+        if renames:
+            for name in names:
+                if name.endswith('.rels'):
+                    data = part_updates.get(name) or zin.read(name)
+                    patched = _patch_relationships(name, data, renames)
+                    if patched is not None:
+                        part_updates[name] = patched
+            content_types = part_updates.get(CONTENT_TYPES_PART) or zin.read(CONTENT_TYPES_PART)
+            part_updates[CONTENT_TYPES_PART] = _patch_content_types(content_types, renames)
+
+        with zipfile.ZipFile(dst, 'w', zipfile.ZIP_DEFLATED) as zout:
+            for info in zin.infolist():
+                name = info.filename
+                if name in media_updates:
+                    _write_part(zout, info, renames.get(name, name), media_updates[name][1])
+                elif name in part_updates:
+                    _write_part(zout, info, name, part_updates[name])
+                else:
+                    _copy_raw(zin, zout, info)
+
+    return renames
+
+
+def _resolve_renames(names: set, media_updates: dict) -> dict:
+    """确定需要重命名的media部件，新名称与已有部件冲突时追加序号"""
+    renames = {}
+    taken = set(names)
+    for old_name, (new_name, _) in media_updates.items():
+        if old_name not in names or new_name == old_name:
+            continue
+        taken.discard(old_name)
+        base, ext = posixpath.splitext(new_name)
+        candidate, suffix = new_name, 1
+        while candidate in taken:
+            candidate = f"{base}_{suffix}{ext}"
+            suffix += 1
+        taken.add(candidate)
+        renames[old_name] = candidate
+    return renames
+
+
+def _write_part(zout: zipfile.ZipFile, info: zipfile.ZipInfo, name: str, data: bytes) -> None:
+    """写入新内容，保留原条目的时间戳"""
+    new_info = zipfile.ZipInfo(name, date_time=info.date_time)
+    ext = posixpath.splitext(name)[1].lstrip('.').lower()
+    new_info.compress_type = zipfile.ZIP_STORED if ext in _STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+    new_info.external_attr = info.external_attr
+    zout.writestr(new_info, data)
+
+
+def _copy_raw(zin: zipfile.ZipFile, zout: zipfile.ZipFile, info: zipfile.ZipInfo) -> None:
+    """
+    将条目的压缩数据原样复制到目标zip，不解压也不重新压缩
+    zipfile没有公开的原始复制接口，这里直接写本地文件头和数据，并登记到目标的中央目录
+    """
+    zin.fp.seek(info.header_offset)
+    local_header = zin.fp.read(_LOCAL_HEADER_SIZE)
+    name_length, extra_length = struct.unpack('<HH', local_header[26:30])
+    zin.fp.seek(info.header_offset + _LOCAL_HEADER_SIZE + name_length + extra_length)
+
+    new_info = copy.copy(info)
+    new_info.extra = b''
+    new_info.flag_bits &= ~0x08  # CRC和大小已知，写在本地文件头中，不再使用数据描述符
+    new_info.header_offset = zout.fp.tell()
+    zout.fp.write(new_info.FileHeader())
+
+    remaining = info.compress_size
+    while remaining > 0:
+        block = zin.fp.read(min(_COPY_BLOCK_SIZE, remaining))
+        if not block:
+            raise zipfile.BadZipFile(f"条目数据不完整: {info.filename}")
+        zout.fp.write(block)
+        remaining -= len(block)
+
+    zout.filelist.append(new_info)
+    zout.NameToInfo[new_info.filename] = new_info
+    zout.start_dir = zout.fp.tell()
+
+
+def _source_dir(rels_name: str) -> str:
+    """.rels 所属部件所在目录，如 word/_rels/document.xml.rels -> word"""
+    rels_dir = posixpath.dirname(rels_name)
+    return posixpath.dirname(rels_dir)
+
+
+def _patch_relationships(rels_name: str, data: bytes, renames: dict):
+    """把关系中指向已重命名部件的 Target 改为新名称，没有修改时返回None"""
+    root = etree.fromstring(data)
+    source_dir = _source_dir(rels_name)
+    changed = False
+    for rel in root.iter(f'{{{RELATIONSHIPS_NS}}}Relationship'):
+        target = rel.get('Target')
+        if not target or rel.get('TargetMode') == 'External':
+            continue
+        if target.startswith('/'):
+            part_name = target.lstrip('/')
+        else:
+            part_name = posixpath.normpath(posixpath.join(source_dir, target))
+        if part_name in renames:
+            new_part = renames[part_name]
+            if target.startswith('/'):
+                rel.set('Target', '/' + new_part)
+            else:
+                rel.set('Target', posixpath.relpath(new_part, source_dir or '.'))
+            changed = True
+    if not changed:
+        return None
+    return etree.tostring(root, xml_declaration=True, encoding='UTF-8', standalone=True)
+
+
+def _patch_content_types(data: bytes, renames: dict) -> bytes:
+    """更新重命名部件的 Override，并确保新扩展名有 Default 声明"""
+    root = etree.fromstring(data)
+    ns = f'{{{CONTENT_TYPES_NS}}}'
+    defaults = {element.get('Extension', '').lower() for element in root.iter(f'{ns}Default')}
+
+    for override in root.iter(f'{ns}Override'):
+        part_name = override.get('PartName', '').lstrip('/')
+        if part_name in renames:
+            override.set('PartName', '/' + renames[part_name])
+            new_ext = posixpath.splitext(renames[part_name])[1].lstrip('.').lower()
+            if new_ext in IMAGE_CONTENT_TYPES:
+                override.set('ContentType', IMAGE_CONTENT_TYPES[new_ext])
+
+    for new_name in renames.values():
+        ext = posixpath.splitext(new_name)[1].lstrip('.').lower()
+        if ext and ext not in defaults:
+            default = etree.Element(f'{ns}Default')
+            default.set('Extension', ext)
+            default.set('ContentType', IMAGE_CONTENT_TYPES.get(ext, 'application/octet-stream'))
+            # Default 元素需位于 Override 之前
+            first_override = root.find(f'{ns}Override')
+            if first_override is not None:
+                first_override.addprevious(default)
+            else:
+                root.append(default)
+            defaults.add(ext)
+
+    return etree.tostring(root, xml_declaration=True, encoding='UTF-8', standalone=True)
+
+
+class PackageChanges:
+    """待写入的包修改，收集完成后通过 write 一次性写出新的docx"""
+
+    def __init__(self):
+        self.part_updates = {}   # 部件名 -> 新内容bytes
+        self.media_updates = {}  # 原media部件名 -> (新部件名, 图片bytes)
+
+    def update_part(self, part_name: str, data: bytes) -> None:
+        """整体替换一个部件（如修改后的 word/document.xml）"""
+        self.part_updates[part_name.lstrip('/')] = data
+
+    def replace_media(self, part_name: str, new_name: str, data: bytes) -> None:
+        """替换一个media部件，new_name 与 part_name 不同时会重命名"""
+        self.media_updates[part_name.lstrip('/')] = (new_name.lstrip('/'), data)
+
+    def write(self, src_path: str, dst) -> dict:
+        """
+        以 src_path 为基础写出应用了所有修改的docx
+        dst 为路径时先写到同目录的临时文件，成功后再替换目标文件；也可以是 io.BytesIO 等文件对象
+        返回发生了重命名的部件 {原部件名: 新部件名}
+        """
+        if not isinstance(dst, str):
+            return write_package(src_path, dst, self.part_updates, self.media_updates)
+
+        os.makedirs(os.path.dirname(os.path.abspath(dst)), exist_ok=True)
+        tmp_path = f"{dst}.tmp"
+        try:
+            renames = write_package(src_path, tmp_path, self.part_updates, self.media_updates)
+            os.replace(tmp_path, dst)
+            return renames
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
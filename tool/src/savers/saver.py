@@ -2,37 +2,42 @@
 文档保存模块 - 负责将替换后的内容保存回Word文档
 """
 from callback.callback import callback_handler
-import os
 from docx import Document
-from savers import table_saver, image_saver
+from savers import table_saver, image_saver, package_writer
+from context.document_context import DocumentContext
 
-from global_define import constants
-
-async def save_document() -> None:
+async def save_document(ctx: DocumentContext, output=None):
     """
-    将替换后的内容保存回新的Word文档
+    将上下文中替换后的内容保存为新的Word文档。
+    表格修改和图片替换先登记为待写入的修改，最后以源文档为基础只写一次输出包。
+
+    参数:
+        ctx: 文档上下文
+        output: 输出路径或可写的二进制缓冲区（如 io.BytesIO），默认为任务工作区的 template_path
+
+    返回:
+        写入的输出路径或缓冲区，失败时返回None
     """
     try:
-        doc_path = constants.DEFAULT_DOC_PATH
-        html_file_path = constants.DEFAULT_HTML_PATH
-        template_doc_path = constants.DEFAULT_TEMPLATE_DOC_PATH
-        doc = Document(doc_path)
-        
-        # 读取完整的HTML内容
-        with open(html_file_path, 'r', encoding='utf-8') as f:
-            html_content = f.read()
-
-        await table_saver.save_tables(doc, html_content)
-        
-        # 确保目标目录存在
-        os.makedirs(os.path.dirname(template_doc_path), exist_ok=True)
-        
-        # 保存为新文档
-        doc.save(template_doc_path)
-        await callback_handler.output_callback(f"模板文件已成功保存至: {template_doc_path}")
-
-        # 调用image_saver来处理图片
-        await image_saver.save_images()
+        output = output or ctx.workspace.template_path
+        doc = Document(ctx.doc_path)
+        changes = package_writer.PackageChanges()
+
+        # 表格修改只作用于主文档部件
+        await table_saver.save_tables(doc, ctx)
+        changes.update_part(doc.part.partname, doc.part.blob)
+
+        # 调用image_saver登记占位符图片替换
+        await image_saver.save_images(ctx, changes)
+
+        renames = changes.write(ctx.doc_path, output)
+        for old_name, new_name in renames.items():
+            await callback_handler.output_callback(f"  - 更新关系: {old_name} -> {new_name}")
+
+        target = output if isinstance(output, str) else "内存缓冲区"
+        await callback_handler.output_callback(f"模板文件已成功保存至: {target}")
+        return output
 
     except Exception as e:
-        await callback_handler.output_callback(f"保存文档时出错: {e}")
\ No newline at end of file
+        await callback_handler.output_callback(f"保存文档时出错: {e}")
+        return None
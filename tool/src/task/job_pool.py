@@ -0,0 +1,48 @@
+"""任务池模块，限制同时执行的任务数量，超出上限的任务排队等待"""
+import asyncio
+import traceback
+from callback.callback import callback_handler
+from global_define.constants import MAX_CONCURRENT_JOBS
+
+
+class JobPool:
+    """有界任务池类，每个任务在独立的asyncio任务中执行，不阻塞消息接收"""
+
+    def __init__(self, max_jobs: int = MAX_CONCURRENT_JOBS):
+        """
+        初始化任务池
+
+        Args:
+            max_jobs: 同时执行的任务数量上限
+        """
+        self.max_jobs = max(1, max_jobs)
+        self._semaphore = None  # 首次提交任务时在运行中的事件循环里创建
+        self._tasks = set()
+
+    @property
+    def pending_count(self) -> int:
+        """尚未结束的任务数量（包括排队中的任务）"""
+        return len(self._tasks)
+
+    def submit(self, coro) -> asyncio.Task:
+        """提交一个任务协程，立即返回，任务在有空闲名额时开始执行"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_jobs)
+        task = asyncio.get_running_loop().create_task(self._run(coro))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _run(self, coro):
+        async with self._semaphore:
+            try:
+                return await coro
+            except Exception as e:
+                await callback_handler.output_callback(f"任务执行出错: {e}", "warn")
+                traceback.print_exc()
+                return None
+
+    async def join(self) -> None:
+        """等待所有已提交的任务结束"""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
@@ -1,43 +1,65 @@
 ﻿"""任务管理模块，提供文档处理接口"""
+import io
+import os
+import glob
 import time
+import shutil
 from models.model_manager import llm_manager
 from converter.converter import convert_document
 from extractors.extractor import extract_document
 from replacers.replacer import replace_document
-from mergers.merger import merge_html
 from savers.saver import save_document
 from callback.callback import callback_handler
 from client import upload_template
 from global_define import constants
+from context.document_context import DocumentContext
+from context.workspace import Workspace
 
-async def startProcessTask():
+async def startProcessTask(doc_path: str = None, publish: bool = False, workspace: Workspace = None):
     """
     启动文档处理任务
+    :param doc_path: 待处理的Word文档路径，默认为 constants.DEFAULT_DOC_PATH
+    :param publish: 完成后是否将HTML和提取的表格发布到共享路径（DEFAULT_HTML_PATH / EXTRACT_DIR）供前端读取
+    :param workspace: 任务工作区，默认为该任务新建独立的工作区
     :return: 处理结果状态和耗时
     """
 
     callback_handler.set_websocket_message_type(constants.WS_MESSAGE_TYPE['DOC_PROCESS_PROGRESS'])
 
-    await callback_handler.output_callback(f"===== 开始处理任务: {os.path.basename(constants.DEFAULT_DOC_PATH)} =====")
+    # 每个任务使用独立的工作区，多个任务可同时执行；整个任务共享同一个文档上下文，HTML只解析一次
+    workspace = workspace or Workspace.create(doc_path or constants.DEFAULT_DOC_PATH)
+    callback_handler.set_job_id(workspace.job_id)
+    ctx = DocumentContext(workspace=workspace)
+
+    await callback_handler.output_callback(f"===== 开始处理任务: {os.path.basename(ctx.doc_path)} =====")
 
     start_time = time.time()
  
     try:
         # 步骤1: Word文档转换为HTML
         await callback_handler.output_callback("\n===== 步骤1: 文档转换 =====")
-        await convert_document()
+        await convert_document(ctx)
 
         # 步骤2: 提取文档元素
         await callback_handler.output_callback("\n===== 步骤2: 文档元素提取 =====")
-        table_html_strings = await extract_document()
+        await extract_document(ctx)
 
         # 步骤3: 替换文档元素
         await callback_handler.output_callback("\n===== 步骤3: 文档元素替换 =====")
-        await replace_document(table_html_strings)
+        await replace_document(ctx)
+
+        # 步骤4: 将HTML和图片映射一次性写回磁盘
+        await callback_handler.output_callback("\n===== 步骤4: 保存HTML =====")
+        ctx.save()
+        workspace.cleanup_temp()
+        await callback_handler.output_callback(f"成功导出HTML: {ctx.html_path}")
+        if publish:
+            _publish_result(ctx)
+            await callback_handler.output_callback(f"已发布HTML: {constants.DEFAULT_HTML_PATH}")
 
-        # 步骤4: 合并处理后的元素回HTML (已废弃)
-        await callback_handler.output_callback("\n===== 步骤4: 合并元素到HTML (已废弃) =====")
-        # await merge_html()
+        if llm_manager.cache and llm_manager.cache.enabled:
+            stats = llm_manager.cache.stats
+            await callback_handler.output_callback(f"LLM响应缓存（本进程累计）: 命中 {stats['hits']} 次，未命中 {stats['misses']} 次，命中率 {stats['hit_rate']:.0%}")
 
         # 计算总耗时
         total_time = time.time() - start_time
@@ -54,29 +76,37 @@ async def startProcessTask():
         traceback.print_exc()
         return False, 0
 
-async def startSaveTask():
+async def startSaveTask(html_path: str = None):
     """
     启动保存任务（仅提取和保存）
+    :param html_path: 已编辑的HTML文件路径，默认为 constants.DEFAULT_HTML_PATH
     :return: 处理结果状态和耗时
     """
     callback_handler.set_websocket_message_type(constants.WS_MESSAGE_TYPE['DOC_SAVE_COMPLETE'])
     
-    await callback_handler.output_callback(f"===== 开始保存任务: {os.path.basename(constants.DEFAULT_HTML_PATH)} =====")
+    await callback_handler.output_callback(f"===== 开始保存任务: {os.path.basename(html_path or constants.DEFAULT_HTML_PATH)} =====")
     
     start_time = time.time()
     
     try:
-        # 步骤1: 提取文档元素
+        # 读取一次HTML和图片映射，后续步骤共享同一个文档上下文
+        # HTML中记录了任务ID时，源文档和图片映射取自该任务的工作区
+        ctx = DocumentContext.from_html_file(html_path)
+        callback_handler.set_job_id(ctx.workspace.job_id)
+
+        # 步骤1: 提取文档元素（图片已在处理任务中提取，这里只提取表格）
         await callback_handler.output_callback("\n===== 步骤1: 文档元素提取 =====")
-        await extract_document()
+        await extract_document(ctx, extract_images=False)
         
-        # 步骤2: 生成模板文档
+        # 步骤2: 生成模板文档（直接写入内存缓冲区，无需落盘）
         await callback_handler.output_callback("\n===== 步骤2: 模板文档生成 =====")
-        await save_document()
+        template_buffer = await save_document(ctx, io.BytesIO())
+        if template_buffer is None:
+            raise RuntimeError("模板文档生成失败")
         
         # 步骤3: 上传模板文档到服务器
         await callback_handler.output_callback("\n===== 步骤3: 上传模板文档 =====")
-        upload_success = await upload_template(constants.DEFAULT_TEMPLATE_DOC_PATH)
+        upload_success = await upload_template(template_buffer)
         if upload_success:
             await callback_handler.output_callback("模板文档上传成功")
         else:
@@ -95,4 +125,16 @@ async def startSaveTask():
         await callback_handler.output_callback(f"保存过程中发生错误: {e}")
         import traceback
         traceback.print_exc()
-        return False, 0
\ No newline at end of file
+        return False, 0
+
+
+def _publish_result(ctx: DocumentContext) -> None:
+    """将任务的HTML和提取的表格文件复制到前端读取的共享路径，img的相对路径按新位置改写"""
+    ctx.export_html(constants.DEFAULT_HTML_PATH)
+
+    table_pattern = f"{constants.TABLE_FILE_PREFIX}*{constants.HTML_FILE_EXTENSION}"
+    os.makedirs(constants.EXTRACT_DIR, exist_ok=True)
+    for old_file in glob.glob(os.path.join(constants.EXTRACT_DIR, table_pattern)):
+        os.remove(old_file)
+    for table_file in glob.glob(os.path.join(ctx.workspace.extract_dir, table_pattern)):
+        shutil.copy(table_file, constants.EXTRACT_DIR)
@@ -0,0 +1,21 @@
+from replacers.image_replacer import _parse_batch_response
+
+
+def test_prose_with_brackets_around_answer():
+    response = (
+        '输出格式示例: [{"image": 1, "type": 0}]\n'
+        '答案: [{"image": 1, "type": 2}, {"image": 2, "type": "3",}]\n'
+        '（类型说明见[附录1]）'
+    )
+    assert _parse_batch_response(response, 2) == {0: '2', 1: '3'}
+
+
+def test_numeric_array_skips_shorter_bracketed_notes():
+    assert _parse_batch_response('结果: [2, 0, 4]（参考[1]）', 3) == {0: '2', 1: '0', 2: '4'}
+    assert _parse_batch_response('["1", "4"]', 2) == {0: '1', 1: '4'}
+
+
+def test_invalid_items_are_left_for_single_requests():
+    response = '[{"image": 1, "type": 9}, {"image": 5, "type": 1}, {"image": 2, "type": 1}]'
+    assert _parse_batch_response(response, 2) == {1: '1'}
+    assert _parse_batch_response('无法判断', 2) == {}
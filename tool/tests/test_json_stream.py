@@ -0,0 +1,40 @@
+from replacers.json_stream import JsonArrayStreamParser
+
+
+def _feed_all(text, size=5):
+    parser = JsonArrayStreamParser()
+    for start in range(0, len(text), size):
+        parser.feed(text[start:start + size])
+    return parser.objects
+
+
+def test_example_array_before_answer_is_discarded():
+    text = (
+        '输出格式示例: [{"key": "示例", "value-cell-id": "example"}]\n'
+        '结果如下:\n'
+        '[{"key": "a", "value-cell-id": "c1"}, {"key": "b", "value-cell-id": "c2",}]'
+    )
+    assert _feed_all(text) == [
+        {"key": "a", "value-cell-id": "c1"},
+        {"key": "b", "value-cell-id": "c2"},
+    ]
+
+
+def test_bracketed_prose_after_answer_keeps_answer():
+    text = '[{"key": "a", "value-cell-id": "c1"}]\n以上结果参见说明[1]。'
+    assert _feed_all(text, size=3) == [{"key": "a", "value-cell-id": "c1"}]
+
+
+def test_structured_output_object_wrapper():
+    text = '{"pairs": [{"k": "a", "c": 1}, {"k": "b", "c": 2}]}'
+    assert _feed_all(text, size=4) == [{"k": "a", "c": 1}, {"k": "b", "c": 2}]
+
+
+def test_resets_counts_discarded_returned_objects():
+    parser = JsonArrayStreamParser()
+    returned = parser.feed('示例: [{"key": "x", "value-cell-id": "c0"}]\n')
+    assert returned == [{"key": "x", "value-cell-id": "c0"}] and parser.resets == 0
+    returned = parser.feed('结果: [{"key": "a", "value-cell-id": "c1"}]')
+    assert returned == [{"key": "a", "value-cell-id": "c1"}]
+    assert parser.resets == 1
+    assert parser.objects == [{"key": "a", "value-cell-id": "c1"}]
@@ -0,0 +1,111 @@
+import io
+import zipfile
+
+from lxml import etree
+
+from savers.package_writer import PackageChanges, write_package, CONTENT_TYPES_NS, RELATIONSHIPS_NS
+
+CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    f'<Types xmlns="{CONTENT_TYPES_NS}">'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Default Extension="png" ContentType="image/png"/>'
+    '<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '</Types>'
+)
+DOCUMENT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    f'<Relationships xmlns="{RELATIONSHIPS_NS}">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/image" Target="media/image1.png"/>'
+    '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/hyperlink" Target="media/image1.png" TargetMode="External"/>'
+    '</Relationships>'
+)
+PARTS = {
+    '[Content_Types].xml': CONTENT_TYPES.encode('utf-8'),
+    'word/document.xml': b'<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body/></w:document>',
+    'word/_rels/document.xml.rels': DOCUMENT_RELS.encode('utf-8'),
+    'word/media/image1.png': b'\x89PNG fake image data' * 50,
+}
+
+
+class _Unseekable(io.RawIOBase):
+    """不可定位的输出流，zipfile写入时会为每个条目使用数据描述符"""
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        return self.buffer.write(data)
+
+
+def _make_docx(path, data_descriptors=False):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(_Unseekable(buffer) if data_descriptors else buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for name, data in PARTS.items():
+            zf.writestr(name, data)
+    path.write_bytes(buffer.getvalue())
+    return path
+
+
+def _read_all(source):
+    with zipfile.ZipFile(source) as zf:
+        assert zf.testzip() is None
+        return {info.filename: zf.read(info) for info in zf.infolist()}
+
+
+def test_unchanged_parts_round_trip(tmp_path):
+    src = _make_docx(tmp_path / 'src.docx')
+    dst = tmp_path / 'dst.docx'
+    assert PackageChanges().write(str(src), str(dst)) == {}
+    assert _read_all(dst) == PARTS
+    assert not (tmp_path / 'dst.docx.tmp').exists()
+
+
+def test_raw_copy_drops_data_descriptors(tmp_path):
+    src = _make_docx(tmp_path / 'src.docx', data_descriptors=True)
+    with zipfile.ZipFile(src) as zf:
+        assert all(info.flag_bits & 0x08 for info in zf.infolist())
+
+    output = io.BytesIO()
+    write_package(str(src), output)
+    output.seek(0)
+    with zipfile.ZipFile(output) as zf:
+        assert not any(info.flag_bits & 0x08 for info in zf.infolist())
+    output.seek(0)
+    assert _read_all(output) == PARTS
+
+
+def test_part_update_replaces_only_that_part(tmp_path):
+    src = _make_docx(tmp_path / 'src.docx')
+    dst = tmp_path / 'dst.docx'
+    changes = PackageChanges()
+    changes.update_part('/word/document.xml', b'<new/>')
+    changes.write(str(src), str(dst))
+
+    parts = _read_all(dst)
+    assert parts['word/document.xml'] == b'<new/>'
+    assert {name: data for name, data in parts.items() if name != 'word/document.xml'} == \
+        {name: data for name, data in PARTS.items() if name != 'word/document.xml'}
+
+
+def test_media_rename_patches_relationships_and_content_types(tmp_path):
+    src = _make_docx(tmp_path / 'src.docx')
+    dst = tmp_path / 'dst.docx'
+    changes = PackageChanges()
+    changes.replace_media('word/media/image1.png', 'word/media/image1.jpg', b'jpeg data')
+    assert changes.write(str(src), str(dst)) == {'word/media/image1.png': 'word/media/image1.jpg'}
+
+    parts = _read_all(dst)
+    assert 'word/media/image1.png' not in parts
+    assert parts['word/media/image1.jpg'] == b'jpeg data'
+
+    rels = etree.fromstring(parts['word/_rels/document.xml.rels'])
+    targets = {rel.get('Id'): rel.get('Target') for rel in rels}
+    assert targets == {'rId1': 'media/image1.jpg', 'rId2': 'media/image1.png'}  # 外部链接不修改
+
+    content_types = etree.fromstring(parts['[Content_Types].xml'])
+    defaults = {element.get('Extension'): element.get('ContentType') for element in content_types.iter(f'{{{CONTENT_TYPES_NS}}}Default')}
+    assert defaults['jpg'] == 'image/jpeg'
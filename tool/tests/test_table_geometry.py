@@ -0,0 +1,75 @@
+import zipfile
+
+from lxml import etree
+
+from converter.table_geometry import W_NS, build_table_geometry, locate_cells
+
+
+def _tc(text, properties=''):
+    return f'<w:tc><w:tcPr>{properties}</w:tcPr><w:p><w:r><w:t>{text}</w:t></w:r></w:p></w:tc>'
+
+
+GRID_SPAN_2 = '<w:gridSpan w:val="2"/>'
+V_MERGE_RESTART = '<w:vMerge w:val="restart"/>'
+V_MERGE_CONTINUE = '<w:vMerge/>'
+DIAGONAL = '<w:tcBorders><w:tl2br/></w:tcBorders>'
+GRID_BEFORE_1 = '<w:trPr><w:gridBefore w:val="1"/></w:trPr>'
+
+# 第一行 A 横跨两列、B 纵向合并到第二行；第二行的 E 被合并；第二个 w:tbl 位于文本框段落中，不计入HTML表格
+DOCUMENT_XML = (
+    f'<w:document xmlns:w="{W_NS}"><w:body>'
+    '<w:tbl>'
+    f'<w:tr>{_tc("A", GRID_SPAN_2)}{_tc("B", V_MERGE_RESTART)}</w:tr>'
+    f'<w:tr>{_tc("C")}{_tc("D")}{_tc("E", V_MERGE_CONTINUE)}</w:tr>'
+    f'<w:tr>{_tc("F")}{_tc("G", DIAGONAL)}{_tc("H")}</w:tr>'
+    '</w:tbl>'
+    f'<w:p><w:r><w:txbxContent><w:tbl><w:tr>{_tc("文本框")}</w:tr></w:tbl></w:txbxContent></w:r></w:p>'
+    '<w:tbl>'
+    f'<w:tr>{GRID_BEFORE_1}{_tc("I")}</w:tr>'
+    f'<w:tr>{_tc("J")}{_tc("K")}</w:tr>'
+    '</w:tbl>'
+    '</w:body></w:document>'
+)
+
+
+def _make_docx(tmp_path):
+    path = tmp_path / 'geometry.docx'
+    with zipfile.ZipFile(path, 'w') as zf:
+        zf.writestr('word/document.xml', DOCUMENT_XML)
+    return str(path)
+
+
+def test_spans_and_vertical_merges(tmp_path):
+    geometry = build_table_geometry(_make_docx(tmp_path))
+
+    assert geometry['table_0_cell_0_0'] == {"tbl": 0, "tr": 0, "tc": 0, "col": 0, "colspan": 2, "rowspan": 1}
+    assert geometry['table_0_cell_0_1'] == {"tbl": 0, "tr": 0, "tc": 1, "col": 2, "colspan": 1, "rowspan": 2}
+    # 被合并的 E 不输出，第二行只有两个单元格
+    assert geometry['table_0_cell_1_1'] == {"tbl": 0, "tr": 1, "tc": 1, "col": 1, "colspan": 1, "rowspan": 1}
+    assert 'table_0_cell_1_2' not in geometry
+    assert geometry['table_0_cell_2_1']['diagonal'] == 'tl2br'
+
+
+def test_text_box_tables_are_counted_only_in_document_order(tmp_path):
+    geometry = build_table_geometry(_make_docx(tmp_path))
+
+    # 文本框中的表格不是HTML表格，但占用 w:tbl 顺序号
+    assert geometry['table_1_cell_0_0'] == {"tbl": 2, "tr": 0, "tc": 0, "col": 1, "colspan": 1, "rowspan": 1}
+    assert geometry['table_1_cell_1_1']['col'] == 1
+    assert not any(cell_id.startswith('table_2_') for cell_id in geometry)
+
+
+def test_locate_cells_finds_word_cells(tmp_path):
+    geometry = build_table_geometry(_make_docx(tmp_path))
+    body = etree.fromstring(DOCUMENT_XML.encode('utf-8')).find(f'{{{W_NS}}}body')
+
+    cell_ids = ['table_0_cell_0_1', 'table_0_cell_1_1', 'table_0_cell_2_2', 'table_1_cell_1_0', 'table_9_cell_0_0']
+    located = locate_cells(body, geometry, cell_ids)
+
+    texts = {cell_id: ''.join(tc.itertext()) for cell_id, tc in located.items()}
+    assert texts == {
+        'table_0_cell_0_1': 'B',
+        'table_0_cell_1_1': 'D',
+        'table_0_cell_2_2': 'H',
+        'table_1_cell_1_0': 'J',
+    }
@@ -0,0 +1,169 @@
+import json
+import asyncio
+
+from bs4 import BeautifulSoup
+
+from global_define import constants
+from models.model_manager import llm_manager
+from context.document_context import DocumentContext
+from replacers import table_replacer
+from replacers.table_layout import TableLayout
+from replacers.table_layout_store import TableLayoutStore, STORE_VERSION
+
+
+def _store(tmp_path, **kwargs):
+    kwargs.setdefault('min_confidence', 0.5)
+    kwargs.setdefault('min_observations', 2)
+    kwargs.setdefault('revalidate_every', 0)
+    return TableLayoutStore(str(tmp_path / 'layouts.json'), **kwargs)
+
+
+def test_single_observation_is_not_used(tmp_path):
+    store = _store(tmp_path)
+    store.record('fp', {0: 'a'})
+    assert store.lookup('fp') is None
+
+
+def test_two_agreeing_observations_are_used(tmp_path):
+    store = _store(tmp_path)
+    store.record('fp', {0: 'a', 3: 'b'})
+    store.record('fp', {3: 'b', 0: 'a'})
+    mapping, confidence = store.lookup('fp')
+    assert mapping == {0: 'a', 3: 'b'}
+    assert confidence == 2 / 3
+
+
+def test_disagreeing_observations_vote(tmp_path):
+    store = _store(tmp_path)
+    store.record('fp', {0: 'a'})
+    store.record('fp', {0: 'b'})
+    assert store.lookup('fp') is None  # 各一票，均未达到两次一致观察
+
+    store.record('fp', {0: 'a'})
+    assert store.lookup('fp')[0] == {0: 'a'}
+
+    store.record('fp', {0: 'b'})
+    store.record('fp', {0: 'b'})
+    assert store.lookup('fp')[0] == {0: 'b'}
+
+
+def test_saved_votes_are_reloaded(tmp_path):
+    store = _store(tmp_path)
+    store.record('fp', {1: 'a'})
+    store.record('fp', {1: 'a'})
+    store.save()
+
+    reloaded = _store(tmp_path)
+    assert reloaded.lookup('fp')[0] == {1: 'a'}
+
+
+def test_other_store_version_is_ignored(tmp_path):
+    (tmp_path / 'layouts.json').write_text(json.dumps({
+        'version': STORE_VERSION + 1,
+        'layouts': {'fp': {'observations': 5, 'candidates': [{'mapping': {'0': 'a'}, 'count': 5}]}},
+    }), encoding='utf-8')
+    assert _store(tmp_path).lookup('fp') is None
+
+
+def test_revalidation_is_not_counted_as_hit(tmp_path):
+    store = _store(tmp_path, revalidate_every=3)
+    store.record('fp', {0: 'a'})
+    store.record('fp', {0: 'a'})
+
+    used = 0
+    for _ in range(6):
+        if store.lookup('fp') and not store.due_for_revalidation('fp'):
+            used += 1
+    assert used == 4
+    assert store.stats['hits'] == 4
+    assert store.stats['revalidations'] == 2
+
+
+def test_save_merges_votes_from_other_processes(tmp_path):
+    first = _store(tmp_path)
+    second = _store(tmp_path)
+    first.lookup('fp')
+    second.lookup('fp')  # 两个进程都已加载（空的）记录
+
+    first.record('fp', {0: 'a'})
+    first.save()
+    second.record('fp', {0: 'a'})
+    second.record('other', {1: 'b'})
+    second.save()
+
+    reloaded = _store(tmp_path)
+    assert reloaded.lookup('fp')[0] == {0: 'a'}
+    assert reloaded._layouts['fp']['observations'] == 2
+    assert 'other' in reloaded._layouts
+
+
+def test_save_evicts_least_recently_active_layouts(tmp_path):
+    store = _store(tmp_path, max_entries=2)
+    for fingerprint in ('old', 'middle', 'new'):
+        store.record(fingerprint, {0: 'a'})
+    # 记录时间决定淘汰顺序：old 最早
+    store._pending['old']['votes'] = [({'0': 'a'}, 1.0)]
+    store._pending['middle']['votes'] = [({'0': 'a'}, 2.0)]
+    store.save()
+
+    assert sorted(_store(tmp_path)._read_layouts()) == ['middle', 'new']
+
+
+TABLE_HTML = (
+    '<table>'
+    '<tr><td data-cell-id="table_0_cell_0_0">委托单位</td><td data-cell-id="table_0_cell_0_1">某公司</td></tr>'
+    '<tr><td data-cell-id="table_0_cell_1_0">检测日期</td><td data-cell-id="table_0_cell_1_1">2024-01-01</td></tr>'
+    '</table>'
+)
+RESPONSE = '[{"key": "client", "value-cell-id": "table_0_cell_0_1"}, {"key": "date", "value-cell-id": "table_0_cell_1_1"}]'
+
+
+class _Chunk:
+    def __init__(self, content):
+        delta = type('Delta', (), {'content': content})()
+        self.choices = [type('Choice', (), {'delta': delta})()]
+
+
+def _fake_create(fail_after=None):
+    async def create(**kwargs):
+        async def stream():
+            for start in range(0, len(RESPONSE), 20):
+                if fail_after is not None and start >= fail_after:
+                    raise ConnectionError("连接中断")
+                yield _Chunk(RESPONSE[start:start + 20])
+        return stream()
+    return create
+
+
+def _replace(tmp_path, monkeypatch, store, fail_after=None):
+    monkeypatch.setattr(table_replacer, 'table_layout_store', store)
+    monkeypatch.setattr(constants, 'TABLE_RULES_ENABLED', False)
+    monkeypatch.setattr(llm_manager.cache, 'enabled', False)
+    monkeypatch.setattr(llm_manager.async_client.chat.completions, 'create', _fake_create(fail_after))
+
+    ctx = DocumentContext(doc_path=str(tmp_path / 'report.docx'), html_path=str(tmp_path / 'report.html'))
+    ctx.soup = BeautifulSoup(f'<html><body>{TABLE_HTML}</body></html>', 'html.parser')
+    ctx.build_cell_index()
+    ctx.tables = [TABLE_HTML]
+    asyncio.run(table_replacer.replace_tables(ctx, '', response_mode='full', serializer='html'))
+    return ctx
+
+
+def test_completed_stream_votes(tmp_path, monkeypatch):
+    store = _store(tmp_path)
+    ctx = _replace(tmp_path, monkeypatch, store)
+
+    assert ctx.find_cell('table_0_cell_0_1').string == '{client}'
+    fingerprint = TableLayout(TABLE_HTML).fingerprint
+    assert _store(tmp_path)._read_layouts()[fingerprint]['observations'] == 1
+
+
+def test_truncated_stream_does_not_vote(tmp_path, monkeypatch):
+    store = _store(tmp_path)
+    ctx = _replace(tmp_path, monkeypatch, store, fail_after=len(RESPONSE) // 2 + 10)
+
+    # 中断前已写入的单元格被撤销，布局记忆中没有这次观察
+    assert ctx.find_cell('table_0_cell_0_1').string == '某公司'
+    assert not ctx.find_cell('table_0_cell_0_1').has_attr(constants.ATTR_ORIGINAL_CONTENT)
+    assert store._layouts == {}
+    assert not (tmp_path / 'layouts.json').exists()